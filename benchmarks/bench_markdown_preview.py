@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Notes tab preview while typing into a large document.
+
+Runs the app headlessly, loads a generated writeup (headings, prose, code
+blocks, tables) into the editor and replays keystrokes in the middle of it,
+measuring how long each keystroke takes to be processed. Compares:
+
+  * widget       - a Textual `Markdown` widget updated with the whole note on
+                   every keystroke (the previous implementation)
+  * full         - the whole note re-rendered on every keystroke
+  * incremental  - only changed blocks re-rendered, on every keystroke
+  * debounced    - only changed blocks re-rendered, once typing pauses (default)
+
+With `--check-flat`, the debounced variant is instead run on notes of each
+given size and the benchmark fails (exit status 1) if the keystroke latency
+or the time for the preview to catch up grows with the note's size by more
+than `--tolerance` (and at least `FLOOR_MS`).
+
+Usage:
+    python benchmarks/bench_markdown_preview.py [--lines N] [--keys N]
+    python benchmarks/bench_markdown_preview.py --check-flat 500 2000 5000 [--tolerance 0.25]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+# Keep the benchmark's app out of the user's notes, search index, history and output logs
+SCRATCH = tempfile.mkdtemp(prefix="bench-markdown-")
+os.environ.setdefault("NOTES_DIR", os.path.join(SCRATCH, "notes"))
+os.environ.setdefault("SEARCH_INDEX_PATH", ":memory:")
+os.environ.setdefault("HISTORY_PATH", os.path.join(SCRATCH, "history.jsonl"))
+os.environ.setdefault("TERMINAL_LOG_DIR", os.path.join(SCRATCH, "logs"))
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(SCRATCH, "llm_cache.sqlite3"))
+
+from textual.widgets import Markdown  # noqa: E402
+
+from ctf_toolkit import CTFToolkitApp, MarkdownPreview, MarkdownTab, NOTES_PREVIEW_DEBOUNCE  # noqa: E402
+
+# Latency differences smaller than this are noise, whatever their relative size
+FLOOR_MS = 5.0
+
+VARIANTS = {
+    "widget": (False, 0.0),
+    "full": (False, 0.0),
+    "incremental": (True, 0.0),
+    "debounced": (True, NOTES_PREVIEW_DEBOUNCE),
+}
+
+
+def make_document(lines: int) -> str:
+    """A synthetic CTF writeup of roughly `lines` lines."""
+    parts = []
+    section = 0
+    while sum(part.count("\n") + 1 for part in parts) < lines:
+        section += 1
+        parts.append(f"## Challenge {section}\n")
+        parts.append(f"Enumerated the target and found service {section} listening. " * 3 + "\n")
+        parts.append("```python\nfrom pwn import *\nio = remote('10.10.10.%d', 1337)\n"
+                     "io.sendline(b'A' * 64)\nprint(io.recvall())\n```\n" % section)
+        parts.append("| port | service | version |\n|------|---------|---------|\n"
+                     + "".join(f"| {p} | svc{p} | 1.{p} |\n" for p in range(section, section + 5)))
+        parts.append(f"- tried default creds\n- found `flag{{chall_{section}}}`\n")
+    return "\n".join(parts)
+
+
+async def run_variant(name: str, document: str, keys: int) -> dict:
+    incremental, debounce = VARIANTS[name]
+    app = CTFToolkitApp()
+    async with app.run_test(size=(160, 50)) as pilot:
+        app.action_focus_markdown()
+        await app.mount_tab("markdown-tab")
+        tab = app.query_one(MarkdownTab)
+        tab.preview_debounce = debounce
+        preview = app.query_one(MarkdownPreview)
+        preview.incremental = incremental
+        if name == "widget":
+            legacy = Markdown()
+            await preview.parent.mount(legacy, after=preview)
+            preview.display = False
+            preview.update = legacy.update
+        editor = app.query_one("#markdown-editor")
+        editor.text = document
+        await pilot.pause(debounce + 0.5)
+
+        editor.focus()
+        editor.move_cursor((editor.document.line_count // 2, 0))
+        latencies = []
+        started = time.perf_counter()
+        for index in range(keys):
+            key = "abcdefghij"[index % 10]
+            tick = time.perf_counter()
+            await pilot.press(key)
+            latencies.append((time.perf_counter() - tick) * 1000)
+        typing = time.perf_counter() - started
+        # Time until the preview has caught up after the last keystroke
+        tick = time.perf_counter()
+        await pilot.pause(debounce)
+        await pilot.pause()
+        settle = (time.perf_counter() - tick) * 1000
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "keys/sec": keys / typing,
+        "settle": settle,
+    }
+
+
+async def run(args):
+    document = make_document(args.lines)
+    print(f"document: {document.count(chr(10)) + 1} lines, {len(document)} chars, {args.keys} keystrokes")
+    print(f"{'variant':<12} {'p50 ms':>9} {'p99 ms':>9} {'keys/sec':>10} {'settle ms':>10}")
+    for name in VARIANTS:
+        result = await run_variant(name, document, args.keys)
+        print(f"{name:<12} {result['p50']:>9.2f} {result['p99']:>9.2f}"
+              f" {result['keys/sec']:>10.1f} {result['settle']:>10.1f}")
+
+
+async def check_flat(args) -> bool:
+    """Whether the debounced preview's latencies stay flat across note sizes."""
+    print(f"{'lines':>7} {'p50 ms':>9} {'p99 ms':>9} {'keys/sec':>10} {'settle ms':>10}")
+    results = {}
+    for lines in sorted(args.check_flat):
+        result = results[lines] = await run_variant("debounced", make_document(lines), args.keys)
+        print(f"{lines:>7} {result['p50']:>9.2f} {result['p99']:>9.2f}"
+              f" {result['keys/sec']:>10.1f} {result['settle']:>10.1f}")
+    smallest, largest = results[min(results)], results[max(results)]
+    flat = True
+    for metric in ("p50", "settle"):
+        growth = largest[metric] - smallest[metric]
+        if growth > FLOOR_MS and growth > smallest[metric] * args.tolerance:
+            print(f"{metric} grows with the note: {smallest[metric]:.1f} -> {largest[metric]:.1f} ms")
+            flat = False
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=1000, help="size of the generated document")
+    parser.add_argument("--keys", type=int, default=30, help="keystrokes to replay")
+    parser.add_argument("--check-flat", type=int, nargs="+", metavar="LINES",
+                        help="note sizes whose debounced latencies must stay flat")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative growth allowed by --check-flat")
+    args = parser.parse_args()
+    if args.check_flat:
+        sys.exit(0 if asyncio.run(check_flat(args)) else 1)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
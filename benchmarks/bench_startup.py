@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark for application startup: import time and time to first frame.
+
+Each run starts a fresh interpreter, imports the toolkit, starts the app
+headlessly and reports once the first frame has been rendered, so the time
+measured includes interpreter start-up as seen by a user. A second pass
+runs the import under `python -X importtime` and lists the slowest modules.
+Compares:
+
+  * eager  - LiteLLM imported with the toolkit and every tab built at
+             startup (the previous behaviour)
+  * lazy   - LiteLLM imported on first use and tabs built when first shown
+             (default)
+
+Notes, the search index and the LLM cache are pointed at a temporary
+directory so user data is not touched.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs N] [--top N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+VARIANTS = {
+    "eager": {"preload": "import litellm", "env": {"UI_LAZY_TABS": "0"}},
+    "lazy": {"preload": "", "env": {"UI_LAZY_TABS": "1"}},
+}
+
+# Runs in the child: start the app headlessly and report the first frame on fd 1
+FIRST_FRAME = """
+import os, time
+{preload}
+from ctf_toolkit import CTFToolkitApp
+imported = time.time()
+
+async def report(pilot):
+    await pilot.pause()
+    os.write(1, f"{{imported}} {{time.time()}}\\n".encode())
+    pilot.app.exit()
+
+CTFToolkitApp().run(headless=True, auto_pilot=report)
+"""
+
+
+def child_env(variant: str, scratch: str) -> dict:
+    env = dict(os.environ)
+    env.update(VARIANTS[variant]["env"])
+    env.update({
+        "NOTES_DIR": os.path.join(scratch, "notes"),
+        "SEARCH_INDEX_PATH": ":memory:",
+        "LLM_CACHE_PATH": os.path.join(scratch, "llm_cache.sqlite3"),
+        "HISTORY_PATH": os.path.join(scratch, "history.jsonl"),
+        "TERMINAL_LOG_DIR": os.path.join(scratch, "logs"),
+        "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    return env
+
+
+def time_to_first_frame(variant: str, scratch: str) -> tuple[float, float]:
+    """Seconds from spawning the interpreter to the toolkit imported / first frame."""
+    code = FIRST_FRAME.format(preload=VARIANTS[variant]["preload"])
+    # Wall-clock time, so the child's readings compare with the parent's
+    started = time.time()
+    result = subprocess.run(
+        [sys.executable, "-c", code], env=child_env(variant, scratch), cwd=ROOT,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True,
+    )
+    imported, frame = (float(v) for v in result.stdout.split()[-2:])
+    return imported - started, frame - started
+
+
+def import_profile(variant: str, scratch: str, top: int) -> tuple[float, list[tuple[float, str]]]:
+    """Total import time and the `top` slowest imports (and their direct imports) under -X importtime."""
+    preload = VARIANTS[variant]["preload"]
+    code = f"{preload}\nimport ctf_toolkit" if preload else "import ctf_toolkit"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], env=child_env(variant, scratch),
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+    )
+    total, modules = 0.0, []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue # Header line
+        # Nesting is shown by two spaces per level after a single leading one
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        seconds = int(cumulative) / 1e6
+        if depth == 0:
+            total += seconds
+        if depth <= 1:
+            modules.append((seconds, "  " * depth + name.strip()))
+    modules.sort(reverse=True)
+    return total, modules[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="app starts per variant")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        print(f"{'variant':<8} {'import ms':>10} {'first frame ms':>15} {'(min)':>8}")
+        profiles = {}
+        for variant in VARIANTS:
+            samples = [time_to_first_frame(variant, scratch) for _ in range(args.runs)]
+            imports = [imported for imported, _ in samples]
+            frames = [frame for _, frame in samples]
+            print(f"{variant:<8} {statistics.median(imports) * 1000:>10.0f} "
+                  f"{statistics.median(frames) * 1000:>15.0f} {min(frames) * 1000:>8.0f}")
+            profiles[variant] = import_profile(variant, scratch, args.top)
+
+        for variant, (total, modules) in profiles.items():
+            print(f"\n-X importtime, {variant}: {total * 1000:.0f} ms in top-level imports")
+            for seconds, name in modules:
+                print(f"  {seconds * 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite driving the whole app headlessly under synthetic load.
+
+Each case starts `CTFToolkitApp` with Textual's `run_test` pilot in a fresh
+interpreter (so peak RSS is per case) and drives it like a user would:
+
+  * terminal-10k        - a command printing 10,000 lines
+  * terminal-1m         - a command printing 1,000,000 lines
+  * stderr-interleaved  - unbuffered stdout and stderr lines alternating
+  * notes-typing        - keystrokes typed into the middle of a large note
+  * ai-stub             - prompts answered by a stub LiteLLM backend with
+                          configurable latency, streamed into the AI tab
+
+Every case reports its throughput, the p50/p99 UI latency (how late the
+event loop wakes up from a 5 ms sleep while the case runs, i.e. how long a
+keypress or repaint would have to wait) and the peak RSS of the process,
+each the median of `--repeat` runs. Results are compared with a stored
+baseline; a case more than `--tolerance` worse on any of them (and, for
+latencies, at least `LATENCY_FLOOR_MS` worse) is reported as a regression
+and the exit status is 1.
+
+Notes, the search index, history, output logs and the LLM cache are kept out of the
+user's files.
+
+Usage:
+    python benchmarks/bench_suite.py [--cases NAME ...] [--save-baseline]
+                                     [--baseline PATH] [--tolerance 0.25] [--repeat 3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+CASES = ["terminal-10k", "terminal-1m", "stderr-interleaved", "notes-typing", "ai-stub"]
+
+# Metric -> whether a higher value is better
+DIRECTIONS = {"throughput": True, "p50_ms": False, "p99_ms": False, "peak_rss_mb": False}
+# Latency changes smaller than this are noise, whatever their relative size
+LATENCY_FLOOR_MS = 5.0
+
+
+def python_command(code: str) -> str:
+    """Shell command running `code` with this interpreter, unbuffered."""
+    return f"{shlex.quote(sys.executable)} -u -c {shlex.quote(code)}"
+
+
+def stub_completion(latency: float, tokens: int, token_delay: float):
+    """Async stand-in for LiteLLM's `acompletion`: waits `latency`, then streams `tokens` tokens."""
+    def chunk(text: str) -> SimpleNamespace:
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    async def completion(model, messages, stream=False, **kwargs):
+        await asyncio.sleep(latency)
+        if not stream:
+            answer = " ".join(f"word{index}" for index in range(tokens))
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=answer))])
+
+        async def chunks():
+            for index in range(tokens):
+                if token_delay:
+                    await asyncio.sleep(token_delay)
+                yield chunk(f"word{index} ")
+        return chunks()
+
+    return completion
+
+
+async def run_terminal(pilot, command: str, lines: int) -> tuple[float, str]:
+    from textual.widgets import Input
+    from ctf_toolkit import TerminalTab
+
+    tab = pilot.app.query_one(TerminalTab)
+    input_widget = pilot.app.query_one("#terminal-input", Input)
+    input_widget.focus()
+    input_widget.value = command
+    await pilot.press("enter")
+    job = tab.terminal_manager.jobs[max(tab.terminal_manager.jobs)]
+    await job.task
+    await pilot.pause() # Last batch of output painted
+    if job.return_code != 0:
+        raise RuntimeError(f"{command!r} exited with {job.return_code}")
+    return lines, "lines/s"
+
+
+async def run_notes(pilot, lines: int, keys: int) -> tuple[float, str]:
+    from bench_markdown_preview import make_document
+
+    app = pilot.app
+    app.action_focus_markdown()
+    await app.mount_tab("markdown-tab")
+    editor = app.query_one("#markdown-editor")
+    editor.text = make_document(lines)
+    await pilot.pause(0.5)
+    editor.focus()
+    editor.move_cursor((editor.document.line_count // 2, 0))
+    for index in range(keys):
+        await pilot.press("abcdefghij"[index % 10])
+    await pilot.pause(0.5) # Debounced preview catches up
+    return keys, "keys/s"
+
+
+async def run_ai(pilot, prompts: int, latency: float, tokens: int, token_delay: float) -> tuple[float, str]:
+    from textual.widgets import Input
+    from ctf_toolkit import AITab
+
+    app = pilot.app
+    app.action_focus_ai()
+    await app.mount_tab("ai-tab")
+    tab = app.query_one(AITab)
+    # A real session has LiteLLM loaded by the time questions are asked
+    for worker in list(tab.workers):
+        if worker.group == "litellm-import":
+            await worker.wait()
+    tab.llm_manager.completion = stub_completion(latency, tokens, token_delay)
+    input_widget = app.query_one("#ai-input", Input)
+    for index in range(prompts):
+        input_widget.value = f"question {index}: how do I exploit service {index}?"
+        await tab.send_prompt()
+        while tab._response_worker is not None:
+            await asyncio.sleep(0.01)
+    await pilot.pause()
+    return prompts * tokens, "tokens/s"
+
+
+async def run_case(name: str, args) -> dict:
+    """Run one case in this process and return its measurements."""
+    from ctf_toolkit import CTFToolkitApp, Metrics
+
+    count = 10_000 if name == "terminal-10k" else 1_000_000
+    loads = {
+        "terminal-10k": lambda pilot: run_terminal(pilot, f"seq {count}", count),
+        "terminal-1m": lambda pilot: run_terminal(pilot, f"seq {count}", count),
+        "stderr-interleaved": lambda pilot: run_terminal(pilot, python_command(
+            "import sys\n"
+            f"for i in range({args.stderr_lines}):\n"
+            "    (sys.stderr if i % 2 else sys.stdout).write(f'line {i}\\n')\n"
+        ), args.stderr_lines),
+        "notes-typing": lambda pilot: run_notes(pilot, args.note_lines, args.keys),
+        "ai-stub": lambda pilot: run_ai(pilot, args.prompts, args.llm_latency, args.llm_tokens,
+                                        args.llm_token_delay),
+    }
+    app = CTFToolkitApp()
+    async with app.run_test(size=(160, 50)) as pilot:
+        await pilot.pause()
+        lag = Metrics(samples=1_000_000)
+        sampler = asyncio.create_task(lag.sample_event_loop_lag(0.005))
+        started = time.perf_counter()
+        work, unit = await loads[name](pilot)
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+    latency = lag.summary("event_loop_lag_seconds")
+    peak_rss = None
+    if resource is not None:
+        # Kilobytes on Linux, bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+    return {
+        "throughput": work / elapsed,
+        "unit": unit,
+        "seconds": elapsed,
+        "p50_ms": latency.quantile(0.5) * 1000,
+        "p99_ms": latency.quantile(0.99) * 1000,
+        "peak_rss_mb": peak_rss,
+    }
+
+
+def run_child(name: str, argv: list[str], scratch: str) -> dict:
+    """Run a case in a fresh interpreter, with the app's files under `scratch`."""
+    env = dict(os.environ)
+    env.update({
+        "NOTES_DIR": os.path.join(scratch, name, "notes"),
+        "HISTORY_PATH": os.path.join(scratch, name, "history.jsonl"),
+        "TERMINAL_LOG_DIR": os.path.join(scratch, name, "logs"),
+        "SEARCH_INDEX_PATH": ":memory:",
+        "LLM_CACHE": "0",
+        "PYTHONPATH": os.pathsep.join([ROOT, os.path.dirname(os.path.abspath(__file__)),
+                                       env.get("PYTHONPATH", "")]),
+    })
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", name, *argv],
+        env=env, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"case {name} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def median_result(runs: list[dict]) -> dict:
+    """Per-metric median of repeated runs of a case."""
+    result = dict(runs[0])
+    for key, value in runs[0].items():
+        if isinstance(value, (int, float)):
+            result[key] = statistics.median(run[key] for run in runs)
+    return result
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> tuple[str, bool]:
+    """Relative change against the baseline per metric, and whether any is a regression."""
+    changes, regressed = [], False
+    for metric, higher_is_better in DIRECTIONS.items():
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > tolerance and not (metric.endswith("_ms") and new - old < LATENCY_FLOOR_MS):
+            flag, regressed = "!", True
+        changes.append(f"{metric.split('_')[0]} {change:+.0%}{flag}")
+    return ", ".join(changes), regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES, help="cases to run")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown/growth reported as a regression")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the median is reported")
+    parser.add_argument("--stderr-lines", type=int, default=100_000, help="lines of the stderr-interleaved case")
+    parser.add_argument("--note-lines", type=int, default=5000, help="size of the note typed into")
+    parser.add_argument("--keys", type=int, default=100, help="keystrokes typed into the note")
+    parser.add_argument("--prompts", type=int, default=5, help="prompts sent to the stub LLM")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub LLM seconds before the first token")
+    parser.add_argument("--llm-tokens", type=int, default=500, help="tokens per stub LLM answer")
+    parser.add_argument("--llm-token-delay", type=float, default=0.0, help="stub LLM seconds between tokens")
+    parser.add_argument("--child", choices=CASES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_case(args.child, args))))
+        return
+
+    # Load parameters are passed on to each case's interpreter
+    passed = ["--stderr-lines", str(args.stderr_lines), "--note-lines", str(args.note_lines),
+              "--keys", str(args.keys), "--prompts", str(args.prompts),
+              "--llm-latency", str(args.llm_latency), "--llm-tokens", str(args.llm_tokens),
+              "--llm-token-delay", str(args.llm_token_delay)]
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get("cases", {})
+
+    results, regressions = {}, []
+    print(f"{'case':<20} {'throughput':>18} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8}  vs baseline")
+    with tempfile.TemporaryDirectory() as scratch:
+        for name in args.cases:
+            runs = [run_child(name, passed, scratch) for _ in range(max(1, args.repeat))]
+            result = results[name] = median_result(runs)
+            versus, regressed = ("", False)
+            if name in baseline:
+                versus, regressed = compare(result, baseline[name], args.tolerance)
+            if regressed:
+                regressions.append(name)
+            rss = "-" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f}"
+            throughput = f"{result['throughput']:,.0f} {result['unit']}"
+            print(f"{name:<20} {throughput:>18} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+                  f" {rss:>8}  {versus}")
+
+    if args.save_baseline:
+        stored = {"cases": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                stored = json.load(f)
+        stored["machine"] = {"python": platform.python_version(), "platform": platform.platform(),
+                             "processor": platform.machine(), "cpus": os.cpu_count()}
+        stored["parameters"] = passed + ["--repeat", str(args.repeat)]
+        stored["cases"].update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\nRegressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
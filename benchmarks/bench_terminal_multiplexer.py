@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for TerminalManager.execute_command output multiplexing.
+
+Compares the event-driven single-channel implementation against the previous
+two-queue polling loop (reproduced below as `PollingTerminalManager`) on:
+
+  * throughput  - lines/sec while draining `seq 1 N`
+  * idle CPU    - CPU seconds burnt by this process while a quiet command sleeps
+  * latency     - delay between a line being printed and it being yielded
+
+Usage:
+    python benchmarks/bench_terminal_multiplexer.py [--lines N] [--idle SECONDS]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+# Keep the benchmark's commands out of the user's history and output logs
+SCRATCH = tempfile.mkdtemp(prefix="bench-terminal-")
+os.environ.setdefault("HISTORY_PATH", os.path.join(SCRATCH, "history.jsonl"))
+os.environ.setdefault("TERMINAL_LOG_DIR", os.path.join(SCRATCH, "logs"))
+
+from ctf_toolkit import TerminalManager  # noqa: E402
+
+
+class PollingTerminalManager(TerminalManager):
+    """The pre-multiplexer implementation: two queues polled every 1 ms."""
+
+    async def execute_command(self, command):
+        process = await asyncio.create_subprocess_shell(
+            command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout_queue: asyncio.Queue[str] = asyncio.Queue()
+        stderr_queue: asyncio.Queue[str] = asyncio.Queue()
+        stdout_task = asyncio.create_task(self._poll_stream(process.stdout, stdout_queue))
+        stderr_task = asyncio.create_task(self._poll_stream(process.stderr, stderr_queue))
+        while True:
+            stdout_done = stdout_task.done()
+            stderr_done = stderr_task.done()
+            stdout_empty = stdout_queue.empty()
+            stderr_empty = stderr_queue.empty()
+            if stdout_done and stderr_done and stdout_empty and stderr_empty:
+                break
+            if not stdout_empty:
+                yield ('stdout', await stdout_queue.get())
+            if not stderr_empty:
+                yield ('stderr', await stderr_queue.get())
+            if stdout_empty and stderr_empty and (not stdout_done or not stderr_done):
+                await asyncio.sleep(0.001)
+        await asyncio.gather(stdout_task, stderr_task)
+        await process.wait()
+        yield ('returncode', process.returncode or 0)
+
+    async def _poll_stream(self, stream, queue):
+        while True:
+            line_bytes = await stream.readline()
+            if not line_bytes:
+                break
+            await queue.put(line_bytes.decode('utf-8', errors='replace'))
+
+
+async def drain(manager, command):
+    """Consume a command's output and return (lines, wall seconds, cpu seconds)."""
+    lines = 0
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    async for stream_type, _ in manager.execute_command(command):
+        if stream_type in ('stdout', 'stderr'):
+            lines += 1
+    return lines, time.perf_counter() - wall, time.process_time() - cpu
+
+
+async def latency(manager, samples):
+    """Median and max delay (ms) between a child printing a timestamp and receiving it."""
+    script = (
+        "import time,sys\n"
+        f"for _ in range({samples}):\n"
+        "    print(time.time(), flush=True); time.sleep(0.02)\n"
+    )
+    command = f"{sys.executable} -c '{script}'"
+    delays = []
+    async for stream_type, value in manager.execute_command(command):
+        if stream_type == 'stdout':
+            delays.append((time.time() - float(value)) * 1000)
+    return statistics.median(delays), max(delays)
+
+
+async def run(args):
+    managers = [("polling", PollingTerminalManager()), ("event-driven", TerminalManager())]
+    print(f"{'implementation':<14} {'lines/sec':>12} {'idle cpu %':>11} {'p50 lat ms':>11} {'max lat ms':>11}")
+    for name, manager in managers:
+        lines, wall, _ = await drain(manager, f"seq 1 {args.lines}")
+        _, idle_wall, idle_cpu = await drain(manager, f"sleep {args.idle}")
+        p50, worst = await latency(manager, args.samples)
+        print(
+            f"{name:<14} {lines / wall:>12,.0f} {100 * idle_cpu / idle_wall:>11.2f}"
+            f" {p50:>11.3f} {worst:>11.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=200_000, help="lines emitted by the throughput case")
+    parser.add_argument("--idle", type=float, default=2.0, help="seconds of the quiet command")
+    parser.add_argument("--samples", type=int, default=50, help="timestamps printed by the latency case")
+    try:
+        asyncio.run(run(parser.parse_args()))
+    finally:
+        shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
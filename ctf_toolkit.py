@@ -14,28 +14,1279 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+import array
 import asyncio
+import base64
+import bisect
+import codecs
+import collections
+import contextlib
+import hashlib
+import importlib
+import itertools
+import json
+import math
+import mmap
+import multiprocessing
+import operator
+import re
+import shlex
+import signal
+import sqlite3
+import struct
 import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from collections import deque
 from datetime import datetime
-from typing import Optional, AsyncGenerator, Tuple, Any
+from typing import Optional, AsyncGenerator, Tuple, Any, Callable, Awaitable, NamedTuple, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError: # Python < 3.11
+    import sre_constants, sre_parse
+
+from rich.cells import cell_len
+from rich.markdown import Markdown as RichMarkdown
+from rich.text import Text
 
 from textual.app import App, ComposeResult
 from textual.containers import Container, Horizontal, Vertical
 from textual.widgets import (
     TabbedContent, TabPane, TextArea, Static, Input, Button, 
-    DataTable, Footer, Header, Markdown, Select, Label
+    DataTable, Footer, Header, Markdown, Select, Label, Checkbox, OptionList, ProgressBar
 )
 from textual.binding import Binding
+try:
+    from textual.document._wrapped_document import WrappedDocument
+except ImportError: # Textual before soft-wrapping TextArea
+    WrappedDocument = None
+from textual.geometry import Size
 from textual.message import Message
+from textual.widget import AwaitMount
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+from textual.timer import Timer
+from textual.worker import Worker
 
-from litellm import acompletion
 import os
 
+try:
+    # POSIX only; persistent PTY shell sessions are unavailable without them
+    import fcntl
+    import pty
+    import termios
+except ImportError:
+    fcntl = pty = termios = None
+
+# =============================================================================
+# CONFIGURATION - Tunables read from the environment (.env)
+# =============================================================================
+
+# Scrollback cap and flush rate for command output
+TERMINAL_SCROLLBACK_LINES = int(os.getenv("TERMINAL_SCROLLBACK_LINES", "10000"))
+TERMINAL_FLUSH_FPS = int(os.getenv("TERMINAL_FLUSH_FPS", "30"))
+# Max output chunks buffered between a subprocess and its consumer (0 = unbounded)
+TERMINAL_QUEUE_SIZE = int(os.getenv("TERMINAL_QUEUE_SIZE", "1024"))
+# How command output is read: 'line', 'chunk' (incremental UTF-8) or 'raw' (bytes)
+TERMINAL_STREAM_MODE = os.getenv("TERMINAL_STREAM_MODE", "line")
+TERMINAL_CHUNK_SIZE = int(os.getenv("TERMINAL_CHUNK_SIZE", "65536"))
+# Commands allowed to run at the same time; further jobs wait in the queue
+TERMINAL_MAX_JOBS = int(os.getenv("TERMINAL_MAX_JOBS", "4"))
+# Finished jobs (and their output buffers) kept for the job table; older ones are forgotten
+TERMINAL_MAX_FINISHED_JOBS = int(os.getenv("TERMINAL_MAX_FINISHED_JOBS", "100"))
+# Run foreground commands in one long-lived PTY shell instead of a fresh /bin/sh each
+TERMINAL_SESSION = os.getenv("TERMINAL_SESSION", "0").lower() in ("1", "true", "yes")
+TERMINAL_SHELL = os.getenv("TERMINAL_SHELL", "/bin/sh")
+# Command history kept in memory and in an append-only file across sessions
+HISTORY_PATH = Path(os.getenv("HISTORY_PATH", "~/.ctf_toolkit/history.jsonl")).expanduser()
+HISTORY_MAX_ENTRIES = int(os.getenv("HISTORY_MAX_ENTRIES", "100000"))
+# Every command's full output teed to its own log file, browsable after restart
+TERMINAL_LOG = os.getenv("TERMINAL_LOG", "1").lower() in ("1", "true", "yes")
+TERMINAL_LOG_DIR = Path(os.getenv("TERMINAL_LOG_DIR", "~/.ctf_toolkit/logs")).expanduser()
+TERMINAL_LOG_MAX_MB = float(os.getenv("TERMINAL_LOG_MAX_MB", "4096"))
+# Scan command output for flags, hashes, encoded blobs and credentials
+SCANNER = os.getenv("SCANNER", "1").lower() in ("1", "true", "yes")
+SCANNER_FLAG_FORMATS = [f.strip() for f in os.getenv("SCANNER_FLAG_FORMATS", "flag,ctf,picoCTF,HTB,THM").split(",") if f.strip()]
+# Optional JSON file of extra {"name": "regex"} patterns
+SCANNER_PATTERNS_FILE = os.getenv("SCANNER_PATTERNS_FILE", "")
+
+# Build each tab's widgets when it is first shown rather than at startup
+UI_LAZY_TABS = os.getenv("UI_LAZY_TABS", "1").lower() in ("1", "true", "yes")
+
+# On-disk cache of LLM answers
+LLM_CACHE = os.getenv("LLM_CACHE", "1").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", "~/.ctf_toolkit/llm_cache.sqlite3")).expanduser()
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))) # Seconds
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "50"))
+# Token budget for conversation history sent with each prompt, and for its rolling summary
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "4000"))
+LLM_SUMMARY_TOKENS = int(os.getenv("LLM_SUMMARY_TOKENS", "500"))
+# More models queried besides LITELLM_MODEL ("model" or "model=timeout", comma
+# separated) and how: 'single' (LITELLM_MODEL, the others as fallbacks on
+# error or timeout), 'race' (all at once, the first to answer wins) or
+# 'compare' (all answers side by side)
+LLM_MODELS = os.getenv("LLM_MODELS", "")
+LLM_MODE = os.getenv("LLM_MODE", "single")
+# Seconds a model may take to its first token (and between tokens) before it
+# counts as failed, and how many requests may be in flight at once
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Notes preview: seconds of typing pause before re-rendering, and whether to
+# re-render only changed blocks / skip rendering while the Notes tab is hidden
+NOTES_PREVIEW_DEBOUNCE = float(os.getenv("NOTES_PREVIEW_DEBOUNCE", "0.25"))
+NOTES_PREVIEW_INCREMENTAL = os.getenv("NOTES_PREVIEW_INCREMENTAL", "1").lower() in ("1", "true", "yes")
+NOTES_PREVIEW_PAUSE_HIDDEN = os.getenv("NOTES_PREVIEW_PAUSE_HIDDEN", "1").lower() in ("1", "true", "yes")
+# Where notes are kept (<challenge>/<note>.md) and how long after the last edit they are saved
+NOTES_DIR = Path(os.getenv("NOTES_DIR", "~/.ctf_toolkit/notes")).expanduser()
+NOTES_AUTOSAVE_DELAY = float(os.getenv("NOTES_AUTOSAVE_DELAY", "1.0"))
+
+# Relevant excerpts of terminal output and notes injected into AI prompts
+LLM_RETRIEVAL_K = int(os.getenv("LLM_RETRIEVAL_K", "5"))
+LLM_RETRIEVAL_TOKENS = int(os.getenv("LLM_RETRIEVAL_TOKENS", "1500"))
+LLM_RETRIEVAL_DOCUMENTS = int(os.getenv("LLM_RETRIEVAL_DOCUMENTS", "50"))
+
+# Full-text search over notes, command history and output (':memory:' keeps it in RAM)
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "~/.ctf_toolkit/search.sqlite3")
+SEARCH_INDEX_MAX_MB = float(os.getenv("SEARCH_INDEX_MAX_MB", "1024"))
+# Seconds between writes of newly streamed output into the index
+SEARCH_INDEX_INTERVAL = float(os.getenv("SEARCH_INDEX_INTERVAL", "1.0"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "200"))
+
+# Instrumentation: seconds between event-loop lag samples, recent observations
+# kept per timing for percentiles, the JSON-lines export file and how often a
+# snapshot is appended to it (0 = only from the Metrics tab), and the port of
+# a local Prometheus-style text endpoint (0 = off)
+METRICS_LAG_INTERVAL = float(os.getenv("METRICS_LAG_INTERVAL", "0.25"))
+METRICS_SAMPLES = int(os.getenv("METRICS_SAMPLES", "1024"))
+METRICS_EXPORT_PATH = Path(os.getenv("METRICS_EXPORT_PATH", "~/.ctf_toolkit/metrics.jsonl")).expanduser()
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "0"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Toolbox transforms (XOR, hash cracking, entropy, decoding) run in worker
+# processes (0 = one per CPU), a chunk of the input file per task
+TOOLBOX_WORKERS = int(os.getenv("TOOLBOX_WORKERS", "0"))
+TOOLBOX_CHUNK_MB = float(os.getenv("TOOLBOX_CHUNK_MB", "4"))
+TOOLBOX_WORDLIST = os.getenv("TOOLBOX_WORDLIST", "/usr/share/wordlists/rockyou.txt")
+TOOLBOX_DECODE_DEPTH = int(os.getenv("TOOLBOX_DECODE_DEPTH", "4"))
+
 # =============================================================================
 # MANAGERS - Business Logic Layer
 # =============================================================================
 
+class Counter:
+    """Monotonic count; hot paths hold on to it and add to `value` directly."""
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+
+class Gauge:
+    """Value that goes up and down."""
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+
+class Summary:
+    """Count and sum of observations, plus the most recent ones for percentiles."""
+    __slots__ = ("count", "total", "maximum", "samples")
+
+    def __init__(self, samples: int = METRICS_SAMPLES):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.samples: deque[float] = deque(maxlen=max(1, samples))
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+        self.samples.append(value)
+
+    def quantile(self, q: float) -> float:
+        """Nearest-rank quantile of the recent observations (0 when there are none)."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """
+    In-process registry of counters, gauges and timing summaries.
+
+    Metrics are created on first use by name (Prometheus naming, seconds and
+    bytes as units) and are cheap to update: callers keep the returned
+    object and change it in place. `snapshot()` turns the registry into a
+    dict for display or JSON-lines export, `to_prometheus()` into the
+    Prometheus text exposition format served by `serve()`.
+    """
+
+    QUANTILES = (0.5, 0.9, 0.99)
+    REQUEST_TIMEOUT = 5.0 # Seconds a scraper gets to send its request headers
+
+    def __init__(self, samples: int = METRICS_SAMPLES):
+        self.samples = samples
+        self._metrics: dict[str, Tuple[str, str, Any]] = {} # name -> (type, description, metric)
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get(name, "counter", description, Counter)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        return self._get(name, "gauge", description, Gauge)
+
+    def summary(self, name: str, description: str = "") -> Summary:
+        return self._get(name, "summary", description, lambda: Summary(self.samples))
+
+    @contextlib.contextmanager
+    def timer(self, name: str, description: str = "") -> Iterator[None]:
+        """Observe the seconds spent in the `with` block in summary `name`."""
+        summary = self.summary(name, description)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            summary.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Current values: numbers for counters and gauges, a dict for summaries."""
+        values: dict[str, Any] = {}
+        for name, (kind, _, metric) in self._metrics.items():
+            if kind == "summary":
+                values[name] = {
+                    "count": metric.count, "sum": metric.total, "max": metric.maximum,
+                    **{f"p{round(q * 100)}": metric.quantile(q) for q in self.QUANTILES},
+                }
+            else:
+                values[name] = metric.value
+        return values
+
+    def to_prometheus(self) -> str:
+        """The registry in the Prometheus text exposition format."""
+        lines = []
+        for name, (kind, description, metric) in sorted(self._metrics.items()):
+            if description:
+                lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "summary":
+                for q in self.QUANTILES:
+                    lines.append(f'{name}{{quantile="{q}"}} {metric.quantile(q):.6g}')
+                lines.append(f"{name}_sum {metric.total:.6g}")
+                lines.append(f"{name}_count {metric.count}")
+            else:
+                lines.append(f"{name} {metric.value:.6g}")
+        return "\n".join(lines) + "\n"
+
+    def export_jsonl(self, path: Path = METRICS_EXPORT_PATH) -> None:
+        """Append a timestamped snapshot to `path` as one JSON line."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"time": time.time(), "metrics": self.snapshot()}) + "\n")
+
+    async def export_periodically(
+        self, path: Path = METRICS_EXPORT_PATH, interval: float = METRICS_EXPORT_INTERVAL
+    ) -> None:
+        """Append a snapshot to `path` every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            with contextlib.suppress(OSError):
+                await asyncio.to_thread(self.export_jsonl, path)
+
+    async def sample_event_loop_lag(self, interval: float = METRICS_LAG_INTERVAL) -> None:
+        """
+        Measure how late the event loop wakes up from a `sleep(interval)`.
+
+        Runs until cancelled. Anything blocking the loop (a slow handler,
+        synchronous I/O, a long render) shows up as lag.
+        """
+        lag = self.summary("event_loop_lag_seconds", "Delay of event loop wake-ups")
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag.observe(max(0.0, time.perf_counter() - started - interval))
+
+    async def serve(self, port: int = METRICS_PORT, host: str = "127.0.0.1") -> None:
+        """Serve `to_prometheus()` over HTTP on `host:port` until cancelled."""
+        async def respond(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                # Any request gets the metrics; the request itself is not parsed.
+                # A client that never finishes its headers is dropped.
+                await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.REQUEST_TIMEOUT)
+                body = self.to_prometheus().encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: text/plain; version=0.0.4\r\n"
+                    + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(respond, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def _get(self, name: str, kind: str, description: str, factory: Callable[[], Any]) -> Any:
+        registered = self._metrics.get(name)
+        if registered is None:
+            registered = self._metrics[name] = (kind, description, factory())
+        elif registered[0] != kind:
+            raise ValueError(f"Metric {name!r} is a {registered[0]}, not a {kind}")
+        return registered[2]
+
+
+class Job:
+    """
+    A command scheduled by TerminalManager.
+
+    Holds the job's status and timing and keeps its output in a bounded
+    `ScrollbackBuffer`, so finished and background jobs can be inspected
+    after the fact without keeping unbounded output around. The complete
+    output goes to the job's `OutputLog`, if logging is on. TerminalManager
+    only keeps the last `max_finished_jobs` finished jobs.
+    """
+
+    def __init__(
+        self,
+        job_id: int,
+        command: str,
+        mode: str,
+        background: bool = False,
+        use_session: Optional[bool] = None,
+    ):
+        self.id = job_id
+        self.command = command
+        self.mode = mode
+        self.background = background
+        self.use_session = use_session
+        self.status = 'queued' # queued -> running -> done | failed | killed
+        self.return_code: Optional[int] = None
+        self.lines = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.output = ScrollbackBuffer()
+        self.findings: list["Finding"] = []
+        self.log: Optional[OutputLog] = None # Full output, while and after it runs
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def is_active(self) -> bool:
+        """Whether the job is still queued or running."""
+        return self.status in ('queued', 'running')
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds the job has been running (or ran for)."""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+
+class ShellSession:
+    """
+    A long-lived shell attached to a pseudo-terminal.
+
+    Commands are written to the shell's stdin pipe and run with the PTY as
+    their stdin/stdout/stderr, so tools see a real terminal and shell state
+    (cwd, variables, functions) persists between commands. Because the shell
+    itself reads from a pipe it is non-interactive: it prints no prompts and
+    the commands are never echoed. After each command the shell prints a
+    marker carrying the exit code and working directory, which is how the
+    output of one command is told apart from the next.
+
+    Output is read asynchronously from the PTY master. Since a terminal
+    merges both streams, everything is reported as 'stdout'.
+    """
+
+    MARKER = b"\x1f__ctf_done__"
+    ABANDON_TIMEOUT = 2.0 # Seconds an abandoned command gets to stop before the session is closed
+    INTERRUPT_INTERVAL = 0.2 # Ctrl-C is re-sent this often meanwhile
+
+    def __init__(self, shell: str = TERMINAL_SHELL, queue_size: int = TERMINAL_QUEUE_SIZE):
+        self.shell = shell
+        self.queue_size = queue_size
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.cwd: Optional[Path] = None
+        self._master: Optional[int] = None
+        self._output: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+        self._reading = False
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def is_supported() -> bool:
+        """Whether PTY sessions are available on this platform."""
+        return pty is not None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    @property
+    def busy(self) -> bool:
+        """Whether a command is currently running in the session."""
+        return self._lock.locked()
+
+    async def start(self, cwd: Path) -> None:
+        """Spawns the shell in `cwd` on a fresh pseudo-terminal."""
+        master, slave = pty.openpty()
+        # Plain "\n" line endings and a sensible window size for the commands
+        attrs = termios.tcgetattr(slave)
+        attrs[1] &= ~termios.ONLCR
+        termios.tcsetattr(slave, termios.TCSANOW, attrs)
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack("HHHH", 50, 200, 0, 0))
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                self.shell,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=slave,
+                stderr=slave,
+                cwd=str(cwd),
+                env={**os.environ, "TERM": "dumb"},
+                start_new_session=True,
+                # Make the PTY the controlling terminal of the new session so
+                # Ctrl-C written to the master interrupts the running command.
+                preexec_fn=lambda: fcntl.ioctl(1, termios.TIOCSCTTY, 0),
+            )
+        finally:
+            os.close(slave)
+        os.set_blocking(master, False)
+        self._master = master
+        self._output = asyncio.Queue()
+        self.cwd = cwd
+        self._resume_reading()
+        # The shell survives Ctrl-C while commands still get the default action
+        await self._send_script("trap : INT\n")
+
+    async def run(self, command: str, raw: bool = False) -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Runs a command in the session and yields its output as it arrives.
+
+        Yields the same ('stdout', ...), ('error', str) and ('returncode', int)
+        items as `TerminalManager.execute_command`; stdout carries decoded text
+        chunks, or `bytes` if `raw` is set. If the consumer stops early the
+        command is interrupted and its remaining output discarded, and if it
+        does not stop the session is closed.
+        """
+        async with self._lock:
+            if not self.alive:
+                raise RuntimeError("Shell session is not running.")
+            await self._send_script(
+                f"command eval {shlex.quote(command)} < /dev/tty\n"
+                f"printf '\\037__ctf_done__%s %s\\n' \"$?\" \"$PWD\"\n"
+            )
+            decoder = None if raw else codecs.getincrementaldecoder('utf-8')(errors='replace')
+            buffer = b""
+            finished = False
+            try:
+                while True:
+                    data = await self._read()
+                    if data is None: # The shell itself exited (e.g. `exit`)
+                        finished = True
+                        await self.close()
+                        yield ('error', "Shell session ended.")
+                        yield ('returncode', self.process.returncode or 1)
+                        return
+                    buffer += data
+                    index = buffer.find(self.MARKER)
+                    # Everything before the marker is output. Without a marker,
+                    # hold back a tail that could be the start of one.
+                    cut = index if index >= 0 else len(buffer) - self._marker_prefix_length(buffer)
+                    if cut:
+                        output, buffer = buffer[:cut], buffer[cut:]
+                        if decoder is not None:
+                            output = decoder.decode(output)
+                        if output:
+                            yield ('stdout', output)
+                    if index < 0 or b"\n" not in buffer:
+                        continue
+                    trailer = buffer[len(self.MARKER):].split(b"\n", 1)[0]
+                    return_code, _, cwd = trailer.decode('utf-8', errors='replace').partition(" ")
+                    self.cwd = Path(cwd)
+                    finished = True
+                    if decoder is not None:
+                        tail = decoder.decode(b"", final=True)
+                        if tail:
+                            yield ('stdout', tail)
+                    yield ('returncode', int(return_code))
+                    return
+            finally:
+                if not finished:
+                    await self._abandon()
+
+    def send_input(self, text: str) -> None:
+        """Types text into the terminal of the running command."""
+        if self._master is not None:
+            os.write(self._master, text.encode('utf-8'))
+
+    def interrupt(self) -> None:
+        """Sends Ctrl-C to the running command."""
+        self.send_input("\x03")
+
+    async def close(self) -> None:
+        """Kills the shell and everything it started."""
+        if self._master is not None:
+            asyncio.get_running_loop().remove_reader(self._master)
+            os.close(self._master)
+            self._master = None
+        if self.alive:
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(self.process.pid, signal.SIGKILL)
+            await self.process.wait()
+
+    async def _send_script(self, script: str) -> None:
+        assert self.process is not None and self.process.stdin is not None
+        self.process.stdin.write(script.encode('utf-8'))
+        await self.process.stdin.drain()
+
+    async def _read(self) -> Optional[bytes]:
+        data = await self._output.get()
+        if not self._reading and self._output.qsize() < self.queue_size // 2:
+            self._resume_reading()
+        return data
+
+    async def _abandon(self) -> None:
+        """Interrupts the current command and skips to its marker, or gives up on the session."""
+        # Ctrl-C is repeated: one sent before the shell has started the
+        # command only reaches the shell itself, which ignores it
+        skip = asyncio.ensure_future(self._skip_to_marker())
+        try:
+            for _ in range(round(self.ABANDON_TIMEOUT / self.INTERRUPT_INTERVAL)):
+                self.interrupt()
+                done, _ = await asyncio.wait({skip}, timeout=self.INTERRUPT_INTERVAL)
+                if done:
+                    return
+            await self.close()
+        finally:
+            skip.cancel()
+
+    async def _skip_to_marker(self) -> None:
+        buffer = b""
+        while True:
+            data = await self._read()
+            if data is None:
+                return
+            buffer += data
+            index = buffer.find(self.MARKER)
+            if index < 0:
+                buffer = buffer[-len(self.MARKER):]
+            elif b"\n" in buffer[index:]:
+                return
+            else:
+                buffer = buffer[index:]
+
+    def _marker_prefix_length(self, buffer: bytes) -> int:
+        start = buffer.rfind(self.MARKER[:1], -len(self.MARKER))
+        if start >= 0 and self.MARKER.startswith(buffer[start:]):
+            return len(buffer) - start
+        return 0
+
+    def _resume_reading(self) -> None:
+        if self._master is not None:
+            asyncio.get_running_loop().add_reader(self._master, self._on_readable)
+            self._reading = True
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self._master, TERMINAL_CHUNK_SIZE)
+        except OSError: # EIO once the shell and all its children are gone
+            data = b""
+        if not data:
+            asyncio.get_running_loop().remove_reader(self._master)
+            self._reading = False
+            self._output.put_nowait(None)
+            return
+        self._output.put_nowait(data)
+        # Backpressure: stop reading the PTY while the consumer catches up
+        if self.queue_size and self._output.qsize() >= self.queue_size:
+            asyncio.get_running_loop().remove_reader(self._master)
+            self._reading = False
+
+
+class Finding(NamedTuple):
+    """A match of one of the `OutputScanner` patterns."""
+    kind: str
+    value: str
+    line: str
+
+
+class OutputScanner:
+    """
+    Finds flags, hashes, encoded blobs and credentials in command output.
+
+    All patterns are compiled into one regex of named alternatives, so a
+    line is matched once whatever the number of patterns. Since Python's
+    regex engine tries every alternative at every position, lines are first
+    passed through a cheap gate: each pattern declares trigger substrings
+    (e.g. ``flag{``) or needs a long token of base64 characters, and the
+    combined regex only runs on lines that contain one. Typical tool output
+    then costs a couple of microseconds per line.
+
+    `scan_stream()` is a pass-through stage for the output generator of
+    `TerminalManager.execute_command`.
+    """
+
+    LONG_TOKEN = 32 # Shortest hash / hex / base64 blob worth reporting
+    MAX_LINE = 65536 # Partial lines longer than this are scanned in pieces
+
+    def __init__(
+        self,
+        flag_formats: list[str] = SCANNER_FLAG_FORMATS,
+        patterns: Optional[dict[str, str]] = None,
+    ):
+        """
+        Args:
+            flag_formats: Flag prefixes, matched case-insensitively as
+                          ``<prefix>{...}``.
+            patterns: Extra ``{name: regex}`` patterns. They are combined
+                      into one regex, so they must not use backreferences.
+                      Their trigger is derived from the literal text they
+                      require; patterns without any are tried on every line.
+        """
+        prefixes = "|".join(re.escape(f) for f in flag_formats) or "flag"
+        # name -> (regex, trigger substrings (lowercase) or None for a long token)
+        self.patterns: dict[str, Tuple[str, Optional[list[str]]]] = {
+            "flag": (rf"(?i:\b(?:{prefixes})\{{[^\s{{}}]{{1,200}}\}})",
+                     [f.lower() + "{" for f in flag_formats] or ["flag{"]),
+            "private-key": (r"-----BEGIN [A-Z ]*PRIVATE KEY-----", ["private key"]),
+            "aws-key": (r"\b(?:AKIA|ASIA)[0-9A-Z]{16}\b", ["akia", "asia"]),
+            "jwt": (r"\beyJ[\w-]{8,}\.[\w-]{8,}\.[\w-]{8,}", ["eyj"]),
+            "crypt-hash": (r"\$(?:2[aby]?|1|5|6|y)\$[./0-9A-Za-z$]{8,}", ["$"]),
+            "credential": (r"(?i:\b(?:pass(?:word|wd)?|pwd|secret|api[_-]?key|token)\s*[:=]\s*\S+)",
+                           ["pass", "pwd", "secret", "key", "token"]),
+            "hash": (r"\b(?:[0-9a-fA-F]{128}|[0-9a-fA-F]{64}|[0-9a-fA-F]{40}|[0-9a-fA-F]{32})\b", None),
+            "hex": (r"\b(?:0x)?[0-9a-fA-F]{48,}\b", None),
+            "base64": (r"(?<![\w+/=])[A-Za-z0-9+/]{%d,}={0,2}(?![\w+/=])" % self.LONG_TOKEN, None),
+        }
+        for name, regex in (patterns or {}).items():
+            literals = [lit.lower() for lit in SearchIndex.required_literals(regex)]
+            self.patterns[name] = (regex, literals[:1] or [""]) # "" is in every line
+        self._names = list(self.patterns)
+        self._regex = re.compile("|".join(
+            f"(?P<p{i}>{regex})" for i, (regex, _) in enumerate(self.patterns.values())
+        ))
+        triggers = {t for _, pattern_triggers in self.patterns.values() if pattern_triggers for t in pattern_triggers}
+        # A trigger containing another one (picoctf{ / ctf{) is redundant
+        self._triggers = tuple(t for t in triggers if not any(o != t and o in t for o in triggers))
+        self._long_token = re.compile("[A-Za-z0-9+/]{%d}" % self.LONG_TOKEN).search
+
+    @classmethod
+    def from_file(cls, path: str = SCANNER_PATTERNS_FILE, **kwargs) -> "OutputScanner":
+        """Scanner with the extra patterns of a JSON ``{name: regex}`` file, if given."""
+        patterns = None
+        if path:
+            patterns = json.loads(Path(path).expanduser().read_text(encoding="utf-8"))
+        return cls(patterns=patterns, **kwargs)
+
+    def might_match(self, line: str) -> bool:
+        """Cheap gate: False means no pattern can match `line`."""
+        lower = line.lower()
+        for trigger in self._triggers:
+            if trigger in lower:
+                return True
+        return self._long_token(line) is not None
+
+    def scan(self, line: str) -> list[Tuple[str, int, int]]:
+        """Return (kind, start, end) of every match in `line`."""
+        if not self.might_match(line):
+            return []
+        names = self._names
+        matches = []
+        for match in self._regex.finditer(line):
+            kind = names[int(match.lastgroup[1:])]
+            if kind == "base64" and not self._looks_like_base64(match.group()):
+                continue
+            matches.append((kind, match.start(), match.end()))
+        return matches
+
+    def findings(self, line: str) -> list[Finding]:
+        return [Finding(kind, line[start:end], line) for kind, start, end in self.scan(line)]
+
+    async def scan_stream(
+        self,
+        items: AsyncGenerator[Tuple[str, Any], None],
+        on_finding: Callable[[Finding], None],
+    ) -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Pass `execute_command` output through, reporting each distinct finding once.
+
+        Text is scanned a whole line at a time (chunks are split and their
+        trailing partial lines held back), so matches spanning chunk
+        boundaries are found. Raw byte chunks are not scanned.
+        """
+        partial = {"stdout": "", "stderr": ""}
+        seen: set[Tuple[str, str]] = set()
+
+        def scan_text(text: str) -> None:
+            # Most output fails the gate as a whole, without being split
+            if not self.might_match(text):
+                return
+            for line in text.split("\n"):
+                for finding in self.findings(line):
+                    key = (finding.kind, finding.value)
+                    if key not in seen:
+                        seen.add(key)
+                        on_finding(finding)
+
+        try:
+            async for stream_type, value in items:
+                if stream_type in partial and isinstance(value, str):
+                    rest = partial[stream_type]
+                    if not rest and value.endswith("\n"):
+                        scan_text(value) # Whole lines, as in 'line' mode
+                    else:
+                        text = rest + value
+                        complete, _, rest = text.rpartition("\n")
+                        if len(rest) > self.MAX_LINE:
+                            complete, rest = text, ""
+                        partial[stream_type] = rest
+                        if complete:
+                            scan_text(complete)
+                yield stream_type, value
+        finally:
+            for rest in partial.values():
+                if rest:
+                    scan_text(rest)
+
+    @staticmethod
+    def _looks_like_base64(token: str) -> bool:
+        # Skip long identifiers and paths: real blobs mix cases and digits
+        body = token.rstrip("=")
+        return (
+            len(token) % 4 == 0 or token.endswith("=")
+        ) and any(c.isdigit() or c in "+/" for c in body) and not body.isupper() and not body.islower()
+
+
+def write_atomic(path: Path, content: str) -> None:
+    """Replace `path` with `content`, so a crash leaves either the old or the new file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            tmp.unlink()
+        raise
+
+
+class HistoryEntry:
+    """One executed command. Slotted, since months of history are kept in memory."""
+
+    __slots__ = ("command", "cwd", "started", "duration", "exit_code", "output_size")
+
+    def __init__(
+        self,
+        command: str,
+        cwd: str,
+        started: float,
+        duration: Optional[float] = None,
+        exit_code: Optional[int] = None,
+        output_size: int = 0,
+    ):
+        self.command = command
+        self.cwd = cwd
+        self.started = started # Epoch seconds
+        self.duration = duration # Seconds, None while running
+        self.exit_code = exit_code
+        self.output_size = output_size # Characters (bytes in raw mode) of output
+
+    def to_record(self) -> list[Any]:
+        return [self.started, self.duration, self.exit_code, self.output_size, self.cwd, self.command]
+
+    @classmethod
+    def from_record(cls, record: list[Any]) -> "HistoryEntry":
+        started, duration, exit_code, output_size, cwd, command = record
+        return cls(command, cwd, started, duration, exit_code, output_size)
+
+
+class CommandHistory:
+    """
+    Bounded command history, persisted append-only and indexed for recall.
+
+    Entries live in a deque capped at `max_entries`. Each finished command
+    is appended as one JSON line to `path`; the file is compacted to the
+    newest `max_entries` lines when it has grown to twice that while loading.
+    Appends and loading run in worker threads and take turns on one lock,
+    so a compaction never drops an append made meanwhile.
+
+    Recall works on distinct commands: a dict ordered by last use gives the
+    most recent ones first, a sorted list finds every command with a given
+    prefix by bisection (Up-arrow recall) and `fuzzy()` ranks subsequence
+    matches (Ctrl-R search).
+    """
+
+    FUZZY_CANDIDATES = 2000 # Most recent matches ranked by fuzzy()
+    _GAP = "*+" if sys.version_info >= (3, 11) else "*" # Possessive quantifiers are new in 3.11
+
+    def __init__(self, path: Optional[Path] = HISTORY_PATH, max_entries: int = HISTORY_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.entries: deque[HistoryEntry] = deque()
+        self._recent: dict[str, int] = {} # command -> sequence number of last use, oldest first
+        self._counts: dict[str, int] = {} # command -> entries holding it
+        self._sorted: list[str] = [] # distinct commands, sorted
+        self._sequence = 0
+        self._masks: dict[str, int] = {} # command -> characters it contains, see _char_mask()
+        self._fuzzy_cache: Optional[Tuple[int, list[str], list[int]]] = None
+        self._unwritten: list[str] = [] # JSON lines queued by finish()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._file_lock = threading.Lock() # Held for any access to the file
+        self._written = 0 # Lines this object appended to the file
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[HistoryEntry]:
+        return iter(self.entries)
+
+    def add(self, command: str, cwd: str) -> HistoryEntry:
+        """Record a command that is starting; call `finish()` once it ends."""
+        entry = HistoryEntry(command, cwd, time.time())
+        self._append(entry)
+        return entry
+
+    def finish(self, entry: HistoryEntry) -> None:
+        """
+        Set the entry's duration and queue it for the history file.
+
+        The append runs in a worker thread, like `NoteStore` saves, so a
+        slow disk never stalls the event loop; without a running loop (e.g.
+        at exit) it is written straight away.
+        """
+        entry.duration = time.time() - entry.started
+        if self.path is None:
+            return
+        self._unwritten.append(json.dumps(entry.to_record()) + "\n")
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_sync()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> None:
+        """Append every queued entry to the history file, off the event loop."""
+        async with self._lock:
+            while self._unwritten:
+                lines, self._unwritten = self._unwritten, []
+                await asyncio.to_thread(self._write_lines, lines)
+
+    def flush_sync(self) -> None:
+        """Blocking flush for when no event loop is available."""
+        lines, self._unwritten = self._unwritten, []
+        self._write_lines(lines)
+
+    def read(self) -> "CommandHistory":
+        """
+        Parse and index the history file into a new `CommandHistory`.
+
+        Touches none of this object's entries, so it can run in a worker
+        thread; hand the result to `merge_older()` on the event loop. The
+        lines this object appended are left out, as they are in memory already.
+        """
+        loaded = CommandHistory(self.path, self.max_entries)
+        entries = self._read_file()[-self.max_entries:]
+        recent, counts = loaded._recent, loaded._counts
+        for sequence, entry in enumerate(entries, 1):
+            command = entry.command
+            recent.pop(command, None)
+            recent[command] = sequence
+            counts[command] = counts.get(command, 0) + 1
+        # Built in bulk; _append() keeps them up to date one command at a time
+        loaded.entries = deque(entries)
+        loaded._sorted = sorted(recent)
+        loaded._masks = {command: self._char_mask(command) for command in recent}
+        loaded._sequence = len(entries)
+        return loaded
+
+    def merge_older(self, older: "CommandHistory") -> None:
+        """Put the entries of `older` before the ones recorded so far."""
+        for entry in self.entries:
+            older._append(entry)
+        self.entries, self._recent, self._counts = older.entries, older._recent, older._counts
+        self._sorted, self._masks, self._sequence = older._sorted, older._masks, older._sequence
+
+    def load(self) -> None:
+        """Bring back the entries of earlier sessions."""
+        self.merge_older(self.read())
+
+    def recent(self) -> Iterator[str]:
+        """Distinct commands, most recently used first."""
+        return reversed(self._recent)
+
+    def with_prefix(self, prefix: str) -> list[str]:
+        """Distinct commands starting with `prefix`, most recently used first."""
+        if not prefix:
+            return list(self.recent())
+        start = bisect.bisect_left(self._sorted, prefix)
+        end = bisect.bisect_left(self._sorted, prefix + "\U0010ffff", start)
+        matches = self._sorted[start:end]
+        matches.sort(key=self._recent.__getitem__, reverse=True)
+        return matches
+
+    def fuzzy(self, query: str, limit: int = 50) -> list[str]:
+        """
+        Distinct commands containing the characters of `query` in order.
+
+        Ranked by how tight the match is (a contiguous substring first),
+        then by recency. Case is ignored. Each command carries a bitmask of
+        the characters it contains, so most non-matching commands are
+        rejected by an integer test run in C before any regex; only the
+        `FUZZY_CANDIDATES` most recent matches are ranked.
+        """
+        if not query:
+            return list(itertools.islice(self.recent(), limit))
+        needle = query.lower()
+        # Each gap skips straight to the next wanted character ("a[^b]*+b..."),
+        # so a failed match does not backtrack the way ".*?" gaps would
+        pattern = re.compile(re.escape(needle[0]) + "".join(
+            f"[^{re.escape(char)}]{self._GAP}{re.escape(char)}" for char in needle[1:]
+        ), re.IGNORECASE)
+        wanted = self._char_mask(needle)
+        commands, masks = self._fuzzy_index()
+        candidates = itertools.compress(range(len(commands)), map(wanted.__eq__, map(wanted.__and__, masks)))
+        ranked = []
+        for rank in candidates:
+            command = commands[rank]
+            match = pattern.search(command)
+            if match is None:
+                continue
+            contiguous = needle in command.lower()
+            span = len(needle) if contiguous else match.end() - match.start()
+            ranked.append((not contiguous, span, rank, command))
+            if len(ranked) >= self.FUZZY_CANDIDATES:
+                break
+        ranked.sort()
+        return [command for *_, command in ranked[:limit]]
+
+    @staticmethod
+    def _char_mask(text: str) -> int:
+        """64-bit set of the (lowercased) characters in `text`."""
+        mask = 0
+        for char in set(text.lower()):
+            mask |= 1 << (ord(char) % 64)
+        return mask
+
+    def _fuzzy_index(self) -> Tuple[list[str], list[int]]:
+        # Distinct commands and their masks, most recent first; rebuilt only
+        # after the history changed, not on every keystroke
+        if self._fuzzy_cache is None or self._fuzzy_cache[0] != self._sequence:
+            commands = list(reversed(self._recent))
+            self._fuzzy_cache = (self._sequence, commands, list(map(self._masks.__getitem__, commands)))
+        return self._fuzzy_cache[1], self._fuzzy_cache[2]
+
+    def _append(self, entry: HistoryEntry) -> None:
+        if len(self.entries) >= self.max_entries:
+            self._forget(self.entries.popleft().command)
+        self.entries.append(entry)
+        command = entry.command
+        self._sequence += 1
+        if command in self._recent:
+            del self._recent[command] # Re-inserted below as the most recent
+        else:
+            bisect.insort(self._sorted, command)
+            self._masks[command] = self._char_mask(command)
+        self._recent[command] = self._sequence
+        self._counts[command] = self._counts.get(command, 0) + 1
+
+    def _forget(self, command: str) -> None:
+        count = self._counts[command] - 1
+        if count:
+            self._counts[command] = count
+            return
+        del self._counts[command], self._recent[command], self._masks[command]
+        del self._sorted[bisect.bisect_left(self._sorted, command)]
+
+    def _write_lines(self, lines: list[str]) -> None:
+        if not lines or self.path is None:
+            return
+        with self._file_lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+            except OSError:
+                return # History is a convenience; never fail a command over it
+            self._written += len(lines)
+
+    def _read_file(self) -> list[HistoryEntry]:
+        if self.path is None:
+            return []
+        with self._file_lock:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    lines = f.readlines()
+            except FileNotFoundError:
+                return []
+            # Compacting keeps the newest lines, so this object's appends stay last
+            if len(lines) > 2 * self.max_entries and not self._unwritten:
+                lines = lines[-self.max_entries:]
+                write_atomic(self.path, "".join(lines))
+            lines = lines[:max(0, len(lines) - self._written)]
+        entries = []
+        for line in lines[-self.max_entries:]:
+            try:
+                entries.append(HistoryEntry.from_record(json.loads(line)))
+            except (ValueError, TypeError):
+                continue # A line cut short by a crash
+        return entries
+
+
+class OutputLog:
+    """
+    One command's output teed to disk, with a line-offset index.
+
+    `<name>.log` receives the output as the command produced it (UTF-8, or
+    the bytes themselves in raw mode), `<name>.idx` the byte offset at which
+    each line after the first starts, as native-order unsigned 64-bit
+    integers, and `<name>.json` the command, working directory and times,
+    plus its exit code and size once closed. Writes are buffered and
+    indexed a buffer at a time, in C, when flushed; `flush()` makes
+    everything written so far visible to a `MappedLog`.
+    """
+
+    BUFFER_SIZE = 1 << 16
+
+    def __init__(self, root: Path, name: str, command: str, cwd: str):
+        self.name = name
+        self.path = root / f"{name}.log"
+        self.meta = {"command": command, "cwd": cwd, "started": time.time()}
+        self.size = 0
+        self.lines = 0
+        self.closed = False
+        self.error: Optional[OSError] = None
+        self._open_line = False # Output so far ends mid-line
+        self._pending: list[bytes] = []
+        self._flushed = 0 # Bytes on disk
+        self._log = open(self.path, "xb")
+        self._index = open(self.path.with_suffix(".idx"), "wb")
+        self._write_meta()
+
+    def write(self, data: "str | bytes") -> None:
+        """Appends output."""
+        if self.closed:
+            return
+        if isinstance(data, str):
+            data = data.encode("utf-8", "replace")
+        self._pending.append(data)
+        self.size += len(data)
+        if self.size - self._flushed >= self.BUFFER_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes buffered output, then the index entries that point into it."""
+        if self.closed or self.size == self._flushed:
+            return
+        data = b"".join(self._pending)
+        self._pending.clear()
+        # The start of each line after the first: just past each newline
+        lines = data.split(b"\n")
+        offsets = array.array("Q", itertools.accumulate(
+            map((1).__add__, map(len, lines[:-1])), initial=self._flushed
+        ))
+        del offsets[0]
+        self._open_line = bool(lines[-1])
+        try:
+            self._log.write(data)
+            self._log.flush()
+            offsets.tofile(self._index)
+            self._index.flush()
+        except OSError as e:
+            self._fail(e)
+            return
+        self._flushed = self.size
+        self.lines += len(offsets)
+
+    def close(self, exit_code: Optional[int] = None) -> None:
+        """Flushes and closes the files and records the exit code and size."""
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        self._log.close()
+        self._index.close()
+        self.meta.update(finished=time.time(), exit_code=exit_code, bytes=self.size,
+                         lines=self.lines + self._open_line)
+        self._write_meta()
+
+    def _write_meta(self) -> None:
+        try:
+            self.path.with_suffix(".json").write_text(json.dumps(self.meta), encoding="utf-8")
+        except OSError as e:
+            self.error = self.error or e
+
+    def _fail(self, error: OSError) -> None:
+        """Stops logging (e.g. the disk is full) but keeps what was written."""
+        self.error = error
+        self.closed = True
+        for f in (self._log, self._index):
+            with contextlib.suppress(OSError):
+                f.close()
+
+
+class MappedLog:
+    """
+    Random-access lines of an `OutputLog`, paged in from disk via mmap.
+
+    Indexing reads only the pages holding that line and its index entry, so
+    memory stays flat however large the log; the OS page cache does the
+    rest. A log still being written is followed with `refresh()`. Lines are
+    decoded leniently and cut at `MAX_LINE_BYTES` for display.
+    """
+
+    MAX_LINE_BYTES = 1 << 16
+
+    def __init__(self, path: Path, writer: Optional[OutputLog] = None):
+        self.path = path
+        # The live writer, flushed before each refresh so its tail shows up
+        self.writer = writer
+        self._log: Optional[mmap.mmap] = None
+        self._index: Optional[mmap.mmap] = None
+        self._offsets: "memoryview | tuple" = ()
+        self._size = -1
+        self._lines = 0
+        self.refresh()
+
+    def __len__(self) -> int:
+        return self._lines
+
+    def __getitem__(self, index: int) -> str:
+        if not 0 <= index < self._lines:
+            raise IndexError(index)
+        start = self._offsets[index - 1] if index else 0
+        end = self._offsets[index] if index < len(self._offsets) else self._size
+        end = min(end, start + self.MAX_LINE_BYTES)
+        return self._log[start:end].decode("utf-8", "replace").rstrip("\r\n")
+
+    def refresh(self) -> bool:
+        """Maps whatever was appended since the last call; True if the log grew."""
+        if self.writer is not None:
+            self.writer.flush()
+            if self.writer.closed:
+                self.writer = None
+        try:
+            size = self.path.stat().st_size
+            index_size = self.path.with_suffix(".idx").stat().st_size // 8 * 8
+        except OSError:
+            return False
+        if size == self._size:
+            return False
+        self.close()
+        if size:
+            self._log = self._map(self.path, size)
+        if index_size:
+            self._index = self._map(self.path.with_suffix(".idx"), index_size)
+            self._offsets = memoryview(self._index)[:index_size].cast("Q")
+        self._size = size
+        last = self._offsets[-1] if self._offsets else 0
+        self._lines = len(self._offsets) + (size > last)
+        return True
+
+    def close(self) -> None:
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        self._offsets = ()
+        for mapped in (self._log, self._index):
+            if mapped is not None:
+                mapped.close()
+        self._log = self._index = None
+        self._size = self._lines = 0
+
+    @staticmethod
+    def _map(path: Path, size: int) -> mmap.mmap:
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+
+class OutputLogStore:
+    """
+    Directory of `OutputLog`s, one per command, pruned to a total size.
+
+    Log names sort by start time. Logs still being written by this process
+    are never pruned, and `open()` follows them as they grow.
+    """
+
+    def __init__(self, root: Path = TERMINAL_LOG_DIR, max_mb: float = TERMINAL_LOG_MAX_MB):
+        self.root = root
+        self.max_bytes = int(max_mb * 2**20)
+        self.live: dict[str, OutputLog] = {}
+
+    def create(self, command: str, cwd: str) -> OutputLog:
+        """Starts the log of a command; `close()` it when the command ends."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        name = f"{datetime.now():%Y%m%d-%H%M%S-%f}"
+        while True:
+            try:
+                log = OutputLog(self.root, name, command, cwd)
+                break
+            except FileExistsError:
+                name += "x"
+        self.live[name] = log
+        return log
+
+    def release(self, log: OutputLog, exit_code: Optional[int] = None) -> None:
+        """Closes a log made by `create()`."""
+        log.close(exit_code)
+        self.live.pop(log.name, None)
+
+    def open(self, name: str) -> MappedLog:
+        """Maps a log for reading, following it if it is still being written."""
+        return MappedLog(self.root / f"{name}.log", self.live.get(name))
+
+    def list(self, limit: int = 500) -> list[tuple[str, dict]]:
+        """The newest `limit` logs' names and metadata, newest first (reads files)."""
+        try:
+            names = sorted((p.stem for p in self.root.glob("*.json")), reverse=True)
+        except OSError:
+            return []
+        logs = []
+        for name in names[:limit]:
+            try:
+                logs.append((name, json.loads((self.root / f"{name}.json").read_text(encoding="utf-8"))))
+            except (OSError, ValueError):
+                continue # Written at this moment or cut short by a crash
+        return logs
+
+    def prune(self) -> int:
+        """Deletes the oldest finished logs beyond `max_bytes` (reads files); returns how many."""
+        sizes: dict[str, int] = {}
+        try:
+            for entry in os.scandir(self.root):
+                stem, _, suffix = entry.name.rpartition(".")
+                if suffix in ("log", "idx", "json"):
+                    sizes[stem] = sizes.get(stem, 0) + entry.stat().st_size
+        except OSError:
+            return 0
+        total, removed = sum(sizes.values()), 0
+        for name in sorted(sizes):
+            if total <= self.max_bytes:
+                break
+            if name in self.live:
+                continue
+            for suffix in (".log", ".idx", ".json"):
+                with contextlib.suppress(OSError):
+                    (self.root / name).with_suffix(suffix).unlink()
+            total -= sizes[name]
+            removed += 1
+        return removed
+
+
 class TerminalManager:
     """
     Manages terminal operations, including command execution and history.
@@ -45,17 +1296,219 @@ class TerminalManager:
     executed commands.
     """
     
-    def __init__(self):
+    STREAM_MODES = ('line', 'chunk', 'raw')
+
+    def __init__(
+        self,
+        queue_size: int = TERMINAL_QUEUE_SIZE,
+        stream_mode: str = TERMINAL_STREAM_MODE,
+        chunk_size: int = TERMINAL_CHUNK_SIZE,
+        max_jobs: int = TERMINAL_MAX_JOBS,
+        max_finished_jobs: int = TERMINAL_MAX_FINISHED_JOBS,
+        use_session: bool = TERMINAL_SESSION,
+        scanner: Optional[OutputScanner] = None,
+        history: Optional[CommandHistory] = None,
+        metrics: Optional[Metrics] = None,
+        logs: Optional[OutputLogStore] = None,
+    ):
         """
         Initializes the TerminalManager.
         
-        Sets up an empty command history list and sets the initial current
-        directory to the directory from which the script was launched.
+        Sets up the command history and sets the initial current directory
+        to the directory from which the script was launched.
+
+        Args:
+            queue_size: Maximum number of output chunks buffered between the
+                        subprocess pipes and the consumer before the readers
+                        block (backpressure). 0 means unbounded.
+            stream_mode: Default read mode for command output, one of
+                         `STREAM_MODES` (see `execute_command`).
+            chunk_size: Maximum bytes per read in 'chunk' and 'raw' modes.
+            max_jobs: Maximum number of jobs running concurrently.
+            max_finished_jobs: Maximum number of finished jobs kept in
+                               `jobs`. The oldest are removed, and their
+                               output buffers freed, as new ones finish.
+            use_session: Run commands in a persistent `ShellSession` by
+                         default instead of a fresh subprocess each.
+            scanner: Scans every job's output for flags and secrets.
+            history: Where commands are recorded. Defaults to a
+                     `CommandHistory` persisted at `HISTORY_PATH`; call its
+                     `load()` to bring back earlier sessions.
+            metrics: Registry receiving command timings, throughput and
+                     output volume. Defaults to a private `Metrics`.
+            logs: Where each job's full output is logged. Defaults to an
+                  `OutputLogStore` at `TERMINAL_LOG_DIR`, or none if
+                  `TERMINAL_LOG` is off.
         """
-        self.history: list[dict[str, str]] = []
+        self.history = history if history is not None else CommandHistory()
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.logs = logs if logs is not None else OutputLogStore() if TERMINAL_LOG else None
         self.current_dir: Path = Path.cwd()
+        self.queue_size = queue_size
+        self.stream_mode = stream_mode
+        self.chunk_size = max(1, chunk_size)
+        self.jobs: dict[int, Job] = {}
+        self.max_jobs = max(1, max_jobs)
+        self.max_finished_jobs = max(1, max_finished_jobs)
+        self._next_job_id = 1
+        self._job_slots: Optional[asyncio.Semaphore] = None
+        self.use_session = use_session and ShellSession.is_supported()
+        self.session: Optional[ShellSession] = None
+        self.scanner = scanner
+
+    def submit_job(
+        self,
+        command: str,
+        mode: Optional[str] = None,
+        background: bool = False,
+        use_session: Optional[bool] = None,
+        on_output: Optional[Callable[[Job, str], None]] = None,
+        on_update: Optional[Callable[[Job], None]] = None,
+        on_finding: Optional[Callable[[Job, Finding], None]] = None,
+    ) -> Job:
+        """
+        Schedules a command as a job and returns immediately.
+
+        The job runs as an asyncio task once one of the `max_jobs` slots is
+        free. Its output is formatted for display (stderr prefixed, raw
+        output rendered as a hexdump) and appended to the job's buffer, and
+        logged unformatted and in full to the job's `OutputLog` in `logs`.
+
+        Args:
+            command: The shell command string to execute.
+            mode: The read mode, or None to use the manager's `stream_mode`.
+            background: Marks the job as a background job (informational).
+            use_session: Passed on to `execute_command`.
+            on_output: Called with each piece of display text as it arrives.
+            on_update: Called whenever the job's status changes.
+            on_finding: Called with each distinct match of the `scanner`.
+
+        Returns:
+            Job: The scheduled job, also stored in `jobs` under its id.
+        """
+        if self._job_slots is None:
+            self._job_slots = asyncio.Semaphore(self.max_jobs)
+        job = Job(self._next_job_id, command, mode or self.stream_mode, background, use_session)
+        self._next_job_id += 1
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run_job(job, on_output, on_update, on_finding))
+        return job
+
+    def cancel_job(self, job_id: int) -> bool:
+        """
+        Kills a queued or running job.
+
+        Cancelling the job's task closes its output generator, which kills
+        the subprocess.
+
+        Returns:
+            bool: True if the job existed and was still active.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or not job.is_active or job.task is None:
+            return False
+        job.task.cancel()
+        return True
+
+    def _forget_finished_jobs(self) -> None:
+        """Drops the longest-finished jobs beyond `max_finished_jobs` and their output."""
+        finished = sorted((job for job in self.jobs.values() if not job.is_active),
+                          key=lambda job: job.finished_at or 0.0)
+        for job in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job.id]
+            job.output.clear()
+
+    async def close(self) -> None:
+        """Kills all jobs and the shell session, then writes out their history."""
+        tasks = [job.task for job in self.jobs.values() if job.is_active and job.task is not None]
+        for job_id in list(self.jobs):
+            self.cancel_job(job_id)
+        if self.session is not None:
+            await self.session.close()
+        if tasks:
+            await asyncio.wait(tasks, timeout=1) # Their cleanup records them in the history
+        await self.history.flush()
+
+    async def _run_job(
+        self,
+        job: Job,
+        on_output: Optional[Callable[[Job, str], None]],
+        on_update: Optional[Callable[[Job], None]],
+        on_finding: Optional[Callable[[Job, Finding], None]] = None,
+    ) -> None:
+        """Runs a job in its concurrency slot, recording output and status."""
+        def emit(text: str) -> None:
+            if not text:
+                return
+            job.output.write(text)
+            if on_output is not None:
+                on_output(job, text)
+
+        def update(status: str) -> None:
+            job.status = status
+            if not job.is_active:
+                self._forget_finished_jobs()
+            if on_update is not None:
+                on_update(job)
+
+        def found(finding: Finding) -> None:
+            job.findings.append(finding)
+            if on_finding is not None:
+                on_finding(job, finding)
+
+        hexdump = HexDumpFormatter() if job.mode == 'raw' else None
+        running = self.metrics.gauge("terminal_jobs_running", "Jobs currently running")
+        assert self._job_slots is not None
+        try:
+            async with self._job_slots:
+                job.started_at = time.monotonic()
+                update('running')
+                running.value += 1
+                if self.logs is not None:
+                    try:
+                        job.log = self.logs.create(job.command, str(self.current_dir))
+                    except OSError as e:
+                        emit(f"[ERROR] Output not logged: {e}\n")
+                try:
+                    commands = self.execute_command(
+                        job.command, mode=job.mode, use_session=job.use_session, log=job.log
+                    )
+                    if self.scanner is not None:
+                        commands = self.scanner.scan_stream(commands, found)
+                    async for stream_type, value in commands:
+                        if stream_type == 'stdout':
+                            job.lines += 1
+                            emit(hexdump.feed(value) if hexdump else value)
+                        elif stream_type == 'stderr':
+                            job.lines += 1
+                            emit(f"[STDERR] {value}")
+                        elif stream_type == 'error':
+                            emit(f"[ERROR] {value}\n")
+                        elif stream_type == 'returncode':
+                            job.return_code = value
+                finally:
+                    running.value -= 1
+                    if job.log is not None:
+                        self.logs.release(job.log, job.return_code)
+            if hexdump:
+                emit(hexdump.finish())
+            emit(f"[Exit Code: {job.return_code}]\n")
+            job.finished_at = time.monotonic()
+            update('done' if job.return_code == 0 else 'failed')
+            if job.log is not None:
+                await asyncio.to_thread(self.logs.prune)
+        except asyncio.CancelledError:
+            emit("[Killed]\n")
+            job.finished_at = time.monotonic()
+            update('killed')
     
-    async def execute_command(self, command: str) -> AsyncGenerator[Tuple[str, Any], None]:
+    async def execute_command(
+        self,
+        command: str,
+        mode: Optional[str] = None,
+        use_session: Optional[bool] = None,
+        log: Optional[OutputLog] = None,
+    ) -> AsyncGenerator[Tuple[str, Any], None]:
         """
         Executes a shell command asynchronously and yields its output incrementally.
 
@@ -63,266 +1516,3063 @@ class TerminalManager:
         type ('stdout', 'stderr', 'error', 'returncode') and the second element
         is the corresponding data.
 
+        The read mode decides what a 'stdout'/'stderr' item carries:
+          - 'line':  one decoded line (buffered until its newline arrives;
+                     lines longer than the stream limit arrive in pieces).
+          - 'chunk': up to `chunk_size` bytes decoded with an incremental UTF-8
+                     decoder, so arbitrarily long lines stream with bounded
+                     memory. Chunks do not align with line boundaries.
+          - 'raw':   stdout as undecoded `bytes` chunks (e.g. for a hexdump
+                     view); stderr is read as in 'chunk' mode.
+
+        In a persistent shell session output arrives in chunks as the terminal
+        produces it, stderr is merged into stdout and 'line' behaves like
+        'chunk'. The session's working directory is tracked in `current_dir`.
+
         Args:
             command: The shell command string to execute.
+            mode: The read mode, or None to use the manager's `stream_mode`.
+            use_session: Run in the persistent `ShellSession` rather than a
+                         fresh subprocess, or None to use `use_session`.
+            log: Tee stdout and stderr, as yielded, into this log. The
+                 caller closes it.
+
+        Yields:
+            Tuple[str, Any]: A tuple containing the output type and the data.
+                             Possible types are:
+                             - ('stdout', str | bytes): Output from standard output.
+                             - ('stderr', str): Output from standard error.
+                             - ('error', str): An error message if an exception occurred
+                                               during command setup or execution.
+                             - ('returncode', int): The exit code of the command.
+        
+        Raises:
+            RuntimeError: If the subprocess fails to provide stdout/stderr streams.
+                          (This is caught internally and yielded as an 'error' event).
+        """
+        # Record command in history, with its exit code, duration and output size,
+        # and in the metrics: time to first output, duration and throughput
+        metrics = self.metrics
+        metrics.counter("terminal_commands_total", "Commands run").value += 1
+        total_lines = metrics.counter("terminal_output_lines_total", "Lines (chunks in chunk/raw mode) of output")
+        total_size = metrics.counter("terminal_output_bytes_total", "Characters (bytes in raw mode) of output")
+        entry = self.history.add(command, str(self.current_dir))
+        started = time.perf_counter()
+        lines = 0
+        try:
+            async with contextlib.aclosing(self._execute(command, mode, use_session)) as items:
+                async for stream_type, value in items:
+                    if stream_type in ('stdout', 'stderr'):
+                        if not lines:
+                            metrics.summary(
+                                "terminal_first_byte_seconds", "Time from start to a command's first output"
+                            ).observe(time.perf_counter() - started)
+                        lines += 1
+                        total_lines.value += 1
+                        total_size.value += len(value)
+                        entry.output_size += len(value)
+                        if log is not None:
+                            log.write(value)
+                    elif stream_type == 'returncode':
+                        entry.exit_code = value
+                    yield (stream_type, value)
+        finally:
+            self.history.finish(entry)
+            elapsed = time.perf_counter() - started
+            metrics.summary("terminal_command_seconds", "Command duration").observe(elapsed)
+            if lines and elapsed > 0:
+                metrics.summary(
+                    "terminal_lines_per_second", "Output lines per second of each command"
+                ).observe(lines / elapsed)
+
+    async def _execute(
+        self, command: str, mode: Optional[str], use_session: Optional[bool]
+    ) -> AsyncGenerator[Tuple[str, Any], None]:
+        """Runs the command and yields its output, as described in `execute_command`."""
+        mode = mode or self.stream_mode
+        process = None
+        try:
+            if mode not in self.STREAM_MODES:
+                raise ValueError(f"Unknown stream mode: {mode!r}")
+
+            if self.use_session if use_session is None else use_session:
+                async for item in self._execute_in_session(command, mode):
+                    yield item
+                return
+            
+            # Launch the command as a subprocess
+            # Note: Using shell=True can be a security risk if `command` comes from
+            # untrusted input. For this PoC, it's assumed to be from user input
+            # within the TUI.
+            process = await asyncio.create_subprocess_shell(
+                command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=str(self.current_dir), # Execute in the manager's current directory
+                start_new_session=True, # Own process group, so kills reach its children too
+            )
+
+            # Ensure stdout and stderr streams were successfully captured
+            if process.stdout is None or process.stderr is None:
+                # This should ideally not happen with PIPE, but good to check.
+                raise RuntimeError("Failed to get stdout/stderr streams from subprocess.")
+
+            # Single channel carrying tagged chunks from both pipes. Each reader
+            # posts a (stream_type, None) sentinel when its stream ends, so the
+            # consumer simply awaits the next item and never polls. A bounded
+            # channel makes the readers, and in turn the subprocess, wait when
+            # the consumer falls behind.
+            channel: asyncio.Queue[Tuple[str, Any]] = asyncio.Queue(self.queue_size)
+            stderr_mode = 'chunk' if mode == 'raw' else mode
+            readers = [
+                asyncio.create_task(self._enqueue_stream(process.stdout, 'stdout', channel, mode)),
+                asyncio.create_task(self._enqueue_stream(process.stderr, 'stderr', channel, stderr_mode)),
+            ]
+
+            try:
+                open_streams = len(readers)
+                while open_streams:
+                    stream_type, data = await channel.get()
+                    if data is None: # End-of-stream sentinel
+                        open_streams -= 1
+                        continue
+                    yield (stream_type, data)
+            finally:
+                # Stop the readers if the consumer abandoned the generator early
+                for reader in readers:
+                    if not reader.done():
+                        reader.cancel()
+                await asyncio.gather(*readers, return_exceptions=True)
+
+            # Surface any exception raised while reading the pipes.
+            await asyncio.gather(*readers)
+            # Wait for the subprocess itself to terminate.
+            await process.wait()
+            # Yield the final return code of the command.
+            yield ('returncode', process.returncode or 0)
+
+        except Exception as e:
+            # If any other exception occurs (e.g., command not found, permission issues),
+            # yield an error message and a non-zero return code.
+            yield ('error', str(e))
+            yield ('returncode', 1) # Indicate failure
+
+        finally:
+            # Don't leave the child behind if its output was abandoned or could
+            # not be read; it would block forever on a full pipe.
+            if process is not None and process.returncode is None:
+                await self._kill_process(process)
+
+    async def _execute_in_session(self, command: str, mode: str) -> AsyncGenerator[Tuple[str, Any], None]:
+        """Runs a command in the persistent shell, starting it on first use."""
+        if not ShellSession.is_supported():
+            raise RuntimeError("Shell sessions need a POSIX system with PTY support.")
+        if self.session is None or not self.session.alive:
+            self.session = ShellSession(queue_size=self.queue_size)
+            await self.session.start(self.current_dir)
+        output = self.session.run(command, raw=(mode == 'raw'))
+        try:
+            async for item in output:
+                yield item
+        finally:
+            # Interrupts the command if our own consumer went away early
+            await output.aclose()
+        if self.session.cwd is not None:
+            self.current_dir = self.session.cwd
+
+    @staticmethod
+    async def _kill_process(process: asyncio.subprocess.Process) -> None:
+        """Kills a command's whole process group and reaps it."""
+        with contextlib.suppress(ProcessLookupError):
+            if hasattr(os, "killpg"):
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        # Drain the pipes to EOF so their transports are closed cleanly
+        await process.communicate()
+
+    async def _enqueue_stream(
+        self,
+        stream: asyncio.StreamReader,
+        stream_type: str,
+        channel: asyncio.Queue[Tuple[str, Any]],
+        mode: str = 'line',
+    ) -> None:
+        """
+        Asynchronously reads a stream and puts its output on the shared channel.
+
+        This helper function is used to concurrently process stdout and stderr
+        of a subprocess. Depending on `mode` it reads lines or fixed-size
+        chunks (see `execute_command`), decodes them as UTF-8 replacing errors
+        unless `mode` is 'raw', tags them with `stream_type` and finishes with
+        a `(stream_type, None)` end-of-stream sentinel, also when reading
+        fails (but not when the reader is cancelled).
+
+        Args:
+            stream: The asyncio.StreamReader to read from (e.g., process.stdout).
+            stream_type: The tag attached to every chunk ('stdout' or 'stderr').
+            channel: The asyncio.Queue shared by all readers of the process.
+            mode: 'line', 'chunk' or 'raw'.
+        """
+        # The incremental decoder carries multi-byte sequences split across
+        # reads over to the next one instead of replacing them.
+        decoder = None if mode == 'raw' else codecs.getincrementaldecoder('utf-8')(errors='replace')
+        try:
+            while True:
+                if mode == 'line':
+                    try:
+                        data = await stream.readuntil(b'\n')
+                    except asyncio.IncompleteReadError as e:
+                        data = e.partial # Last line without a newline, or b'' at EOF
+                    except asyncio.LimitOverrunError as e:
+                        # Line longer than the stream limit: pass on what is
+                        # buffered so far and keep reading the rest of it.
+                        data = await stream.read(e.consumed)
+                else:
+                    data = await stream.read(self.chunk_size)
+                if not data: # EOF
+                    break
+                if decoder is None:
+                    await channel.put((stream_type, data))
+                    continue
+                text = decoder.decode(data)
+                if text:
+                    await channel.put((stream_type, text))
+            if decoder is not None:
+                tail = decoder.decode(b'', final=True)
+                if tail:
+                    await channel.put((stream_type, tail))
+        except asyncio.CancelledError:
+            # The consumer is gone, nobody is waiting for the sentinel
+            raise
+        except Exception:
+            await channel.put((stream_type, None))
+            raise
+        await channel.put((stream_type, None))
+
+
+class NoteStore:
+    """
+    On-disk store of named notes, grouped by challenge.
+
+    Each note is a Markdown file at `<root>/<challenge>/<name>.md`. Listing
+    only scans directory entries, so contents are read when a note is
+    opened. Saves are write-behind: `schedule_save` records the latest text
+    and a debounced flush writes it from a worker thread, replacing the
+    file atomically (temp file, fsync, rename) so a crash never leaves a
+    half-written note behind.
+    """
+
+    SUFFIX = ".md"
+    LAST_OPENED = ".last_opened"
+
+    def __init__(
+        self,
+        root: Path = NOTES_DIR,
+        delay: float = NOTES_AUTOSAVE_DELAY,
+        on_flush: Optional[Callable[[Optional[Exception]], None]] = None,
+    ):
+        self.root = root
+        self.delay = delay
+        self.on_flush = on_flush
+        self.saves = 0
+        self.last_error: Optional[Exception] = None
+        self._pending: dict[tuple[str, str], str] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def clean_name(name: str) -> str:
+        """Turn user input into a safe file/directory name."""
+        name = re.sub(r"[^\w.-]+", "_", name.strip()).strip("._")
+        return name or "notes"
+
+    def path(self, challenge: str, name: str) -> Path:
+        return self.root / challenge / (name + self.SUFFIX)
+
+    def list_challenges(self) -> list[str]:
+        """Challenge names, without reading any note."""
+        try:
+            with os.scandir(self.root) as entries:
+                return sorted(e.name for e in entries if e.is_dir() and not e.name.startswith("."))
+        except FileNotFoundError:
+            return []
+
+    def list_notes(self, challenge: str) -> list[str]:
+        """Note names of one challenge, without reading them."""
+        try:
+            with os.scandir(self.root / challenge) as entries:
+                return sorted(
+                    e.name[:-len(self.SUFFIX)] for e in entries
+                    if e.is_file() and e.name.endswith(self.SUFFIX)
+                )
+        except FileNotFoundError:
+            return []
+
+    def load(self, challenge: str, name: str) -> Optional[str]:
+        """Read a note, preferring an unsaved pending version; None if it does not exist."""
+        pending = self._pending.get((challenge, name))
+        if pending is not None:
+            return pending
+        try:
+            return self.path(challenge, name).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def last_opened(self) -> Optional[tuple[str, str]]:
+        """The (challenge, name) opened most recently, if recorded."""
+        try:
+            record = json.loads((self.root / self.LAST_OPENED).read_text(encoding="utf-8"))
+            return record["challenge"], record["name"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def set_last_opened(self, challenge: str, name: str) -> None:
+        try:
+            write_atomic(self.root / self.LAST_OPENED,
+                         json.dumps({"challenge": challenge, "name": name}))
+        except OSError as e:
+            self.last_error = e
+
+    def schedule_save(self, challenge: str, name: str, content: str) -> None:
+        """Queue `content` to be written once edits pause for `delay` seconds."""
+        self._pending[(challenge, name)] = content
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(self.delay, self._start_flush)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._pending)
+
+    async def flush(self) -> None:
+        """Write every pending note now, off the event loop."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._pending:
+                return
+            error = None
+            while self._pending and error is None:
+                pending, self._pending = self._pending, {}
+                try:
+                    await asyncio.to_thread(self._write_notes, pending)
+                except OSError as e:
+                    # Keep the unsaved text (unless edited since) for the next attempt
+                    for key, content in pending.items():
+                        self._pending.setdefault(key, content)
+                    error = e
+            self.last_error = error
+        # Only once everything is written, so a failing callback cannot hold up saving
+        if self.on_flush is not None:
+            self.on_flush(error)
+
+    def flush_sync(self) -> None:
+        """Blocking flush for when no event loop is available (e.g. at exit)."""
+        pending, self._pending = self._pending, {}
+        self._write_notes(pending)
+
+    def _start_flush(self) -> None:
+        self._timer = None
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self.flush())
+
+    def _write_notes(self, notes: dict[tuple[str, str], str]) -> None:
+        for (challenge, name), content in notes.items():
+            write_atomic(self.path(challenge, name), content)
+            self.saves += 1
+
+
+class MarkdownManager:
+    """Handles markdown note taking and rendering"""
+
+    DEFAULT_NOTE = "# CTF Toolkit Notes\n\n*Start taking notes...*"
+    
+    def __init__(self, store: Optional[NoteStore] = None):
+        self.store = store
+        self.challenge = "default"
+        self.note_name = "notes"
+        self.current_note = self.DEFAULT_NOTE
+        if store is not None:
+            last = store.last_opened()
+            if last is not None:
+                self.challenge, self.note_name = last
+            self.current_note = store.load(self.challenge, self.note_name) or self.DEFAULT_NOTE
+
+    def open_note(self, challenge: str, name: str) -> str:
+        """Switch to a note, creating it in memory if it does not exist yet"""
+        self.challenge, self.note_name = challenge, name
+        content = None
+        if self.store is not None:
+            content = self.store.load(challenge, name)
+            self.store.set_last_opened(challenge, name)
+        self.current_note = content if content is not None else f"# {challenge} / {name}\n\n"
+        return self.current_note
+    
+    def update_content(self, content: str):
+        """Update the current markdown content and queue it for saving"""
+        if content == self.current_note:
+            return
+        self.current_note = content
+        if self.store is not None:
+            self.store.schedule_save(self.challenge, self.note_name, content)
+    
+    def get_rendered_content(self) -> str:
+        """Get the current markdown content"""
+        return self.current_note
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of LLM answers.
+
+    Answers are stored in SQLite under a SHA-256 of the model name and the
+    normalized message list. Entries expire after `ttl` seconds and the
+    least recently used ones are evicted once the stored answers exceed
+    `max_bytes`. The database is opened on first use. `fetch` and `store`
+    run `get` and `put` on the cache's own worker thread, so lookups and
+    commits never block the event loop.
+    """
+
+    def __init__(
+        self,
+        path: Path = LLM_CACHE_PATH,
+        ttl: float = LLM_CACHE_TTL,
+        max_bytes: int = int(LLM_CACHE_MAX_MB * 1024 * 1024),
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+
+    @staticmethod
+    def make_key(model: str, messages: list[dict[str, str]]) -> str:
+        """Hash the model and messages, ignoring line-ending and surrounding whitespace differences."""
+        normalized = [
+            {"role": m["role"], "content": m["content"].replace("\r\n", "\n").strip()}
+            for m in messages
+        ]
+        payload = json.dumps({"model": model, "messages": normalized}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached answer for `key`, or None on a miss or expired entry."""
+        db = self._connect()
+        row = db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None and now - row[1] > self.ttl:
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            db.commit()
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        db.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """Store an answer and evict least recently used ones beyond `max_bytes`."""
+        db = self._connect()
+        now = time.time()
+        db.execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, size, created, accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, response, len(response.encode("utf-8")), now, now),
+        )
+        self._evict(db)
+        db.commit()
+
+    async def fetch(self, key: str) -> Optional[str]:
+        """`get`, off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.get, key)
+
+    async def store(self, key: str, model: str, response: str) -> None:
+        """`put`, off the event loop."""
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.put, key, model, response)
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters of this session plus the size of the store."""
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Used from the worker thread, and from the caller's for the sync API
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, "
+                "created REAL, accessed REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            self._db.commit()
+        return self._db
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, model-independent token estimate (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+class ConversationMemory:
+    """
+    Token-budgeted conversation history with a rolling summary.
+
+    Each turn's token count is computed once when it is added. Requests
+    carry the summary plus as many of the newest turns as fit the budget.
+    When the stored turns outgrow the budget, the oldest ones are folded
+    into the summary by `compact()`, which callers run in the background,
+    so prompt size stays bounded however long the session runs.
+    """
+
+    SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+    def __init__(
+        self,
+        budget: int = LLM_CONTEXT_TOKENS,
+        summary_budget: int = LLM_SUMMARY_TOKENS,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.count_tokens = count_tokens
+        self.turns: list[dict[str, Any]] = []
+        self.summary = ""
+        self.summary_tokens = 0
+        self._turn_tokens = 0
+
+    @property
+    def total_tokens(self) -> int:
+        """Tokens held by the summary and all stored turns."""
+        return self.summary_tokens + self._turn_tokens
+
+    def add(self, role: str, content: str) -> None:
+        tokens = self.count_tokens(content)
+        self.turns.append({"role": role, "content": content, "tokens": tokens})
+        self._turn_tokens += tokens
+
+    def clear(self) -> None:
+        self.turns.clear()
+        self.summary = ""
+        self.summary_tokens = self._turn_tokens = 0
+
+    def messages(self, reserve: int = 0) -> list[dict[str, str]]:
+        """
+        Chat messages for the next request.
+
+        Args:
+            reserve: Tokens of the budget already taken by the new prompt.
+
+        Returns:
+            list[dict[str, str]]: The summary (as a system message) followed
+                                  by the newest turns that fit the budget.
+        """
+        available = self.budget - reserve - self.summary_tokens
+        recent: list[dict[str, str]] = []
+        for turn in reversed(self.turns):
+            available -= turn["tokens"]
+            if available < 0:
+                break
+            recent.append({"role": turn["role"], "content": turn["content"]})
+        recent.reverse()
+        if self.summary:
+            recent.insert(0, {"role": "system", "content": self.SUMMARY_PREFIX + self.summary})
+        return recent
+
+    def needs_compaction(self) -> bool:
+        return self.total_tokens > self.budget
+
+    async def compact(self, summarize: Callable[[str, list[dict[str, Any]]], Awaitable[str]]) -> None:
+        """
+        Folds the oldest turns into the summary, keeping the newest half of the budget verbatim.
+
+        If `summarize` fails, the current summary and the text of the old
+        turns are kept instead, trimmed to the summary budget from the
+        start, so the newest of what is folded in survives.
+
+        Args:
+            summarize: Coroutine function taking the current summary and the
+                       turns to fold in, returning the new summary.
+        """
+        keep = self.budget // 2
+        count, kept = len(self.turns), 0
+        while count and kept + self.turns[count - 1]["tokens"] <= keep:
+            count -= 1
+            kept += self.turns[count]["tokens"]
+        if count == 0:
+            return
+        old = self.turns[:count]
+        try:
+            summary = await summarize(self.summary, old)
+            fallback = False
+        except Exception:
+            summary = "\n".join([self.summary] + [f"{turn['role']}: {turn['content']}" for turn in old]).strip()
+            fallback = True
+        # Turns added while summarizing were appended after `old`, so the
+        # first `count` entries are still the ones that were summarized.
+        del self.turns[:count]
+        self._turn_tokens -= sum(turn["tokens"] for turn in old)
+        tokens = self.count_tokens(summary)
+        if tokens > self.summary_budget:
+            size = len(summary) * self.summary_budget // tokens
+            summary = summary[len(summary) - size:] if fallback else summary[:size]
+            tokens = self.count_tokens(summary)
+        self.summary, self.summary_tokens = summary, tokens
+
+
+class ContextIndex:
+    """
+    BM25 index over recent command outputs and notes for prompt grounding.
+
+    Documents (a command's output, the notes) are split into chunks of a few
+    lines and kept in an inverted index. `build_context()` ranks the chunks
+    against a prompt and returns the best ones that fit a token budget, so
+    the assistant sees what was actually run without whole tool outputs
+    being pasted into the prompt.
+
+    Sources registered with `register_source()` (e.g. the notes editor) are
+    pulled and re-indexed only when a context is built and their text has
+    changed. Other documents are evicted oldest first beyond `max_documents`.
+    """
+
+    CHUNK_LINES = 20
+    CHUNK_CHARS = 2000
+    K1 = 1.2
+    B = 0.75
+    _terms = re.compile(r"\w\w+").findall
+
+    def __init__(
+        self,
+        max_documents: int = LLM_RETRIEVAL_DOCUMENTS,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        self.max_documents = max_documents
+        self.count_tokens = count_tokens
+        self._sources: dict[str, Tuple[str, Callable[[], str]]] = {}
+        self._documents: dict[str, Tuple[int, list[int]]] = {} # key -> (text hash, chunk ids)
+        self._chunks: dict[int, Tuple[str, str, int]] = {} # id -> (title, text, term count)
+        self._postings: dict[str, dict[int, int]] = {} # term -> {chunk id: term frequency}
+        self._total_terms = 0
+        self._next_chunk = 0
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def register_source(self, key: str, title: str, provider: Callable[[], str]) -> None:
+        """Index `provider()` under `key`, refreshed lazily whenever a context is built."""
+        self._sources[key] = (title, provider)
+
+    def unregister_source(self, key: str) -> None:
+        """Stop refreshing `key`, keeping its current text indexed as an ordinary document."""
+        source = self._sources.pop(key, None)
+        if source is not None:
+            title, provider = source
+            self.add_document(key, title, provider())
+
+    def add_document(self, key: str, title: str, text: str) -> None:
+        """Index (or re-index) a document, replacing the previous text under `key`."""
+        digest = hash(text)
+        previous = self._documents.get(key)
+        if previous is not None and previous[0] == digest:
+            return
+        self.remove_document(key)
+        chunk_ids = []
+        lines = text.splitlines()
+        for start in range(0, len(lines), self.CHUNK_LINES):
+            chunk = "\n".join(lines[start:start + self.CHUNK_LINES])
+            for offset in range(0, len(chunk), self.CHUNK_CHARS):
+                piece = chunk[offset:offset + self.CHUNK_CHARS]
+                terms = self._terms(piece.lower())
+                if not terms:
+                    continue
+                chunk_id = self._next_chunk
+                self._next_chunk += 1
+                self._chunks[chunk_id] = (title, piece, len(terms))
+                self._total_terms += len(terms)
+                for term in terms:
+                    postings = self._postings.setdefault(term, {})
+                    postings[chunk_id] = postings.get(chunk_id, 0) + 1
+                chunk_ids.append(chunk_id)
+        self._documents[key] = (digest, chunk_ids)
+        # Evict the oldest documents that are not registered sources
+        evictable = [k for k in self._documents if k not in self._sources]
+        for old_key in evictable[:max(0, len(evictable) - self.max_documents)]:
+            self.remove_document(old_key)
+
+    def remove_document(self, key: str) -> None:
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        for chunk_id in document[1]:
+            _, text, length = self._chunks.pop(chunk_id)
+            self._total_terms -= length
+            for term in set(self._terms(text.lower())):
+                postings = self._postings[term]
+                del postings[chunk_id]
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query: str, k: int = LLM_RETRIEVAL_K) -> list[Tuple[float, str, str]]:
+        """Return up to `k` (score, title, text) chunks ranked by BM25 against `query`."""
+        for key, (title, provider) in self._sources.items():
+            self.add_document(key, title, provider())
+        if not self._chunks:
+            return []
+        count = len(self._chunks)
+        average = self._total_terms / count
+        scores: dict[int, float] = {}
+        for term in set(self._terms(query.lower())):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, frequency in postings.items():
+                length = self._chunks[chunk_id][2]
+                norm = self.K1 * (1 - self.B + self.B * length / average)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.K1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, *self._chunks[chunk_id][:2]) for chunk_id, score in ranked]
+
+    def build_context(self, query: str, k: int = LLM_RETRIEVAL_K, budget: int = LLM_RETRIEVAL_TOKENS) -> str:
+        """The top-ranked chunks for `query` that fit in `budget` tokens, as a system context."""
+        excerpts = []
+        for _, title, text in self.search(query, k):
+            tokens = self.count_tokens(text)
+            if tokens > budget:
+                continue
+            budget -= tokens
+            excerpts.append(f"--- {title} ---\n{text}")
+        if not excerpts:
+            return ""
+        return "Relevant excerpts from the user's terminal and notes:\n" + "\n".join(excerpts)
+
+
+class SearchHit(NamedTuple):
+    """One matching line found by `SearchIndex.search()`."""
+    kind: str # 'output', 'history' or 'note'
+    source: str
+    title: str
+    line: int # 1-based line number within the source
+    text: str
+    created: float
+    context: str # The matching line with a few lines around it
+
+
+class SearchIndex:
+    """
+    Incremental full-text index over command output, history and notes.
+
+    Text is stored in chunks of up to `CHUNK_LINES` lines in an SQLite FTS5
+    table. A casefolded copy of each chunk is indexed with the case-sensitive
+    trigram tokenizer, which turns substring GLOB queries into index
+    lookups; folding in Python rather than with LIKE keeps non-ASCII text
+    (``Straße``, ``ÉCHEC``) findable. Regex queries are narrowed the same way
+    using the literal runs they require (e.g. ``flag{`` in ``flag\\{\\w+\\}``)
+    before the regex is run on the candidate chunks.
+
+    Streamed output is buffered per source and written at most every
+    `interval` seconds. Notes are replaced as a whole, and the modification
+    time of the file a note was indexed from is kept with it so startup can
+    skip unchanged notes (`document_mtimes()`). All database work
+    happens on one worker thread, so neither indexing nor searching blocks
+    the event loop. Once the index grows beyond `max_bytes`, the oldest
+    output and history chunks are deleted.
+    """
+
+    CHUNK_LINES = 64
+    CHUNK_CHARS = 16384
+    CONTEXT_LINES = 3
+    MIN_LITERAL = 3 # Trigram index lookups need at least 3 characters
+
+    def __init__(
+        self,
+        path: str = SEARCH_INDEX_PATH,
+        max_bytes: int = int(SEARCH_INDEX_MAX_MB * 1024 * 1024),
+        interval: float = SEARCH_INDEX_INTERVAL,
+    ):
+        self.path = path if path == ":memory:" else str(Path(path).expanduser())
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.available = True # False if this SQLite build lacks FTS5 trigram and searches scan
+        self._streams: dict[str, dict[str, Any]] = {} # source -> partial chunk being filled
+        self._rows: list[Tuple[str, str, str, int, float, str]] = []
+        # note source -> (kind, title, text, file mtime), or None to remove it
+        self._documents: dict[str, Optional[Tuple[str, str, str, Optional[float]]]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-index")
+        self._db: Optional[sqlite3.Connection] = None
+        self._closed = False
+
+    def append(self, kind: str, source: str, title: str, text: str) -> None:
+        """Add streamed text (any chunking) to the end of `source`."""
+        stream = self._streams.get(source)
+        if stream is None:
+            stream = self._streams[source] = {
+                "kind": kind, "title": title, "line": 1, "lines": [], "chars": 0, "partial": "",
+            }
+        lines = (stream["partial"] + text).split("\n")
+        stream["partial"] = lines.pop()
+        for line in lines:
+            stream["lines"].append(line)
+            stream["chars"] += len(line) + 1
+            if len(stream["lines"]) >= self.CHUNK_LINES or stream["chars"] >= self.CHUNK_CHARS:
+                self._cut_chunk(source, stream)
+        if len(stream["partial"]) >= self.CHUNK_CHARS:
+            # A huge line without newline yet: index it in pieces
+            stream["lines"].append(stream["partial"])
+            stream["partial"] = ""
+            self._cut_chunk(source, stream, line_done=False)
+        self._schedule()
+
+    def end(self, source: str) -> None:
+        """Mark `source` as complete, indexing whatever is left of it."""
+        stream = self._streams.pop(source, None)
+        if stream is None:
+            return
+        if stream["partial"]:
+            stream["lines"].append(stream["partial"])
+        self._cut_chunk(source, stream)
+        self._schedule()
+
+    def set_document(self, kind: str, source: str, title: str, text: str,
+                     mtime: Optional[float] = None) -> None:
+        """
+        Replace the whole indexed text of `source` (e.g. a note).
+
+        `mtime` is the modification time of the file `text` was read from;
+        without one the document counts as changed at the next startup.
+        """
+        self._documents[source] = (kind, title, text, mtime)
+        self._schedule()
+
+    def remove_document(self, source: str) -> None:
+        """Drop `source` (e.g. a deleted note) from the index."""
+        self._documents[source] = None
+        self._schedule()
+
+    async def document_mtimes(self) -> dict[str, float]:
+        """File modification times of the documents indexed with one, by source."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._mtimes)
+
+    async def flush(self) -> None:
+        """Write everything buffered so far, including partially filled chunks."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Complete lines only; a line still being written is indexed once it ends
+        for source, stream in self._streams.items():
+            self._cut_chunk(source, stream)
+        rows, self._rows = self._rows, []
+        documents, self._documents = self._documents, {}
+        if (rows or documents) and not self._closed:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._write, rows, documents
+            )
+
+    async def search(
+        self, query: str, regex: bool = False, limit: int = SEARCH_MAX_RESULTS
+    ) -> list[SearchHit]:
+        """
+        Find lines matching `query`, newest first.
+
+        Plain queries match case-insensitive substrings. With `regex` the
+        query is a Python regular expression (use ``(?i)`` to ignore case).
+
+        Raises:
+            re.error: If `regex` is set and the pattern is invalid.
+        """
+        await self.flush()
+        if regex:
+            pattern = re.compile(query)
+            literals = self.required_literals(query)
+            matches = lambda line: pattern.search(line) is not None
+            # Chunks are tested as a whole first; with MULTILINE a line match
+            # is always a chunk match too (\A and \Z excepted)
+            if "\\A" in query or "\\Z" in query:
+                chunk_matches = lambda body: True
+            else:
+                chunk_pattern = re.compile(query, re.MULTILINE)
+                chunk_matches = lambda body: chunk_pattern.search(body) is not None
+        else:
+            needle = query.casefold()
+            literals = [query]
+            matches = lambda line: needle in line.casefold()
+            chunk_matches = lambda body: needle in body.casefold()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._search, literals, chunk_matches, matches, limit
+        )
+
+    @classmethod
+    def required_literals(cls, pattern: str) -> list[str]:
+        """Literal runs every match of `pattern` must contain (top level only)."""
+        try:
+            parsed = sre_parse.parse(pattern)
+        except re.error:
+            return []
+        flags = parsed.state.flags
+        if flags & re.VERBOSE:
+            return []
+        literals, run = [], []
+        for op, arg in list(parsed) + [(None, None)]:
+            if op is sre_constants.LITERAL:
+                run.append(chr(arg))
+                continue
+            literal = "".join(run)
+            # Ignoring case, `re` does not fold non-ASCII letters the way casefold() does
+            if len(literal) >= cls.MIN_LITERAL and (literal.isascii() or not flags & re.IGNORECASE):
+                literals.append(literal)
+            run = []
+        return literals
+
+    async def stats(self) -> dict[str, Any]:
+        """Number of chunks and bytes used by the index."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._stats)
+
+    async def close(self) -> None:
+        """Write pending text and release the database and its thread."""
+        if self._closed:
+            return
+        await self.flush()
+        self._closed = True
+        if self._db is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._db.close)
+            self._db = None
+        self._executor.shutdown(wait=False)
+
+    def _schedule(self) -> None:
+        # Throttled rather than debounced, so continuous output still shows up in searches
+        if self._timer is None and not self._closed:
+            self._timer = asyncio.get_running_loop().call_later(self.interval, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._timer = None
+        asyncio.ensure_future(self.flush())
+
+    def _cut_chunk(self, source: str, stream: dict[str, Any], line_done: bool = True) -> None:
+        lines = stream["lines"]
+        if not lines:
+            return
+        self._rows.append((
+            stream["kind"], source, stream["title"], stream["line"], time.time(), "\n".join(lines)
+        ))
+        # A piece of an unfinished line is continued by the next chunk
+        stream["line"] += len(lines) - (0 if line_done else 1)
+        stream["lines"], stream["chars"] = [], 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            try:
+                self._db.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+                    "folded, body UNINDEXED, kind UNINDEXED, source UNINDEXED, title UNINDEXED, "
+                    "line UNINDEXED, created UNINDEXED, tokenize='trigram case_sensitive 1', detail='none')"
+                )
+            except sqlite3.OperationalError:
+                # No FTS5/trigram: fall back to scanning a plain table
+                self.available = False
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS chunks (folded TEXT, "
+                    "body TEXT, kind TEXT, source TEXT, title TEXT, line INTEGER, created REAL)"
+                )
+            self._db.execute("CREATE TABLE IF NOT EXISTS mtimes (source TEXT PRIMARY KEY, mtime REAL)")
+        return self._db
+
+    def _write(self, rows: list[Tuple[str, str, str, int, float, str]],
+               documents: dict[str, Optional[Tuple[str, str, str, Optional[float]]]]) -> None:
+        db = self._connect()
+        with db:
+            for source, document in documents.items():
+                db.execute("DELETE FROM chunks WHERE source = ?", (source,))
+                db.execute("DELETE FROM mtimes WHERE source = ?", (source,))
+                if document is None:
+                    continue
+                kind, title, text, mtime = document
+                if mtime is not None:
+                    db.execute("INSERT INTO mtimes (source, mtime) VALUES (?, ?)", (source, mtime))
+                lines = text.split("\n")
+                now = time.time()
+                for start in range(0, len(lines), self.CHUNK_LINES):
+                    rows.append((kind, source, title, start + 1, now,
+                                 "\n".join(lines[start:start + self.CHUNK_LINES])))
+            db.executemany(
+                "INSERT INTO chunks (kind, source, title, line, created, body, folded) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(*row, row[-1].casefold()) for row in rows],
+            )
+        self._evict(db)
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        if self.path == ":memory:":
+            return
+        page_size = db.execute("PRAGMA page_size").fetchone()[0]
+        used = (db.execute("PRAGMA page_count").fetchone()[0]
+                - db.execute("PRAGMA freelist_count").fetchone()[0]) * page_size
+        if used <= self.max_bytes:
+            return
+        # Drop the oldest tenth of the streamed text; freed pages are reused
+        count = db.execute("SELECT COUNT(*) FROM chunks WHERE kind != 'note'").fetchone()[0]
+        with db:
+            db.execute(
+                "DELETE FROM chunks WHERE rowid IN (SELECT rowid FROM chunks "
+                "WHERE kind != 'note' ORDER BY rowid LIMIT ?)",
+                (max(1, count // 10),),
+            )
+
+    def _search(self, literals: list[str], chunk_matches: Callable[[str], bool],
+                matches: Callable[[str], bool], limit: int) -> list[SearchHit]:
+        db = self._connect()
+        sql = "SELECT kind, source, title, line, created, body FROM chunks"
+        # Bracketed GLOB escapes are not served by the trigram index, so
+        # wildcard characters split a literal into pieces instead
+        pieces = [piece for lit in literals for piece in re.split(r"[*?[]", lit.casefold()) if piece]
+        if pieces:
+            sql += " WHERE " + " AND ".join(["folded GLOB ?"] * len(pieces))
+        sql += " ORDER BY rowid DESC"
+        params = [f"*{piece}*" for piece in pieces]
+        hits: list[SearchHit] = []
+        for kind, source, title, first_line, created, body in db.execute(sql, params):
+            if not chunk_matches(body):
+                continue
+            lines = body.split("\n")
+            for i in range(len(lines) - 1, -1, -1):
+                if matches(lines[i]):
+                    context = "\n".join(lines[max(0, i - self.CONTEXT_LINES):i + self.CONTEXT_LINES + 1])
+                    hits.append(SearchHit(kind, source, title, first_line + i, lines[i], created, context))
+                    if len(hits) >= limit:
+                        return hits
+        return hits
+
+    def _mtimes(self) -> dict[str, float]:
+        return dict(self._connect().execute("SELECT source, mtime FROM mtimes"))
+
+    def _stats(self) -> dict[str, Any]:
+        db = self._connect()
+        page_size = db.execute("PRAGMA page_size").fetchone()[0]
+        pages = db.execute("PRAGMA page_count").fetchone()[0]
+        chunks = db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        return {"chunks": chunks, "bytes": pages * page_size}
+
+
+_litellm_acompletion: Optional[Callable[..., Awaitable[Any]]] = None
+_litellm_lock = asyncio.Lock()
+
+
+async def load_litellm() -> Callable[..., Awaitable[Any]]:
+    """
+    Import LiteLLM in a worker thread and return its `acompletion`.
+
+    Importing litellm takes seconds, so it is deferred until the first AI
+    query (or until the AI tab is first opened) instead of slowing down
+    startup, and kept off the event loop. Concurrent callers share one
+    import.
+
+    Raises:
+        Whatever importing LiteLLM raises, e.g. `ImportError` if it is not
+        installed. The next call tries again.
+    """
+    global _litellm_acompletion
+    async with _litellm_lock:
+        if _litellm_acompletion is None:
+            try:
+                module = await asyncio.to_thread(importlib.import_module, "litellm")
+            except RuntimeError as e:
+                # importlib's deadlock detection can trip on litellm's own
+                # import-time threads; whatever they finished stays imported
+                if type(e).__name__ != "_DeadlockError":
+                    raise
+                module = await asyncio.to_thread(importlib.import_module, "litellm")
+            _litellm_acompletion = module.acompletion
+    return _litellm_acompletion
+
+
+async def acompletion(*args, **kwargs) -> Any:
+    """LiteLLM's `acompletion`, importing LiteLLM on first use."""
+    completion = await load_litellm()
+    return await completion(*args, **kwargs)
+
+
+class LLMManager:
+    """Handles LLM integration using LiteLLM"""
+
+    SUMMARY_PROMPT = (
+        "You maintain the memory of a CTF assistant. Update the summary below "
+        "with the new conversation turns. Keep targets, commands, findings, "
+        "credentials, flags and open questions; drop pleasantries. Answer with "
+        "the new summary only, at most {words} words.\n\n"
+        "Current summary:\n{summary}\n\nNew turns:\n{turns}"
+    )
+    
+    MODES = ('single', 'race', 'compare')
+
+    def __init__(
+        self,
+        completion: Optional[Callable[..., Any]] = None,
+        cache: Optional[ResponseCache] = None,
+        cache_answers: bool = LLM_CACHE,
+        metrics: Optional[Metrics] = None,
+        models: Optional[dict[str, float]] = None,
+        mode: str = LLM_MODE,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+    ):
+        """
+        Args:
+            completion: Async completion function with LiteLLM's `acompletion`
+                        signature. Defaults to `acompletion`; tests and
+                        benchmarks can pass a stub.
+            cache: Response cache to use. Defaults to an on-disk
+                   `ResponseCache`.
+            cache_answers: False to use no cache at all (`cache` is
+                           ignored). Defaults to `LLM_CACHE`.
+            metrics: Registry receiving request latency, time to first token
+                     and token counts. Defaults to a private `Metrics`.
+            models: Model name -> timeout in seconds, the primary model
+                    first. Defaults to `LITELLM_MODEL` followed by `LLM_MODELS`.
+            mode: How several models are used, one of `MODES` (see
+                  `stream_llm`).
+            max_concurrency: Requests in flight at once, across all models.
+        """
+        self.conversation_history = ConversationMemory()
+        self._compaction: Optional[asyncio.Task] = None
+        # Read models from environment variables
+        if models is None:
+            models = self.parse_models(os.getenv("LITELLM_MODEL", "gpt-4") + "," + LLM_MODELS)
+        self.models = models
+        self.model = next(iter(models)) # The full model name, e.g., "ollama/mistral" or "gpt-4"
+        self.mode = mode if mode in self.MODES else 'single'
+        self.max_concurrency = max(1, max_concurrency)
+        self._request_slots: Optional[asyncio.Semaphore] = None
+        self.completion = completion or acompletion
+        self.cache = (cache if cache is not None else ResponseCache()) if cache_answers else None
+        self.metrics = metrics if metrics is not None else Metrics()
+        # Seconds until the first token of the most recent streamed answer
+        self.last_ttft: Optional[float] = None
+        # Whether the most recent answer was served from the cache
+        self.last_cached = False
+        # Estimated size of the most recent streamed request
+        self.last_prompt_tokens = 0
+        # Model that gave the most recent answer
+        self.last_model: Optional[str] = None
+
+    @staticmethod
+    def parse_models(spec: str, timeout: float = LLM_TIMEOUT) -> dict[str, float]:
+        """Parse "model[=timeout],..." into model -> timeout, in order and without duplicates."""
+        models: dict[str, float] = {}
+        for item in spec.split(","):
+            name, _, seconds = item.strip().partition("=")
+            name = name.strip()
+            if name and name not in models:
+                models[name] = float(seconds) if seconds.strip() else timeout
+        return models or {"gpt-4": timeout}
+
+    def _build_messages(self, prompt: str, context: str = "", remember: bool = True) -> list[dict[str, str]]:
+        """Build messages like Chat API expects, including the budgeted conversation history"""
+        messages = [{"role": "system", "content": context}] if context else []
+        if remember:
+            memory = self.conversation_history
+            reserve = memory.count_tokens(prompt) + (memory.count_tokens(context) if context else 0)
+            messages.extend(memory.messages(reserve))
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def _remember(self, prompt: str, answer: str) -> None:
+        """Record a finished exchange and compact the history in the background if needed"""
+        memory = self.conversation_history
+        memory.add("user", prompt)
+        memory.add("assistant", answer)
+        if memory.needs_compaction() and (self._compaction is None or self._compaction.done()):
+            self._compaction = asyncio.create_task(memory.compact(self._summarize))
+
+    async def _summarize(self, summary: str, turns: list[dict[str, Any]]) -> str:
+        """Ask the model to fold conversation turns into the running summary"""
+        prompt = self.SUMMARY_PROMPT.format(
+            words=self.conversation_history.summary_budget * 3 // 4,
+            summary=summary or "(empty)",
+            turns="\n".join(f"{turn['role']}: {turn['content']}" for turn in turns),
+        )
+        # Raises on a timeout, so compaction falls back to keeping the turns' text
+        response = await asyncio.wait_for(
+            self.completion(model=self.model, messages=[{"role": "user", "content": prompt}], stream=False),
+            self.models.get(self.model, LLM_TIMEOUT),
+        )
+        return response.choices[0].message.content or summary # type: ignore[attr-defined]
+    
+    async def _cache_lookup(
+        self, messages: list[dict[str, str]], use_cache: bool
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Return (cache key, cached answer); the key is None when caching is off.
+
+        The key covers the models and every message sent, including the
+        conversation summary and turns: a follow-up such as "explain more"
+        means something different under a different history.
+        """
+        self.last_cached = False
+        if not use_cache or self.cache is None:
+            return None, None
+        # Answers may come from any of the models, so they share one key
+        key = self.cache.make_key(",".join(self.models), messages)
+        try:
+            cached = await self.cache.fetch(key)
+        except sqlite3.Error:
+            return None, None # A broken cache must never break the assistant
+        self.last_cached = cached is not None
+        return key, cached
+
+    async def _cache_store(self, key: Optional[str], response: str) -> None:
+        if key is None or self.cache is None:
+            return
+        with contextlib.suppress(sqlite3.Error):
+            await self.cache.store(key, self.last_model or self.model, response)
+
+    def _record(self, messages: list[dict[str, str]], answer: str, started: float,
+                cached: bool = False, failed: bool = False) -> None:
+        """Count a finished request and its (estimated) tokens in the metrics"""
+        metrics = self.metrics
+        count_tokens = self.conversation_history.count_tokens
+        metrics.counter("llm_requests_total", "AI requests").value += 1
+        if cached:
+            metrics.counter("llm_cache_hits_total", "AI requests answered from the cache").value += 1
+            return
+        if failed:
+            metrics.counter("llm_errors_total", "AI requests that failed").value += 1
+        metrics.summary("llm_latency_seconds", "Time to a complete AI answer").observe(time.perf_counter() - started)
+        metrics.counter("llm_prompt_tokens_total", "Estimated tokens sent to the model").value += sum(
+            count_tokens(m["content"]) for m in messages
+        )
+        if answer:
+            metrics.counter("llm_completion_tokens_total", "Estimated tokens received").value += count_tokens(answer)
+    
+    async def query_llm(
+        self, prompt: str, context: str = "", use_cache: bool = True, remember: bool = True
+    ) -> str:
+        """
+        Query the LLM via LiteLLM with the conversation so far, answering from the cache when possible.
+
+        The models are used according to `mode`, as in `stream_llm`; in
+        'compare' mode the answers are returned one after another, each
+        under a heading naming its model.
+        """
+        started = time.perf_counter()
+        self.last_model = None
+        messages = self._build_messages(prompt, context, remember)
+        compare = self.mode == 'compare' and len(self.models) > 1
+        key, cached = await self._cache_lookup(messages, use_cache and not compare)
+        if cached is not None:
+            self._record(messages, cached, started, cached=True)
+            if remember:
+                self._remember(prompt, cached)
+            return cached
+        try:
+            if compare:
+                answers = [answer async for answer in self._compare(messages)]
+                content = "".join(self._format_comparison(*answer) for answer in answers)
+                chosen = self._preferred_answer(answers)
+            else:
+                models = list(self.models)
+                index, content = await self._first_success(
+                    [lambda model=model: self._complete(model, messages) for model in models],
+                    concurrent=self.mode == 'race',
+                )
+                self._set_answering_model(index)
+                chosen = content
+                await self._cache_store(key, content)
+            self._record(messages, content, started)
+            if remember and chosen:
+                self._remember(prompt, chosen)
+            return content
+        except Exception as e:
+            # Handle errors during the API call
+            self._record(messages, "", started, failed=True)
+            return f"⚠️ LLM error: {e}"
+
+    async def stream_llm(
+        self, prompt: str, context: str = "", use_cache: bool = True, remember: bool = True
+    ) -> AsyncGenerator[str, None]:
+        """
+        Query the LLM via LiteLLM and yield the answer as tokens arrive.
+
+        The conversation so far is sent along and the finished exchange is
+        added to it unless `remember` is False; an answer abandoned midway
+        is not remembered. A cached answer is yielded in one piece. Otherwise the time to the
+        first token is recorded in `last_ttft` and the complete answer is
+        cached. Errors are yielded as a final warning chunk, mirroring what
+        `query_llm` returns, and are not cached. Closing the generator (e.g.
+        cancelling the consumer) abandons the request mid-stream.
+
+        With several `models` the `mode` decides which one answers:
+          - 'single':  the primary model; on an error or timeout before its
+                       first token the next model is tried, and so on.
+          - 'race':    all models at once; the first to produce a token
+                       answers and the other requests are cancelled.
+          - 'compare': all models at once; each complete answer is yielded
+                       under a heading as it arrives. The primary model's
+                       answer (or else the first one) is remembered.
+        Each model has its own timeout, applied to the first token and to
+        every gap between tokens, and at most `max_concurrency` requests
+        are in flight.
+        """
+        started = time.perf_counter()
+        self.last_ttft = None
+        self.last_model = None
+        messages = self._build_messages(prompt, context, remember)
+        count_tokens = self.conversation_history.count_tokens
+        self.last_prompt_tokens = sum(count_tokens(m["content"]) for m in messages)
+        compare = self.mode == 'compare' and len(self.models) > 1
+        key, cached = await self._cache_lookup(messages, use_cache and not compare)
+        if cached is not None:
+            self.last_ttft = time.perf_counter() - started
+            self._record(messages, cached, started, cached=True)
+            yield cached
+            if remember:
+                self._remember(prompt, cached)
+            return
+        tokens = []
+        try:
+            if compare:
+                answers = []
+                async with contextlib.aclosing(self._compare(messages)) as arriving:
+                    async for answer in arriving:
+                        if self.last_ttft is None:
+                            self._first_token(started)
+                        answers.append(answer)
+                        tokens.append(self._format_comparison(*answer))
+                        yield tokens[-1]
+                self._record(messages, "".join(tokens), started)
+                chosen = self._preferred_answer(answers)
+                if remember and chosen:
+                    self._remember(prompt, chosen)
+                return
+            models = list(self.models)
+            index, (first, stream) = await self._first_success(
+                [lambda model=model: self._open_stream(model, messages) for model in models],
+                concurrent=self.mode == 'race',
+                discard=lambda opened: opened[1].aclose(),
+            )
+            self._set_answering_model(index)
+            self._first_token(started)
+            async with contextlib.aclosing(stream):
+                tokens.append(first)
+                yield first
+                async for token in stream:
+                    tokens.append(token)
+                    yield token
+            answer = "".join(tokens)
+            self._record(messages, answer, started)
+            await self._cache_store(key, answer)
+            if remember:
+                self._remember(prompt, answer)
+        except Exception as e:
+            # Handle errors during the API call
+            self._record(messages, "".join(tokens), started, failed=True)
+            yield f"⚠️ LLM error: {e}"
+
+    def _first_token(self, started: float) -> None:
+        self.last_ttft = time.perf_counter() - started
+        self.metrics.summary(
+            "llm_first_token_seconds", "Time to the first token of a streamed AI answer"
+        ).observe(self.last_ttft)
+
+    def _set_answering_model(self, index: int) -> None:
+        self.last_model = list(self.models)[index]
+        if index and self.mode == 'single':
+            self.metrics.counter("llm_fallbacks_total", "AI answers given by a fallback model").value += 1
+
+    def _slots(self) -> asyncio.Semaphore:
+        if self._request_slots is None:
+            self._request_slots = asyncio.Semaphore(self.max_concurrency)
+        return self._request_slots
+
+    def _timed_out(self, model: str) -> RuntimeError:
+        self.metrics.counter("llm_timeouts_total", "AI requests abandoned after their model's timeout").value += 1
+        return RuntimeError(f"{model}: no answer within {self.models.get(model, LLM_TIMEOUT):g}s")
+
+    async def _complete(self, model: str, messages: list[dict[str, str]]) -> str:
+        """One model's whole answer, within its timeout and a request slot"""
+        async with self._slots():
+            try:
+                response = await asyncio.wait_for(
+                    self.completion(model=model, messages=messages, stream=False),
+                    self.models.get(model, LLM_TIMEOUT),
+                )
+            except asyncio.TimeoutError:
+                raise self._timed_out(model) from None
+            except Exception as e:
+                raise RuntimeError(f"{model}: {e}") from e
+        # Pylance may incorrectly infer 'response' as CustomStreamWrapper here.
+        # LiteLLM documentation states acompletion(stream=False) returns a ModelResponse.
+        content = response.choices[0].message.content # type: ignore[attr-defined]
+        if content is None:
+            raise RuntimeError(f"{model}: returned no content")
+        return content
+
+    async def _stream_model(self, model: str, messages: list[dict[str, str]]) -> AsyncGenerator[str, None]:
+        """One model's answer token by token, holding a request slot until closed"""
+        timeout = self.models.get(model, LLM_TIMEOUT)
+        async with self._slots():
+            try:
+                response = await asyncio.wait_for(
+                    self.completion(model=model, messages=messages, stream=True), timeout
+                )
+                chunks = response.__aiter__() # type: ignore[union-attr]
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    token = chunk.choices[0].delta.content
+                    if token:
+                        yield token
+            except asyncio.TimeoutError:
+                raise self._timed_out(model) from None
+            except Exception as e:
+                raise RuntimeError(f"{model}: {e}") from e
+
+    async def _open_stream(
+        self, model: str, messages: list[dict[str, str]]
+    ) -> Tuple[str, AsyncGenerator[str, None]]:
+        """Start streaming from one model and wait for its first token"""
+        stream = self._stream_model(model, messages)
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            raise RuntimeError(f"{model}: returned no content") from None
+        except BaseException:
+            await stream.aclose()
+            raise
+        return first, stream
+
+    async def _first_success(
+        self,
+        attempts: list[Callable[[], Awaitable[Any]]],
+        concurrent: bool,
+        discard: Optional[Callable[[Any], Awaitable[Any]]] = None,
+    ) -> Tuple[int, Any]:
+        """
+        Run `attempts` until one succeeds and return its index and result.
+
+        Attempts run one after another (each failure falls back to the
+        next) or, if `concurrent`, all at once: the first success wins and
+        the rest are cancelled. Results of other attempts that succeeded
+        anyway are handed to `discard` to release them.
+
+        Raises:
+            RuntimeError: If every attempt failed, listing the failures.
+        """
+        errors: dict[int, BaseException] = {}
+        if not concurrent:
+            for index, attempt in enumerate(attempts):
+                try:
+                    return index, await attempt()
+                except Exception as e:
+                    errors[index] = e
+        else:
+            tasks = {asyncio.create_task(attempt()): index for index, attempt in enumerate(attempts)}
+            try:
+                while tasks:
+                    done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    winner = None
+                    for task in done:
+                        index = tasks.pop(task)
+                        error = task.exception()
+                        if error is not None:
+                            errors[index] = error
+                        elif winner is None:
+                            winner = (index, task.result())
+                        elif discard is not None:
+                            await discard(task.result())
+                    if winner is not None:
+                        return winner
+            finally:
+                # Cancel the losers (or everything, if we are cancelled ourselves)
+                for task in tasks:
+                    task.cancel()
+                for result in await asyncio.gather(*tasks, return_exceptions=True):
+                    if discard is not None and not isinstance(result, BaseException):
+                        await discard(result)
+        raise RuntimeError("; ".join(str(errors[index]) for index in sorted(errors)))
+
+    async def _compare(
+        self, messages: list[dict[str, str]]
+    ) -> AsyncGenerator[Tuple[str, float, Optional[str], Optional[str]], None]:
+        """Ask every model at once, yielding (model, seconds, answer, error) as each finishes"""
+        started = time.perf_counter()
+
+        async def ask(model: str) -> Tuple[str, float, Optional[str], Optional[str]]:
+            try:
+                answer = await self._complete(model, messages)
+                return model, time.perf_counter() - started, answer, None
+            except Exception as e:
+                return model, time.perf_counter() - started, None, str(e)
+
+        tasks = [asyncio.create_task(ask(model)) for model in self.models]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _format_comparison(model: str, seconds: float, answer: Optional[str], error: Optional[str]) -> str:
+        return f"\n── {model} ({seconds:.1f}s) ──\n{answer if answer is not None else f'⚠️ {error}'}\n"
+
+    def _preferred_answer(self, answers: list[Tuple[str, float, Optional[str], Optional[str]]]) -> str:
+        """The answer of the first model in `models` order that gave one, or ''"""
+        given = {model: answer for model, _, answer, _ in answers if answer is not None}
+        for model in self.models:
+            if model in given:
+                self.last_model = model
+                return given[model]
+        return ""
+
+
+# Toolbox transforms. Each task is a module-level function, so a
+# ProcessPoolExecutor worker can import and run it; it reads its own slice of
+# the input file rather than having the data pickled over to it.
+
+_PRINTABLE = bytes(range(0x20, 0x7f)) + b"\t\n\r"
+_TEXT = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz "
+_ROT13 = bytes.maketrans(
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz",
+    b"NOPQRSTUVWXYZABCDEFGHIJKLMnopqrstuvwxyzabcdefghijklm",
+)
+_ROT47 = bytes.maketrans(bytes(range(33, 127)), bytes(33 + (b - 33 + 47) % 94 for b in range(33, 127)))
+_digest = operator.methodcaller("digest")
+
+
+def _numpy() -> Any:
+    """NumPy if it is installed, else None; every transform also works without it."""
+    try:
+        return importlib.import_module("numpy")
+    except ImportError:
+        return None
+
+
+def _read_chunk(path: str, start: int, end: int, whole_lines: bool = False, overlap: int = 0) -> bytes:
+    """
+    Bytes `start` to `end` of a file, plus `overlap` bytes past the end.
+
+    With `whole_lines`, the lines that start in that range instead: a line
+    straddling `start` belongs to the previous chunk.
+    """
+    with open(path, "rb") as f:
+        if whole_lines and start:
+            f.seek(start - 1)
+            f.readline()
+        else:
+            f.seek(start)
+        data = f.read(max(0, end - f.tell()) + overlap)
+        if whole_lines and data and not data.endswith(b"\n"):
+            data += f.readline()
+    return data
+
+
+def _printable_ratio(data: bytes) -> float:
+    return 1 - len(data.translate(None, _PRINTABLE)) / len(data) if data else 0.0
+
+
+def _xor_bytes(a: bytes, b: bytes) -> bytes:
+    """`a` XOR `b` (of equal length), as one big-integer operation rather than a byte loop."""
+    np = _numpy() if len(a) > 4096 else None
+    if np is not None:
+        return np.bitwise_xor(np.frombuffer(a, np.uint8), np.frombuffer(b, np.uint8)).tobytes()
+    return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(len(a), "little")
+
+
+def _byte_histogram(data: bytes) -> list[int]:
+    np = _numpy()
+    if np is not None:
+        return np.bincount(np.frombuffer(data, np.uint8), minlength=256).tolist()
+    counts = collections.Counter(data)
+    return [counts[b] for b in range(256)]
+
+
+def _xor_chunk(path: str, start: int, end: int, cribs: list[bytes],
+               max_hits: int = 100) -> tuple[list[int], list[tuple[int, int, bytes]]]:
+    """
+    Byte histogram of a file chunk and the single-byte XOR keys that turn
+    it into one of the `cribs`.
+
+    Plaintext XOR a key matches a crib exactly where consecutive bytes
+    differ (XOR) the way the crib's do, whatever the key, so each crib takes
+    one search of the chunk's deltas instead of one per key.
+
+    Returns:
+        The histogram, and (offset, key, decrypted preview) per crib match.
+    """
+    data = _read_chunk(path, start, end, overlap=max(map(len, cribs), default=1) - 1)
+    histogram = _byte_histogram(data[:end - start])
+    hits = []
+    deltas = _xor_bytes(data[:-1], data[1:])
+    for crib in cribs:
+        if len(crib) < 2:
+            continue
+        pattern = _xor_bytes(crib[:-1], crib[1:])
+        position = deltas.find(pattern)
+        while 0 <= position < end - start and len(hits) < max_hits:
+            key = data[position] ^ crib[0]
+            preview = _xor_bytes(data[position:position + 64], bytes([key]) * len(data[position:position + 64]))
+            hits.append((start + position, key, preview))
+            position = deltas.find(pattern, position + 1)
+    return histogram, hits
+
+
+def _crack_chunk(path: str, start: int, end: int,
+                 targets: dict[str, frozenset[bytes]]) -> tuple[int, list[tuple[str, bytes]]]:
+    """
+    Hashes the wordlist lines starting in a chunk with each algorithm in
+    `targets` (hashlib name -> digests wanted).
+
+    Returns:
+        The number of words tried, and (hex digest, word) per hash cracked.
+    """
+    words = _read_chunk(path, start, end, whole_lines=True).splitlines()
+    found = []
+    for algorithm, digests in targets.items():
+        new = getattr(hashlib, algorithm)
+        # The set intersection keeps the per-word loop in C; the words are
+        # only walked again in Python when something was cracked
+        cracked = digests.intersection(map(_digest, map(new, words)))
+        for word in words if cracked else ():
+            digest = new(word).digest()
+            if digest in cracked:
+                found.append((digest.hex(), word))
+                cracked = cracked - {digest}
+                if not cracked:
+                    break
+    return len(words), found
+
+
+def _entropy_chunk(path: str, start: int, end: int, window: int) -> list[float]:
+    """Shannon entropy, in bits per byte, of each `window` bytes of a file chunk."""
+    data = _read_chunk(path, start, end)
+    np = _numpy()
+    if np is not None:
+        values = np.frombuffer(data, np.uint8)
+        counts = np.array([np.bincount(values[i:i + window], minlength=256)
+                           for i in range(0, len(values), window)], dtype=float)
+        if not len(counts):
+            return []
+        p = counts / counts.sum(axis=1, keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (-np.nansum(p * np.log2(p), axis=1)).tolist()
+    entropies = []
+    for offset in range(0, len(data), window):
+        block = data[offset:offset + window]
+        size = len(block)
+        entropies.append(-sum(count / size * math.log2(count / size)
+                              for count in collections.Counter(block).values()))
+    return entropies
+
+
+def _padded(data: bytes, block: int) -> bytes:
+    data = data.rstrip(b"=")
+    return data + b"=" * (-len(data) % block)
+
+
+# Decoder name -> (what a valid input looks like, with whitespace removed, or
+# None to just try it; decode function)
+_DECODERS: dict[str, tuple[Optional["re.Pattern[bytes]"], Callable[[bytes], bytes]]] = {
+    "base64": (re.compile(rb"[A-Za-z0-9+/]+=*"), lambda d: base64.b64decode(_padded(d, 4), validate=True)),
+    "base64url": (re.compile(rb"[A-Za-z0-9_-]+=*"), lambda d: base64.urlsafe_b64decode(_padded(d, 4))),
+    "base32": (re.compile(rb"[A-Za-z2-7]+=*"), lambda d: base64.b32decode(_padded(d, 8), casefold=True)),
+    "base85": (None, base64.b85decode),
+    "ascii85": (None, lambda d: base64.a85decode(d, adobe=d.startswith(b"<~"))),
+    "hex": (re.compile(rb"(?:0x)?(?:[0-9a-fA-F]{2})+"), lambda d: bytes.fromhex(d.removeprefix(b"0x").decode())),
+    "binary": (re.compile(rb"(?:[01]{8})+"), lambda d: int(d, 2).to_bytes(len(d) // 8, "big")),
+    "url": (None, urllib.parse.unquote_to_bytes),
+    "rot13": (None, lambda d: d.translate(_ROT13)),
+    "rot47": (None, lambda d: d.translate(_ROT47)),
+}
+
+
+def _decode_step(name: str, data: bytes) -> Optional[bytes]:
+    """`data` decoded by one decoder, or None if invalid, unchanged or no longer mostly printable."""
+    pattern, decode = _DECODERS[name]
+    data = data.strip()
+    if pattern is not None:
+        data = b"".join(data.split())
+        if not pattern.fullmatch(data):
+            return None
+    try:
+        decoded = decode(data)
+    except ValueError:
+        return None
+    if not decoded or decoded == data or _printable_ratio(decoded) < 0.95:
+        return None
+    return decoded
+
+
+def _decode_chains(data: bytes, first: str, depth: int, cribs: list[bytes],
+                   limit: int = 20000, keep: int = 10) -> list[tuple[float, list[str], bytes]]:
+    """
+    Decoding chains of up to `depth` steps that start with decoder `first`.
+
+    Chains are explored depth first and dropped as soon as a step fails, so
+    only decodings that stay printable are followed, at most `limit` of them.
+    A chain is also dropped when a step gives back the input or an earlier
+    step's output (only rot13/rot47 cycles keep the length), so detours
+    that come back to where they started are neither ranked nor extended.
+
+    Returns:
+        The `keep` best (score, chain, output) by how much the output looks
+        like text; outputs containing a crib score above 1.
+    """
+    found = []
+    stack = [([first], data, (data,))]
+    while stack and len(found) < limit:
+        chain, encoded, seen = stack.pop()
+        decoded = _decode_step(chain[-1], encoded)
+        if decoded is None or decoded in seen:
+            continue
+        score = 1 - len(decoded.translate(None, _TEXT)) / len(decoded)
+        found.append((score + any(crib in decoded for crib in cribs), chain, decoded[:256]))
+        if len(chain) < depth:
+            # rot13 and rot47 undo themselves
+            seen += (decoded,)
+            stack.extend((chain + [name], decoded, seen) for name in _DECODERS
+                         if not (name == chain[-1] and name.startswith("rot")))
+    found.sort(key=lambda candidate: candidate[0], reverse=True)
+    return found[:keep]
+
+
+class TransformManager:
+    """
+    Runs CPU-heavy CTF transforms in a pool of worker processes.
+
+    Each transform is split into independent tasks (a chunk of a file, a
+    slice of a wordlist, a decoding branch) run by module-level functions in
+    a `ProcessPoolExecutor`, so a run uses every core while the event loop
+    stays free. Progress and results stream back as tasks complete. Only a
+    few tasks per worker are queued at a time, so closing a run's generator
+    cancels the rest promptly; tasks already running finish in the
+    background.
+    """
+
+    TRANSFORMS = {
+        "xor": "XOR brute force",
+        "hash": "Hash cracking",
+        "entropy": "Entropy scan",
+        "decode": "Decoding chains",
+    }
+    HASH_ALGORITHMS = {32: "md5", 40: "sha1", 56: "sha224", 64: "sha256", 96: "sha384", 128: "sha512"}
+    ENTROPY_HIGH = 7.2 # Bits per byte; compressed or encrypted data is close to 8
+    SPARKLINE = "▁▂▃▄▅▆▇█"
+
+    def __init__(
+        self,
+        workers: int = TOOLBOX_WORKERS,
+        chunk_mb: float = TOOLBOX_CHUNK_MB,
+        wordlist: str = TOOLBOX_WORDLIST,
+        decode_depth: int = TOOLBOX_DECODE_DEPTH,
+        cribs: Optional[list[bytes]] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        """
+        Args:
+            workers: Worker processes, or 0 for one per CPU.
+            chunk_mb: Size of the file chunk or wordlist slice per task.
+            wordlist: Default wordlist for hash cracking.
+            decode_depth: Default maximum decoding chain length.
+            cribs: Known plaintext looked for by the XOR and decode
+                   transforms. Defaults to `SCANNER_FLAG_FORMATS` + '{'.
+            metrics: Registry receiving run durations and task counts.
+        """
+        self.workers = workers if workers > 0 else os.cpu_count() or 1
+        self.chunk_size = max(1, int(chunk_mb * 2**20))
+        self.wordlist = wordlist
+        self.decode_depth = max(1, decode_depth)
+        self.cribs = cribs if cribs is not None else [f"{fmt}{{".encode() for fmt in SCANNER_FLAG_FORMATS]
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.max_in_flight = 2 * self.workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def run(self, transform: str, source: str, argument: str = "") -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Runs a transform and yields its progress and results as they come.
+
+        Inputs per transform:
+          - 'xor':     `source` is a file; `argument` optional known plaintext
+                       (default: the flag formats).
+          - 'hash':    `source` holds hex digests (MD5, SHA-1 or SHA-2, told
+                       apart by length); `argument` a wordlist file.
+          - 'entropy': `source` is a file; `argument` the window size in bytes
+                       (default 4096).
+          - 'decode':  `source` is the encoded text, or a file holding it;
+                       `argument` the maximum chain length.
+
+        Yields:
+            Tuple[str, Any]: ('progress', (tasks done, tasks total)),
+                             ('match', str) for each find as it is made,
+                             ('result', str) summary lines at the end, and
+                             ('error', str) if the run could not complete.
+        """
+        runs = {"xor": self._xor, "hash": self._crack, "entropy": self._entropy, "decode": self._decode}
+        if transform not in runs:
+            yield ('error', f"Unknown transform: {transform!r}")
+            return
+        started = time.perf_counter()
+        try:
+            async with contextlib.aclosing(runs[transform](source.strip(), argument.strip())) as items:
+                async for item in items:
+                    yield item
+        except (OSError, ValueError) as e:
+            yield ('error', str(e))
+        except BrokenProcessPool as e:
+            self.close() # Start a fresh pool next time
+            yield ('error', f"A worker process died: {e}")
+        finally:
+            self.metrics.summary(f"toolbox_{transform}_seconds", f"Duration of toolbox {transform} runs").observe(
+                time.perf_counter() - started
+            )
+
+    def close(self) -> None:
+        """Stops the worker processes, dropping queued tasks."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _map(
+        self, work: Callable[..., Any], tasks: list[tuple]
+    ) -> AsyncGenerator[Tuple[int, Any, Tuple[int, int]], None]:
+        """
+        Runs `work(*args)` for each task in the pool, with at most
+        `max_in_flight` queued, and yields (task index, result, (tasks done,
+        total)) in completion order.
+        """
+        if self._pool is None:
+            # Not fork: the app has threads running, which fork would copy mid-flight
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            if os.name == "posix":
+                # The pool's helper process is handed stderr's file descriptor,
+                # which Textual's capture of stderr does not have
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+                    importlib.import_module("multiprocessing.resource_tracker").ensure_running()
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=context)
+        loop = asyncio.get_running_loop()
+        completed = self.metrics.counter("toolbox_tasks_total", "Toolbox tasks completed")
+        queued = iter(enumerate(tasks))
+        pending: dict[asyncio.Future, int] = {}
+        done = 0
+        try:
+            while True:
+                for index, args in itertools.islice(queued, self.max_in_flight - len(pending)):
+                    pending[loop.run_in_executor(self._pool, work, *args)] = index
+                if not pending:
+                    return
+                finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in finished:
+                    index = pending.pop(future)
+                    done += 1
+                    completed.value += 1
+                    yield index, future.result(), (done, len(tasks))
+        finally:
+            # Queued tasks are dropped; running ones cannot be interrupted
+            for future in pending:
+                future.cancel()
+
+    def _chunks(self, path: str, align: int = 1) -> list[tuple[str, int, int]]:
+        """(path, start, end) of each chunk of a file, chunk sizes a multiple of `align`."""
+        size = os.path.getsize(path)
+        step = max(align, self.chunk_size // align * align)
+        return [(path, start, min(start + step, size)) for start in range(0, size, step)]
+
+    async def _xor(self, path: str, crib: str) -> AsyncGenerator[Tuple[str, Any], None]:
+        cribs = [crib.encode()] if crib else self.cribs
+        path = str(Path(path).expanduser())
+        histogram = [0] * 256
+        hits = 0
+        async with contextlib.aclosing(self._map(_xor_chunk, [
+            chunk + (cribs,) for chunk in await asyncio.to_thread(self._chunks, path)
+        ])) as results:
+            async for _, (counts, found), progress in results:
+                histogram = list(map(operator.add, histogram, counts))
+                for offset, key, preview in found:
+                    hits += 1
+                    yield ('match', f"key 0x{key:02x} at 0x{offset:08x}: {preview!r}")
+                yield ('progress', progress)
+        total = sum(histogram)
+        if not total:
+            yield ('result', "Empty file")
+            return
+        # Letters and spaces under each key, from the histogram alone
+        text = [sum(histogram[b] for b in range(256) if (b ^ key) in _TEXT) for key in range(256)]
+        head = await asyncio.to_thread(_read_chunk, path, 0, 48)
+        yield ('result', f"{hits} crib match(es). Keys giving the most text:")
+        for key in sorted(range(256), key=text.__getitem__, reverse=True)[:5]:
+            plain = _xor_bytes(head, bytes([key]) * len(head))
+            yield ('result', f"  key 0x{key:02x}: {text[key] / total:6.1%} letters/space  {plain!r}")
+
+    async def _crack(self, hashes: str, wordlist: str) -> AsyncGenerator[Tuple[str, Any], None]:
+        targets: dict[str, set[bytes]] = {}
+        for value in re.split(r"[\s,;]+", hashes):
+            if not value:
+                continue
+            algorithm = self.HASH_ALGORITHMS.get(len(value))
+            if algorithm is None:
+                raise ValueError(f"Not an MD5/SHA-1/SHA-2 hex digest: {value}")
+            targets.setdefault(algorithm, set()).add(bytes.fromhex(value))
+        if not targets:
+            raise ValueError("No hashes given")
+        wanted = sum(map(len, targets.values()))
+        path = str(Path(wordlist or self.wordlist).expanduser())
+        frozen = {algorithm: frozenset(digests) for algorithm, digests in targets.items()}
+        started = time.perf_counter()
+        tried = cracked = 0
+        async with contextlib.aclosing(self._map(_crack_chunk, [
+            chunk + (frozen,) for chunk in await asyncio.to_thread(self._chunks, path)
+        ])) as results:
+            async for _, (words, found), progress in results:
+                tried += words
+                for digest, word in found:
+                    cracked += 1
+                    yield ('match', f"{digest}:{word.decode('utf-8', 'replace')}")
+                yield ('progress', progress)
+                if cracked == wanted:
+                    break # Everything found: drop the rest of the wordlist
+        elapsed = time.perf_counter() - started
+        yield ('result', f"{cracked}/{wanted} cracked, {tried:,} words in {elapsed:.1f}s "
+                         f"({tried / max(elapsed, 1e-9):,.0f}/s)")
+
+    async def _entropy(self, path: str, window: str) -> AsyncGenerator[Tuple[str, Any], None]:
+        size = int(window or 4096)
+        if size < 16:
+            raise ValueError("Window must be at least 16 bytes")
+        path = str(Path(path).expanduser())
+        chunks = await asyncio.to_thread(self._chunks, path, size)
+        by_chunk: dict[int, list[float]] = {}
+        async with contextlib.aclosing(self._map(_entropy_chunk, [chunk + (size,) for chunk in chunks])) as results:
+            async for index, entropies, progress in results:
+                by_chunk[index] = entropies
+                yield ('progress', progress)
+        profile = [entropy for index in range(len(chunks)) for entropy in by_chunk[index]]
+        if not profile:
+            yield ('result', "Empty file")
+            return
+        # Runs of windows above ENTROPY_HIGH, as byte ranges
+        regions = []
+        for high, run in itertools.groupby(enumerate(profile), lambda item: item[1] >= self.ENTROPY_HIGH):
+            if high:
+                run = list(run)
+                regions.append((run[0][0] * size, (run[-1][0] + 1) * size,
+                                sum(entropy for _, entropy in run) / len(run)))
+        for start, end, mean in regions[:50]:
+            yield ('match', f"0x{start:08x}-0x{end:08x}  {mean:.2f} bits/byte (compressed or encrypted?)")
+        # Profile squeezed into at most 64 columns, each the highest window in it
+        columns = min(64, len(profile))
+        step = len(profile) / columns
+        peaks = [max(profile[int(i * step):max(int(i * step) + 1, int((i + 1) * step))]) for i in range(columns)]
+        line = "".join(self.SPARKLINE[min(7, int(peak))] for peak in peaks)
+        yield ('result', f"{len(profile)} windows of {size} bytes, mean {sum(profile) / len(profile):.2f}, "
+                         f"max {max(profile):.2f} bits/byte, {len(regions)} high-entropy region(s)")
+        yield ('result', f"0 {line} 8")
+
+    async def _decode(self, source: str, depth: str) -> AsyncGenerator[Tuple[str, Any], None]:
+        path = Path(source).expanduser()
+        if len(source) < 4096 and await asyncio.to_thread(path.is_file):
+            data = await asyncio.to_thread(path.read_bytes)
+        else:
+            data = source.encode()
+        if not data:
+            raise ValueError("Nothing to decode")
+        max_depth = int(depth or self.decode_depth)
+        # Shortest chain to each distinct output
+        candidates: dict[bytes, tuple[float, list[str]]] = {}
+        async with contextlib.aclosing(self._map(_decode_chains, [
+            (data, name, max_depth, self.cribs) for name in _DECODERS
+        ])) as results:
+            async for _, found, progress in results:
+                for score, chain, output in found:
+                    if output in candidates and len(candidates[output][1]) <= len(chain):
+                        continue
+                    if score > 1 and output not in candidates:
+                        yield ('match', f"{' > '.join(chain)}: {output!r}")
+                    candidates[output] = (score, chain)
+                yield ('progress', progress)
+        if not candidates:
+            yield ('result', "No decoding chain gave printable output")
+            return
+        ranked = sorted(candidates.items(), key=lambda candidate: candidate[1][0], reverse=True)
+        yield ('result', "Most text-like decodings:")
+        for output, (score, chain) in ranked[:10]:
+            yield ('result', f"  {' > '.join(chain)}: {output[:120]!r}")
+
+
+# =============================================================================
+# WIDGETS - Reusable Output Components
+# =============================================================================
+
+# Control characters that would corrupt the rendered line
+_sub_control = re.compile("[\u0000-\u0008\u000b-\u001f\u007f]").sub
+
+
+class ScrollbackBuffer:
+    """
+    Bounded ring buffer of output lines with coalesced writes.
+
+    Writes are only queued; `flush()` joins everything queued since the last
+    flush, splits it into lines and appends them to a `deque` capped at
+    `max_lines`, so the oldest lines fall off in O(1) and memory stays bounded
+    however much a command prints. A trailing chunk without a newline is kept
+    as a partial line and completed by the next write.
+    """
+
+    MAX_PENDING_WRITES = 4096
+
+    def __init__(self, max_lines: int = TERMINAL_SCROLLBACK_LINES):
+        """
+        Initializes the ScrollbackBuffer.
+
+        Args:
+            max_lines: Maximum number of complete lines to retain.
+        """
+        self.max_lines = max(1, max_lines)
+        self.lines: deque[str] = deque(maxlen=self.max_lines)
+        self.partial = ""
+        self.dropped = 0
+        self._pending: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.lines) + (1 if self.partial else 0)
+
+    def __getitem__(self, index: int) -> str:
+        if index == len(self.lines) and self.partial:
+            return self.partial
+        return self.lines[index]
+
+    @property
+    def has_pending(self) -> bool:
+        """Whether there are queued writes that have not been flushed yet."""
+        return bool(self._pending)
+
+    def write(self, text: str) -> None:
+        """Queue text for the next flush."""
+        if text:
+            self._pending.append(text)
+            # Keep pending text bounded even if nobody flushes for a while
+            if len(self._pending) >= self.MAX_PENDING_WRITES:
+                self.flush()
+
+    def flush(self) -> list[str]:
+        """
+        Moves all queued text into the ring buffer.
+
+        Returns:
+            list[str]: The lines touched by this flush (including the current
+                       partial line), for width bookkeeping by the caller.
+        """
+        if not self._pending:
+            return []
+        data = self.partial + "".join(self._pending)
+        self._pending.clear()
+        new_lines = data.split("\n")
+        self.partial = new_lines.pop()
+        overflow = len(self.lines) + len(new_lines) - self.max_lines
+        if overflow > 0:
+            self.dropped += overflow
+        # Only the tail can survive the cap, skip appending lines that would be evicted
+        self.lines.extend(new_lines[-self.max_lines:])
+        if self.partial:
+            new_lines.append(self.partial)
+        return new_lines
+
+    def clear(self) -> None:
+        """Drops all retained and pending output."""
+        self.lines.clear()
+        self.partial = ""
+        self.dropped = 0
+        self._pending.clear()
+
+
+# Printable ASCII is shown as-is in the hexdump gutter, everything else as '.'
+_HEXDUMP_ASCII = bytes(b if 0x20 <= b < 0x7f else ord('.') for b in range(256))
+
+
+class HexDumpFormatter:
+    """
+    Incremental `hexdump -C` style formatter for streamed bytes.
+
+    Bytes are fed in arbitrary chunks; complete 16-byte rows are formatted
+    immediately and an incomplete row is carried over to the next `feed()`,
+    so offsets stay continuous and memory is bounded by one row.
+    """
+
+    ROW = 16
+
+    def __init__(self):
+        self.offset = 0
+        self._carry = b""
+
+    def feed(self, data: bytes) -> str:
+        """Formats all complete rows available after appending `data`."""
+        data = self._carry + data
+        complete = len(data) - len(data) % self.ROW
+        self._carry = data[complete:]
+        return "".join(self._format_row(data[i:i + self.ROW]) for i in range(0, complete, self.ROW))
+
+    def finish(self) -> str:
+        """Formats the trailing partial row and the final offset."""
+        rows = self._format_row(self._carry) if self._carry else ""
+        self._carry = b""
+        return rows + f"{self.offset:08x}\n"
+
+    def _format_row(self, row: bytes) -> str:
+        hex_part = row[:8].hex(" ") + "  " + row[8:].hex(" ")
+        line = f"{self.offset:08x}  {hex_part:<49} |{row.translate(_HEXDUMP_ASCII).decode('ascii')}|\n"
+        self.offset += len(row)
+        return line
+
+
+def split_markdown_blocks(text: str) -> list[str]:
+    """
+    Split markdown into top-level blocks at blank lines.
+
+    Fenced code blocks are kept whole, and indented text following a blank
+    line (list item continuations, indented code) stays with the block
+    above it, so every block renders the same on its own as in context.
+    """
+    blocks: list[str] = []
+    current: list[str] = []
+    fence = ""
+    for line in text.split("\n"):
+        stripped = line.lstrip()
+        if fence:
+            current.append(line)
+            if stripped.startswith(fence):
+                fence = ""
+            continue
+        if stripped.startswith(("```", "~~~")):
+            fence = stripped[:3]
+        if not stripped and not fence:
+            if current:
+                current.append(line)
+            continue
+        if current and not current[-1].strip() and not line.startswith((" ", "\t")):
+            blocks.append("\n".join(current).rstrip("\n"))
+            current = []
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current).rstrip("\n"))
+    return blocks
+
+
+class MarkdownPreview(ScrollView):
+    """
+    Markdown preview that re-renders only the blocks that changed.
+
+    The document is split into top-level blocks, each rendered on its own by
+    Rich's `Markdown` into lines that are cached with the block, so a
+    block's height is known without rendering it again. On update the new
+    block list is diffed against the previous one (common prefix and
+    suffix) and only the blocks in between are rendered. The view draws
+    through the line API like `ScrollbackLog`: a repaint looks up just the
+    lines on screen, so typing inside one block costs the same however long
+    the document is. Only a change of width re-renders every block. With
+    `incremental=False` the whole note is one block.
+    """
+
+    DEFAULT_CSS = """
+    MarkdownPreview {
+        overflow-x: hidden;
+        overflow-y: auto;
+        scrollbar-gutter: stable;
+    }
+    """
+
+    def __init__(self, markdown: str = "", incremental: bool = NOTES_PREVIEW_INCREMENTAL,
+                 id: Optional[str] = None):
+        super().__init__(id=id)
+        self.incremental = incremental
+        self._blocks: list[str] = []
+        self._lines: list[list[Strip]] = [] # Per block, at `_render_width`; empty until sized
+        self._starts = [0] # First line of each block, then the total line count
+        self._render_width = 0
+        self.update(markdown)
+
+    def update(self, markdown: str) -> None:
+        """Render `markdown`, touching only the blocks that differ from the last update"""
+        blocks = split_markdown_blocks(markdown) if self.incremental else [markdown]
+        old = self._blocks
+        prefix = 0
+        limit = min(len(old), len(blocks))
+        while prefix < limit and old[prefix] == blocks[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] == blocks[-1 - suffix]:
+            suffix += 1
+        self._blocks = blocks
+        if not self._render_width:
+            return # Rendered once the width is known
+        self._lines[prefix:len(old) - suffix] = [
+            self._render_block(block) for block in blocks[prefix:len(blocks) - suffix]
+        ]
+        self._relayout()
+
+    def on_resize(self) -> None:
+        width = self.scrollable_content_region.width
+        if width != self._render_width:
+            self._render_width = width
+            self._lines = [self._render_block(block) for block in self._blocks]
+            self._relayout()
+
+    def render_line(self, y: int) -> Strip:
+        index = self.scroll_offset.y + y
+        width = self.size.width
+        rich_style = self.rich_style
+        if index >= self._starts[-1]:
+            return Strip.blank(width, rich_style)
+        block = bisect.bisect_right(self._starts, index) - 1
+        strip = self._lines[block][index - self._starts[block]]
+        return strip.apply_style(rich_style).crop_extend(0, width, rich_style)
+
+    def _render_block(self, block: str) -> list[Strip]:
+        """A block's lines followed by a blank one separating it from the next"""
+        console = self.app.console
+        width = self._render_width
+        lines = console.render_lines(RichMarkdown(block), console.options.update_width(width), pad=False)
+        return [Strip(line) for line in lines] + [Strip.blank(width)]
+
+    def _relayout(self) -> None:
+        self._starts = [0, *itertools.accumulate(map(len, self._lines))]
+        self.virtual_size = Size(self._render_width, self._starts[-1])
+        self.refresh()
+
+
+if WrappedDocument is not None:
+    class _CountedWrappedDocument(WrappedDocument):
+        @property
+        def height(self) -> int:
+            # One entry per wrapped line, instead of summing every line's wrap offsets
+            return len(self._offset_to_line_info)
+else:
+    _CountedWrappedDocument = None
+
+
+class NoteEditor(TextArea):
+    """
+    `TextArea` whose repaints cost the same however long the note is.
+
+    Textual's `WrappedDocument.height` walks every line of the document and
+    `TextArea` asks for it once per line it renders, so each keystroke in a
+    long note walked the whole note for every visible line. The wrapped
+    document already keeps one entry per wrapped line, which gives the same
+    height without the walk.
+
+    This leans on Textual internals (`TextArea._set_document`, the
+    `WrappedDocument` module and its `_offset_to_line_info`). When a Textual
+    release lacks any of them, or the count disagrees with the stock height,
+    the editor keeps the stock `WrappedDocument`.
+    """
+
+    def _set_document(self, text: str, language: Optional[str]) -> None:
+        super()._set_document(text, language)
+        self._count_wrapped_lines()
+
+    def _count_wrapped_lines(self) -> None:
+        document = getattr(self, "wrapped_document", None)
+        if _CountedWrappedDocument is None or type(document) is not WrappedDocument:
+            return
+        line_info = getattr(document, "_offset_to_line_info", None)
+        if isinstance(line_info, list) and len(line_info) == document.height:
+            document.__class__ = _CountedWrappedDocument
+
+
+class ScrollbackLog(ScrollView, can_focus=True):
+    """
+    Read-only scrollback pane for streaming command output.
+
+    Unlike `TextArea`, appending never rebuilds the document: text is queued in
+    a `ScrollbackBuffer` and flushed at a fixed frame rate, so the cost of a
+    command's output is linear in its size and the UI repaints at most
+    `flush_fps` times per second regardless of how fast lines arrive.
+    """
+
+    COMPONENT_CLASSES = {"scrollback-log--match"}
 
-        Yields:
-            Tuple[str, Any]: A tuple containing the output type and the data.
-                             Possible types are:
-                             - ('stdout', str): A line from standard output.
-                             - ('stderr', str): A line from standard error.
-                             - ('error', str): An error message if an exception occurred
-                                               during command setup or execution.
-                             - ('returncode', int): The exit code of the command.
-        
-        Raises:
-            RuntimeError: If the subprocess fails to provide stdout/stderr streams.
-                          (This is caught internally and yielded as an 'error' event).
-        """
-        try:
-            # Record command in history
-            self.history.append({
-                'command': command,
-                'timestamp': datetime.now().strftime('%H:%M:%S'),
-                'cwd': str(self.current_dir)
-            })
-            
-            # Launch the command as a subprocess
-            # Note: Using shell=True can be a security risk if `command` comes from
-            # untrusted input. For this PoC, it's assumed to be from user input
-            # within the TUI.
-            process = await asyncio.create_subprocess_shell(
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=str(self.current_dir) # Execute in the manager's current directory
-            )
+    DEFAULT_CSS = """
+    ScrollbackLog {
+        background: $surface;
+        color: $text;
+        overflow: scroll;
+    }
+    ScrollbackLog > .scrollback-log--match {
+        background: $warning;
+        color: $background;
+        text-style: bold;
+    }
+    """
 
-            # Ensure stdout and stderr streams were successfully captured
-            if process.stdout is None or process.stderr is None:
-                # This should ideally not happen with PIPE, but good to check.
-                raise RuntimeError("Failed to get stdout/stderr streams from subprocess.")
+    def __init__(
+        self,
+        text: str = "",
+        max_lines: int = TERMINAL_SCROLLBACK_LINES,
+        flush_fps: int = TERMINAL_FLUSH_FPS,
+        scanner: Optional[OutputScanner] = None,
+        id: Optional[str] = None,
+        classes: Optional[str] = None,
+    ):
+        super().__init__(id=id, classes=classes)
+        self.buffer = ScrollbackBuffer(max_lines)
+        self.flush_fps = max(1, flush_fps)
+        # Highlights its matches; only visible lines are scanned
+        self.scanner = scanner
+        self._width = 0
+        self.buffer.write(text)
 
-            # Queues to hold lines from stdout and stderr
-            stdout_queue: asyncio.Queue[str] = asyncio.Queue()
-            stderr_queue: asyncio.Queue[str] = asyncio.Queue()
+    def on_mount(self) -> None:
+        self.flush()
+        self.set_interval(1 / self.flush_fps, self.flush)
 
-            # Create tasks to read from stdout and stderr streams concurrently
-            # and put lines into their respective queues.
-            stdout_task = asyncio.create_task(self._enqueue_stream(process.stdout, stdout_queue))
-            stderr_task = asyncio.create_task(self._enqueue_stream(process.stderr, stderr_queue))
+    def write(self, text: str) -> None:
+        """Queue text for display on the next frame."""
+        self.buffer.write(text)
 
-            # Main loop to yield output as it becomes available from the queues
-            while True:
-                stdout_done = stdout_task.done()
-                stderr_done = stderr_task.done()
-                stdout_empty = stdout_queue.empty()
-                stderr_empty = stderr_queue.empty()
+    def flush(self) -> None:
+        """Applies queued text to the view and follows the tail if already there."""
+        if not self.buffer.has_pending:
+            return
+        follow = self.is_vertical_scroll_end
+        new_lines = self.buffer.flush()
+        widest = max((cell_len(line) for line in new_lines), default=0)
+        self._width = max(self._width, widest)
+        self.virtual_size = Size(self._width, len(self.buffer))
+        if follow:
+            self.scroll_end(animate=False, immediate=True, x_axis=False)
+        self.refresh()
 
-                # Exit condition: both stream reading tasks are done, and their queues are empty.
-                if stdout_done and stderr_done and stdout_empty and stderr_empty:
-                    break
+    def clear(self) -> None:
+        """Removes all output from the pane."""
+        self.buffer.clear()
+        self._width = 0
+        self.virtual_size = Size(0, 0)
+        self.refresh()
 
-                # Yield lines from stdout if available
-                if not stdout_empty:
-                    yield ('stdout', await stdout_queue.get())
-                
-                # Yield lines from stderr if available
-                if not stderr_empty:
-                    yield ('stderr', await stderr_queue.get())
-                
-                # If queues are empty but tasks are still running,
-                # sleep briefly to prevent busy-waiting and allow other tasks to run.
-                if stdout_empty and stderr_empty and (not stdout_done or not stderr_done):
-                    await asyncio.sleep(0.001)
-
-            # Ensure both stream reading tasks have fully completed.
-            await asyncio.gather(stdout_task, stderr_task)
-            # Wait for the subprocess itself to terminate.
-            await process.wait()
-            # Yield the final return code of the command.
-            yield ('returncode', process.returncode or 0)
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        index = scroll_y + y
+        width = self.size.width
+        rich_style = self.rich_style
+        if index >= len(self.buffer):
+            return Strip.blank(width, rich_style)
+        line = _sub_control("\ufffd", self.buffer[index].expandtabs())
+        text = Text(line, no_wrap=True, style=rich_style)
+        if self.scanner is not None:
+            for _, start, end in self.scanner.scan(line):
+                text.stylize(self.get_component_rich_style("scrollback-log--match"), start, end)
+        strip = Strip(text.render(self.app.console), cell_len(line))
+        return strip.crop_extend(scroll_x, scroll_x + width, rich_style)
 
-        except Exception as e:
-            # If any other exception occurs (e.g., command not found, permission issues),
-            # yield an error message and a non-zero return code.
-            yield ('error', str(e))
-            yield ('returncode', 1) # Indicate failure
 
-    async def _enqueue_stream(self, stream: asyncio.StreamReader, queue: asyncio.Queue[str]) -> None:
-        """
-        Asynchronously reads lines from a stream and puts them into a queue.
+class LogView(ScrollbackLog):
+    """
+    Scrollback pane over a `MappedLog`, paging lines in from disk as scrolled.
 
-        This helper function is used to concurrently process stdout and stderr
-        of a subprocess. It decodes lines as UTF-8, replacing errors.
+    Only the lines on screen are read and rendered, so a multi-GB log opens
+    instantly and costs no more memory than a short one. A log still being
+    written is followed at the frame rate, like a live `ScrollbackLog`.
+    """
 
-        Args:
-            stream: The asyncio.StreamReader to read from (e.g., process.stdout).
-            queue: The asyncio.Queue to put the read lines into.
-        """
-        while True:
-            line_bytes = await stream.readline()
-            if not line_bytes: # EOF
-                break
-            await queue.put(line_bytes.decode('utf-8', errors='replace'))
+    def __init__(self, flush_fps: int = TERMINAL_FLUSH_FPS, scanner: Optional[OutputScanner] = None,
+                 id: Optional[str] = None, classes: Optional[str] = None):
+        super().__init__(flush_fps=flush_fps, scanner=scanner, id=id, classes=classes)
+        self.source: Optional[MappedLog] = None # Named so as not to shadow Widget.log
+        self._seen_width = 0
 
+    def open(self, log: MappedLog) -> None:
+        """Shows a log from its first line, closing the one shown before."""
+        self.close()
+        self.buffer = log
+        self.source = log
+        self._width = self._seen_width = 0
+        self.virtual_size = Size(0, len(log))
+        self.scroll_home(animate=False, immediate=True)
+        self.refresh()
 
-class MarkdownManager:
-    """Handles markdown note taking and rendering"""
-    
-    def __init__(self):
-        self.current_note = "# CTF Toolkit Notes\n\n*Start taking notes...*"
-    
-    def update_content(self, content: str):
-        """Update the current markdown content"""
-        self.current_note = content
-    
-    def get_rendered_content(self) -> str:
-        """Get the current markdown content"""
-        return self.current_note
+    def close(self) -> None:
+        if self.source is not None:
+            self.source.close()
+        self.source = None
+        self.buffer = ScrollbackBuffer()
+        self.clear()
 
+    def write(self, text: str) -> None:
+        raise TypeError("LogView shows a log file; write to its OutputLog")
 
-class LLMManager:
-    """Handles LLM integration using LiteLLM"""
-    
-    def __init__(self):
-        self.conversation_history = []
-        # Read model from environment variable
-        model_env = os.getenv("LITELLM_MODEL", "gpt-4")
-        self.model = model_env # Store the full model name, e.g., "ollama/mistral" or "gpt-4"
-    
-    async def query_llm(self, prompt: str, context: str = "") -> str:
-        """Query the LLM via LiteLLM"""
-        try:
-            # Build messages like Chat API expects
-            messages = [{"role": "system", "content": context}] if context else []
-            messages.append({"role": "user", "content": prompt})
-            
-            response = await acompletion(
-                model=self.model,
-                messages=messages,
-                stream=False,  # Set True if you want streaming later
-            )
-            # Extract content from the response
-            # Extract content from the response
-            # Pylance may incorrectly infer 'response' as CustomStreamWrapper here.
-            # LiteLLM documentation states acompletion(stream=False) returns a ModelResponse.
-            content = response.choices[0].message.content # type: ignore[attr-defined]
-            if content is None:
-                # Consider logging this case or raising a more specific error
-                return "⚠️ LLM returned no content."
-            return content
-        except Exception as e:
-            # Handle errors during the API call
-            return f"⚠️ LLM error: {e}"
+    def flush(self) -> None:
+        """Picks up lines appended to a live log and widens to lines seen so far."""
+        if self.source is None:
+            return
+        grew = self.source.writer is not None and self.source.refresh()
+        if not grew and self._seen_width <= self._width:
+            return
+        follow = grew and self.is_vertical_scroll_end
+        self._width = max(self._width, self._seen_width)
+        self.virtual_size = Size(self._width, len(self.source))
+        if follow:
+            self.scroll_end(animate=False, immediate=True, x_axis=False)
+        self.refresh()
+
+    def render_line(self, y: int) -> Strip:
+        # Line widths are only known once read, so the scrollable width grows
+        # to the widest line displayed
+        index = self.scroll_offset.y + y
+        if index < len(self.buffer):
+            self._seen_width = max(self._seen_width, cell_len(self.buffer[index].expandtabs()))
+        return super().render_line(y)
 
 
 # =============================================================================
 # UI COMPONENTS - Individual Tab Implementations
 # =============================================================================
 
+class VisibilityMixin:
+    """For tab contents that skip work while their tab is not shown"""
+
+    @property
+    def display_visible(self) -> bool:
+        """Whether the tab is currently shown (its pane is the active one)"""
+        return self.is_mounted and all(node.display for node in self.ancestors_with_self)
+
+
 class TerminalTab(Container):
-    """Terminal tab with command execution"""
+    """Terminal tab with command execution, a background job table, history recall and output logs"""
+
+    BINDINGS = [
+        Binding("up", "history_previous", "Previous command", show=False),
+        Binding("down", "history_next", "Next command", show=False),
+        Binding("ctrl+r", "history_search", "History"),
+        Binding("ctrl+l", "toggle_logs", "Logs"),
+        Binding("escape", "close_panel", "Close", show=False),
+    ]
     
     def __init__(self):
         super().__init__()
-        self.terminal_manager = TerminalManager()
+        self.terminal_manager = TerminalManager(
+            scanner=OutputScanner.from_file() if SCANNER else None, metrics=self.app.metrics
+        )
+        # Up/Down recall: commands starting with what was typed, most recent
+        # first, and the one currently shown (-1 = the typed text itself)
+        self._recall: Optional[list[str]] = None
+        self._recall_prefix = ""
+        self._recall_position = -1
+        self._history_results: list[str] = []
+        self._log_meta: dict[str, dict] = {} # Listed output logs by name
     
     def compose(self) -> ComposeResult:
         yield Static("🖥️  Terminal", classes="tab-header")
-        yield TextArea("Welcome to CTF Toolkit Terminal!\n", id="terminal-output", read_only=True)
+        yield ScrollbackLog("Welcome to CTF Toolkit Terminal!\n"
+                            "Append '&' to run a command in the background, 'kill %N' to stop job N.\n"
+                            "Tick 'PTY' to keep one shell (cwd, variables) across commands.\n",
+                            scanner=self.terminal_manager.scanner,
+                            id="terminal-output")
+        with Vertical(id="log-panel"):
+            with Horizontal(id="log-bar"):
+                yield Select([], prompt="Output log", id="log-select")
+                yield Label("", id="log-status")
+            yield LogView(scanner=self.terminal_manager.scanner, id="log-view")
+        yield DataTable(id="job-table", cursor_type="row", zebra_stripes=True)
+        yield DataTable(id="findings-table", cursor_type="row", zebra_stripes=True)
+        with Vertical(id="history-search"):
+            yield Input(placeholder="Search history - Enter to use, Esc to close", id="history-query")
+            yield OptionList(id="history-matches")
         with Horizontal(id="terminal-input-container"):
             yield Input(placeholder="Enter command...", id="terminal-input")
+            yield Select(
+                [("Lines", "line"), ("Chunks", "chunk"), ("Hexdump", "raw")],
+                value=self.terminal_manager.stream_mode,
+                allow_blank=False,
+                id="terminal-mode",
+            )
+            yield Checkbox(
+                "PTY",
+                value=self.terminal_manager.use_session,
+                disabled=not ShellSession.is_supported(),
+                id="terminal-session",
+            )
             yield Button("Execute", id="terminal-execute", variant="primary")
+
+    def on_mount(self) -> None:
+        table = self.query_one("#job-table", DataTable)
+        for label, key in (("ID", "id"), ("Status", "status"), ("Exit", "exit"),
+                           ("Time", "time"), ("Lines", "lines"), ("Command", "command")):
+            table.add_column(label, key=key)
+        table.display = False
+        findings = self.query_one("#findings-table", DataTable)
+        for label, key in (("Job", "job"), ("Kind", "kind"), ("Finding", "value")):
+            findings.add_column(label, key=key)
+        findings.display = False
+        self.query_one("#history-search").display = False
+        self.query_one("#log-panel").display = False
+        # Elapsed time and line counts of running jobs change continuously
+        self.set_interval(1.0, self.refresh_running_jobs)
+        self.run_worker(self.load_history(), exit_on_error=False)
+
+    async def load_history(self) -> None:
+        """Bring back earlier sessions' commands without blocking the UI"""
+        history = self.terminal_manager.history
+        older = await asyncio.to_thread(history.read)
+        history.merge_older(older)
+        if self.terminal_manager.logs is not None:
+            await asyncio.to_thread(self.terminal_manager.logs.prune)
     
     async def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id == "terminal-execute":
-            await self.execute_command()
+            self.execute_command()
     
     async def on_input_submitted(self, event: Input.Submitted) -> None:
         if event.input.id == "terminal-input":
-            await self.execute_command()
+            self.execute_command()
+        elif event.input.id == "history-query":
+            self.use_history_match(self.query_one("#history-matches", OptionList).highlighted)
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        if event.input.id == "terminal-input":
+            # Editing the command starts a new Up/Down recall from what is typed
+            if self._recall is not None and event.value != self._recalled():
+                self._recall = None
+        elif event.input.id == "history-query":
+            self.update_history_matches(event.value)
+
+    def on_option_list_option_selected(self, event: OptionList.OptionSelected) -> None:
+        if event.option_list.id == "history-matches":
+            self.use_history_match(event.option_index)
+
+    def _recalled(self) -> str:
+        if self._recall_position < 0:
+            return self._recall_prefix
+        return self._recall[self._recall_position]
+
+    def _history_search_open(self) -> bool:
+        return self.query_one("#history-search").display
+
+    def action_history_previous(self) -> None:
+        """Recall the previous command starting with the typed text"""
+        if self._history_search_open():
+            self.query_one("#history-matches", OptionList).action_cursor_up()
+            return
+        input_widget = self.query_one("#terminal-input", Input)
+        if self.app.focused is not input_widget:
+            return
+        if self._recall is None:
+            self._recall_prefix = input_widget.value
+            self._recall = self.terminal_manager.history.with_prefix(input_widget.value)
+            self._recall_position = -1
+        if self._recall_position + 1 < len(self._recall):
+            self._recall_position += 1
+            input_widget.value = self._recalled()
+            input_widget.cursor_position = len(input_widget.value)
+
+    def action_history_next(self) -> None:
+        """Step back towards the typed text"""
+        if self._history_search_open():
+            self.query_one("#history-matches", OptionList).action_cursor_down()
+            return
+        input_widget = self.query_one("#terminal-input", Input)
+        if self.app.focused is not input_widget or self._recall is None or self._recall_position < 0:
+            return
+        self._recall_position -= 1
+        input_widget.value = self._recalled()
+        input_widget.cursor_position = len(input_widget.value)
+
+    def action_history_search(self) -> None:
+        """Open the fuzzy history search, seeded with the typed command"""
+        panel = self.query_one("#history-search")
+        query = self.query_one("#history-query", Input)
+        if not panel.display:
+            panel.display = True
+            query.value = self.query_one("#terminal-input", Input).value
+            self.update_history_matches(query.value)
+        query.focus()
+
+    def action_close_history_search(self) -> None:
+        if self._history_search_open():
+            self.query_one("#history-search").display = False
+            self.query_one("#terminal-input", Input).focus()
+
+    def action_close_panel(self) -> None:
+        """Close the history search, else the output log"""
+        if self._history_search_open():
+            self.action_close_history_search()
+        elif self.query_one("#log-panel").display:
+            self.close_log()
+
+    async def action_toggle_logs(self) -> None:
+        """Browse the output logs of this and earlier sessions"""
+        if self.query_one("#log-panel").display:
+            self.close_log()
+            return
+        self.query_one("#log-panel").display = True
+        self.query_one("#terminal-output").display = False
+        await self.load_logs()
+        self.query_one("#log-select", Select).focus()
+
+    async def load_logs(self, selected: Optional[str] = None) -> None:
+        """List past logs, newest first, and select one"""
+        logs = self.terminal_manager.logs
+        entries = await asyncio.to_thread(logs.list) if logs is not None else []
+        self._log_meta = dict(entries)
+        select = self.query_one("#log-select", Select)
+        select.set_options(
+            (f"{datetime.fromtimestamp(meta.get('started', 0)):%Y-%m-%d %H:%M:%S}  "
+             f"{meta.get('command', '')}", name)
+            for name, meta in entries
+        )
+        if selected in self._log_meta:
+            select.value = selected
+        elif not entries:
+            self.query_one("#log-status", Label).update(
+                "Output logging is off (TERMINAL_LOG)" if logs is None else "No output logs yet"
+            )
+
+    def show_log(self, name: str) -> None:
+        """Page the named log into the log view"""
+        log = self.terminal_manager.logs.open(name)
+        self.query_one("#log-view", LogView).open(log)
+        meta = self._log_meta.get(name, {})
+        if log.writer is not None:
+            status = "running"
+        elif "exit_code" in meta:
+            status = f"exit {meta['exit_code']}, {meta.get('bytes', 0) / 1024:,.0f} KB"
+        else:
+            status = "unfinished"
+        self.query_one("#log-status", Label).update(f"{len(log):,} lines, {status}")
+
+    def close_log(self) -> None:
+        self.query_one("#log-view", LogView).close()
+        self.query_one("#log-panel").display = False
+        self.query_one("#terminal-output").display = True
+        self.query_one("#terminal-input", Input).focus()
+
+    def on_select_changed(self, event: Select.Changed) -> None:
+        if event.select.id == "log-select" and isinstance(event.value, str):
+            try:
+                self.show_log(event.value)
+            except OSError as e:
+                self.query_one("#log-status", Label).update(f"Cannot open log: {e}")
+
+    def update_history_matches(self, query: str) -> None:
+        self._history_results = self.terminal_manager.history.fuzzy(query)
+        matches = self.query_one("#history-matches", OptionList)
+        matches.clear_options()
+        matches.add_options(Text(command) for command in self._history_results)
+        if self._history_results:
+            matches.highlighted = 0
+
+    def use_history_match(self, index: Optional[int]) -> None:
+        """Put the chosen command into the input, ready to edit or run"""
+        if index is None or index >= len(self._history_results):
+            return
+        input_widget = self.query_one("#terminal-input", Input)
+        input_widget.value = self._history_results[index]
+        input_widget.cursor_position = len(input_widget.value)
+        self.action_close_history_search()
+
+    def on_checkbox_changed(self, event: Checkbox.Changed) -> None:
+        if event.checkbox.id == "terminal-session":
+            self.terminal_manager.use_session = event.value
+
+    async def on_data_table_row_selected(self, event: DataTable.RowSelected) -> None:
+        """Open the selected job's output log (or replay its buffer), or copy the selected finding."""
+        if event.row_key.value is None:
+            return
+        if event.data_table.id == "findings-table":
+            kind, _, value = event.row_key.value.partition(":")
+            self.app.copy_to_clipboard(value)
+            self.app.notify(f"Copied {kind}: {value}")
+            return
+        if event.data_table.id != "job-table":
+            return
+        job = self.terminal_manager.jobs.get(int(event.row_key.value))
+        if job is None:
+            return # Forgotten between the click and now
+        if job.log is not None and job.log.error is None:
+            self.query_one("#log-panel").display = True
+            self.query_one("#terminal-output").display = False
+            await self.load_logs(selected=job.log.name)
+            return
+        output = job.output
+        output.flush()
+        output_widget = self.query_one("#terminal-output", ScrollbackLog)
+        output_widget.write(f"\n--- [{job.id}] {job.command} ({job.status}) ---\n")
+        if output.dropped:
+            output_widget.write(f"[{output.dropped} earlier lines dropped]\n")
+        output_widget.write("".join(line + "\n" for line in output.lines) + output.partial)
     
-    async def execute_command(self):
-        """Execute the command from input"""
+    def execute_command(self):
+        """Schedule the command from input as a job without waiting for it"""
         input_widget = self.query_one("#terminal-input", Input)
-        output_widget = self.query_one("#terminal-output", TextArea)
+        output_widget = self.query_one("#terminal-output", ScrollbackLog)
         
         command = input_widget.value.strip()
+        if command.startswith("kill %"):
+            input_widget.value = ""
+            self.kill_job(command[len("kill %"):])
+            return
+
+        # While a command runs in the PTY session, input lines are typed into
+        # it instead (the terminal echoes them back).
+        session = self.terminal_manager.session
+        if self.terminal_manager.use_session and session is not None and session.busy:
+            session.send_input(input_widget.value + "\n")
+            input_widget.value = ""
+            return
+
         if not command:
             return
-        
-        # Clear input and show executing
         input_widget.value = ""
-        output_widget.text += f"\n{command}\n[Executing...]\n"
-        output_widget.scroll_end(animate=False) # Auto-scroll
-        
-        # Execute command and process output incrementally
-        return_code = 1 # Default to error
-        async for stream_type, value in self.terminal_manager.execute_command(command):
-            if stream_type == 'stdout':
-                output_widget.text += value
-            elif stream_type == 'stderr':
-                output_widget.text += f"[STDERR] {value}"
-            elif stream_type == 'error':
-                output_widget.text += f"[ERROR] {value}\n"
-            elif stream_type == 'returncode':
-                return_code = value
-            output_widget.scroll_end(animate=False) # Auto-scroll
-
-        output_widget.text += f"[Exit Code: {return_code}]\n"
-        output_widget.scroll_end(animate=False) # Auto-scroll
-
-
-class MarkdownTab(Container):
-    """Markdown notes tab with live preview"""
+        self._recall = None
+
+        background = command.endswith("&") and not command.endswith("&&")
+        if background:
+            command = command[:-1].rstrip()
+
+        # Foreground jobs stream into the terminal as they run (batched by the
+        # ScrollbackLog and painted once per frame); background jobs only fill
+        # their own buffer until selected in the job table. Both are indexed
+        # for search as they stream.
+        mode = self.query_one("#terminal-mode", Select).value
+        job = self.terminal_manager.submit_job(
+            command,
+            mode=mode,
+            background=background,
+            # A background job must not hold up the session, give it its own shell
+            use_session=False if background else None,
+            on_output=self.job_output_background if background else self.job_output,
+            on_update=self.job_updated,
+            on_finding=self.job_finding,
+        )
+        self.app.search_index.append(
+            "history", "history", "command history",
+            f"{datetime.now():%Y-%m-%d %H:%M:%S} {self.terminal_manager.current_dir}$ {command}\n",
+        )
+        if background:
+            output_widget.write(f"\n[{job.id}] {command} &\n")
+        else:
+            output_widget.write(f"\n{command}\n[Executing...]\n")
+        self.update_job_row(job)
+
+    def job_output(self, job: Job, text: str) -> None:
+        self.query_one("#terminal-output", ScrollbackLog).write(text)
+        self.job_output_background(job, text)
+
+    def job_output_background(self, job: Job, text: str) -> None:
+        self.app.search_index.append("output", f"job:{job.id}", f"$ {job.command}", text)
+
+    def job_finding(self, job: Job, finding: Finding) -> None:
+        """List a new flag/secret in the findings table (once across all jobs)"""
+        if not self.is_attached:
+            return
+        table = self.query_one("#findings-table", DataTable)
+        row_key = f"{finding.kind}:{finding.value}"
+        if row_key in table.rows:
+            return
+        table.display = True
+        table.add_row(str(job.id), finding.kind, Text(finding.value), key=row_key)
+        if finding.kind == "flag":
+            self.app.notify(f"Flag found by job {job.id}: {finding.value}", timeout=10)
+
+    def kill_job(self, job_ref: str) -> None:
+        """Kill a job by the id given after 'kill %'"""
+        output_widget = self.query_one("#terminal-output", ScrollbackLog)
+        if not job_ref.isdigit() or not self.terminal_manager.cancel_job(int(job_ref)):
+            output_widget.write(f"\n[ERROR] No active job %{job_ref}\n")
+
+    def job_updated(self, job: Job) -> None:
+        """Reflect a job's new status and index its output for the AI once it finishes"""
+        self.update_job_row(job)
+        if not job.is_active:
+            output = job.output
+            output.flush()
+            text = "\n".join(output.lines) + ("\n" + output.partial if output.partial else "")
+            self.app.context_index.add_document(f"job:{job.id}", f"$ {job.command}", text)
+            self.app.search_index.end(f"job:{job.id}")
+
+    def update_job_row(self, job: Job) -> None:
+        """Add or refresh the job's row in the job table"""
+        if not self.is_attached:
+            return # Jobs killed while the tab is torn down
+        table = self.query_one("#job-table", DataTable)
+        table.display = True
+        if not job.is_active:
+            # Jobs the manager has forgotten to make room for this one leave the table too
+            for forgotten in [key for key in table.rows if int(key.value) not in self.terminal_manager.jobs]:
+                table.remove_row(forgotten)
+        row_key = str(job.id)
+        values = {
+            "id": str(job.id),
+            "status": job.status,
+            "exit": "" if job.return_code is None else str(job.return_code),
+            "time": f"{job.elapsed:.1f}s",
+            "lines": str(job.lines),
+            "command": job.command + (" &" if job.background else ""),
+        }
+        if row_key not in table.rows:
+            table.add_row(*values.values(), key=row_key)
+            return
+        for column, value in values.items():
+            table.update_cell(row_key, column, value)
+        if job.background and not job.is_active:
+            exit_note = "" if job.return_code is None else f" (exit {job.return_code})"
+            self.query_one("#terminal-output", ScrollbackLog).write(
+                f"[{job.id}] {job.status}: {job.command}{exit_note}\n"
+            )
+
+    async def on_unmount(self) -> None:
+        # Don't leave commands or the shell session running after the terminal goes away
+        await self.terminal_manager.close()
+
+    def refresh_running_jobs(self) -> None:
+        for job in self.terminal_manager.jobs.values():
+            if job.status == 'running':
+                self.update_job_row(job)
+
+
+class MarkdownTab(VisibilityMixin, Container):
+    """Markdown notes tab with a debounced, incremental live preview"""
     
     def __init__(self):
         super().__init__()
-        self.markdown_manager = MarkdownManager()
+        self.markdown_manager = MarkdownManager(NoteStore(on_flush=self.notes_saved))
+        self.preview_debounce = NOTES_PREVIEW_DEBOUNCE
+        self.pause_when_hidden = NOTES_PREVIEW_PAUSE_HIDDEN
+        self._preview_timer: Optional[Timer] = None
+        self._preview_stale = False
+        self._note_keys: list[str] = []
     
     def compose(self) -> ComposeResult:
         yield Static("📝 Notes", classes="tab-header")
-        with Horizontal():
+        manager = self.markdown_manager
+        with Horizontal(id="notes-bar"):
+            yield Select([], prompt="Notes", id="notes-select")
+            yield Input(placeholder="challenge/note - Enter to open or create", id="notes-open")
+            yield Label(f"{manager.challenge}/{manager.note_name}", id="notes-status")
+        with Horizontal(id="notes-panes"):
             with Vertical():
                 yield Label("Editor")
-                yield TextArea(
+                yield NoteEditor(
                     self.markdown_manager.current_note,
                     id="markdown-editor",
                     language="markdown"
                 )
             with Vertical():
                 yield Label("Preview")
-                yield Markdown(self.markdown_manager.current_note, id="markdown-preview")
+                yield MarkdownPreview(self.markdown_manager.current_note, id="markdown-preview")
+
+    def on_mount(self) -> None:
+        self.track_note()
+        self.index_note()
+        # Only the open note is read at startup; the rest are listed in the background
+        self.run_worker(self.load_note_list(), group="notes-list")
+
+    async def on_unmount(self) -> None:
+        store = self.markdown_manager.store
+        if store is not None:
+            # The status label is already gone; just write what is left
+            store.on_flush = None
+            await store.flush()
+
+    async def load_note_list(self) -> None:
+        """Fill the note selector with every challenge/note name on disk"""
+        store = self.markdown_manager.store
+        if store is None:
+            return
+
+        def scan() -> list[str]:
+            return [f"{challenge}/{name}"
+                    for challenge in store.list_challenges()
+                    for name in store.list_notes(challenge)]
+
+        self.set_note_options(await asyncio.to_thread(scan))
+
+    def set_note_options(self, keys: list[str]) -> None:
+        manager = self.markdown_manager
+        current = f"{manager.challenge}/{manager.note_name}"
+        if current not in keys:
+            keys = sorted([*keys, current])
+        self._note_keys = keys
+        select = self.query_one("#notes-select", Select)
+        with select.prevent(Select.Changed):
+            select.set_options((key, key) for key in keys)
+            select.value = current
+
+    def on_select_changed(self, event: Select.Changed) -> None:
+        if event.select.id == "notes-select" and isinstance(event.value, str):
+            self.open_note(event.value)
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        if event.input.id == "notes-open" and event.value.strip():
+            event.input.value = ""
+            self.open_note(event.value)
+
+    def open_note(self, key: str) -> None:
+        """Open `challenge/note` (or just `note` in the current challenge)"""
+        manager = self.markdown_manager
+        challenge, _, name = key.strip().rpartition("/")
+        challenge = NoteStore.clean_name(challenge or manager.challenge)
+        name = NoteStore.clean_name(name)
+        if (challenge, name) == (manager.challenge, manager.note_name):
+            return
+        # The note being left stays indexed for the AI as last edited
+        self.app.context_index.unregister_source(f"note:{manager.challenge}/{manager.note_name}")
+        content = manager.open_note(challenge, name)
+        self.query_one("#markdown-editor", TextArea).load_text(content)
+        self.track_note()
+        self.index_note()
+        self.query_one("#notes-status", Label).update(f"{challenge}/{name}")
+        self.set_note_options(self._note_keys)
+        self._preview_stale = True
+        self.refresh_preview()
+
+    def track_note(self) -> None:
+        """Have the open note re-indexed for the AI, as edited, whenever a prompt is sent"""
+        manager = self.markdown_manager
+        key = f"{manager.challenge}/{manager.note_name}"
+        self.app.context_index.register_source(f"note:{key}", key, manager.get_rendered_content)
+
+    def index_note(self) -> None:
+        """Queue the open note for (re-)indexing by the search panel"""
+        manager = self.markdown_manager
+        key = f"{manager.challenge}/{manager.note_name}"
+        self.app.search_index.set_document("note", f"note:{key}", key, manager.current_note)
+
+    def notes_saved(self, error: Optional[Exception]) -> None:
+        """Autosave result, shown next to the note name"""
+        manager = self.markdown_manager
+        state = f"save failed: {error}" if error else f"saved {datetime.now():%H:%M:%S}"
+        # An autosave finishing during shutdown may find the label already removed
+        for label in self.query("#notes-status").results(Label):
+            label.update(f"{manager.challenge}/{manager.note_name} ({state})")
     
     def on_text_area_changed(self, event: TextArea.Changed) -> None:
         if event.text_area.id == "markdown-editor":
-            # Update manager
+            # Update manager; the store writes it back once edits pause
             self.markdown_manager.update_content(event.text_area.text)
-            # Update preview
-            preview = self.query_one("#markdown-preview", Markdown)
-            preview.update(event.text_area.text)
+            self.index_note()
+            # Re-render the preview once typing pauses
+            self._preview_stale = True
+            if self._preview_timer is not None:
+                self._preview_timer.stop()
+            if self.preview_debounce > 0:
+                self._preview_timer = self.set_timer(self.preview_debounce, self.refresh_preview)
+            else:
+                self.refresh_preview()
 
+    def on_show(self) -> None:
+        # Catch up on edits made while the preview was paused
+        self.refresh_preview()
+
+    def refresh_preview(self) -> None:
+        """Render the current note into the preview if it is stale and visible"""
+        if not self._preview_stale:
+            return
+        if self.pause_when_hidden and not self.display_visible:
+            return
+        self._preview_stale = False
+        preview = self.query_one("#markdown-preview", MarkdownPreview)
+        with self.app.metrics.timer("markdown_render_seconds", "Time to parse and update changed preview blocks"):
+            preview.update(self.markdown_manager.current_note)
 
-from textual.containers import Vertical  # Add this if not imported
 
 class AITab(Container):
     """AI assistant tab that mimics terminal layout"""
 
+    BINDINGS = [
+        Binding("escape", "cancel_response", "Stop answer"),
+    ]
+
     def __init__(self):
         super().__init__()
-        self.llm_manager = LLMManager()
+        self.llm_manager = LLMManager(metrics=self.app.metrics)
+        self._pending: list[str] = []
+        self._response_worker: Optional[Worker] = None
 
     def compose(self) -> ComposeResult:
         yield Static("🤖 AI Assistant", classes="tab-header")
-        yield TextArea("Welcome to the AI Assistant!\n", id="ai-output", read_only=True)
+        yield TextArea("Welcome to the AI Assistant!\n"
+                       "The conversation is remembered within a token budget; '/clear' forgets it.\n",
+                       id="ai-output", read_only=True)
         with Horizontal(id="ai-input-container"):
             yield Input(placeholder="Ask a question...", id="ai-input")
+            yield Checkbox("Context", value=True, id="ai-context")
+            yield Checkbox("Cache", value=self.llm_manager.cache is not None,
+                           disabled=self.llm_manager.cache is None, id="ai-cache")
+            # Only useful with more than one model configured (LLM_MODELS)
+            if len(self.llm_manager.models) > 1:
+                yield Select(
+                    [("Fallback", "single"), ("Race", "race"), ("Compare", "compare")],
+                    value=self.llm_manager.mode,
+                    allow_blank=False,
+                    id="ai-mode",
+                )
             yield Button("Send", id="ai-send", variant="primary")
+            yield Button("Stop", id="ai-stop", variant="error", disabled=True)
+
+    def on_mount(self) -> None:
+        # Tokens are appended in batches, once per frame
+        self.set_interval(1 / TERMINAL_FLUSH_FPS, self.flush_output)
+        # Import LiteLLM while the first question is being typed
+        if self.llm_manager.completion is acompletion:
+            self.run_worker(self.warm_up(), group="litellm-import", exit_on_error=False)
+
+    async def warm_up(self) -> None:
+        """Import LiteLLM in the background, reporting a failure instead of crashing the app"""
+        try:
+            await load_litellm()
+        except Exception as e:
+            self.write_output(f"\n[LiteLLM unavailable, questions will fail: {type(e).__name__}: {e}]\n")
 
     async def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id == "ai-send":
             await self.send_prompt()
+        elif event.button.id == "ai-stop":
+            self.action_cancel_response()
+
+    def on_select_changed(self, event: Select.Changed) -> None:
+        if event.select.id == "ai-mode":
+            self.llm_manager.mode = event.value
 
     async def on_input_submitted(self, event: Input.Submitted) -> None:
         if event.input.id == "ai-input":
@@ -330,22 +4580,358 @@ class AITab(Container):
 
     async def send_prompt(self):
         input_widget = self.query_one("#ai-input", Input)
-        output_widget = self.query_one("#ai-output", TextArea)
 
         prompt = input_widget.value.strip()
-        if not prompt:
+        if not prompt or self._response_worker is not None:
             return
 
         input_widget.value = ""
-        output_widget.text += f"\n> {prompt}\n[Thinking...]\n"
-        output_widget.scroll_end(animate=False)
+        if prompt == "/clear":
+            self.llm_manager.conversation_history.clear()
+            self.write_output("\n[Conversation memory cleared]\n")
+            return
+        self.write_output(f"\n> {prompt}\n[Thinking...]\n")
+        self._response_worker = self.run_worker(self.stream_response(prompt), group="ai-response")
 
-        response = await self.llm_manager.query_llm(prompt)
+    async def stream_response(self, prompt: str) -> None:
+        """Stream the answer into the output, reporting time to first token"""
+        self.query_one("#ai-stop", Button).disabled = False
+        use_cache = self.query_one("#ai-cache", Checkbox).value
+        started = time.perf_counter()
+        # Ground the answer in the most relevant terminal output and notes
+        context = ""
+        if self.query_one("#ai-context", Checkbox).value:
+            context = self.app.context_index.build_context(prompt)
+        try:
+            async for token in self.llm_manager.stream_llm(prompt, context=context, use_cache=use_cache):
+                self.write_output(token)
+            ttft = self.llm_manager.last_ttft
+            first = "no tokens" if ttft is None else f"first token {ttft:.2f}s"
+            if len(self.llm_manager.models) > 1 and self.llm_manager.last_model:
+                first = f"{self.llm_manager.last_model}, {first}"
+            cache = self.llm_manager.cache
+            if use_cache and cache is not None:
+                # The session counters only; stats() would query the database
+                hit = "hit" if self.llm_manager.last_cached else "miss"
+                first += f", cache {hit} ({cache.hits} hits / {cache.misses} misses)"
+            prompt_size = f"prompt ~{self.llm_manager.last_prompt_tokens} tokens"
+            self.write_output(f"\n[{first}, {prompt_size}, total {time.perf_counter() - started:.2f}s]\n")
+        except asyncio.CancelledError:
+            self.write_output("\n[Cancelled]\n")
+            raise
+        finally:
+            self.flush_output()
+            self.query_one("#ai-stop", Button).disabled = True
+            self._response_worker = None
+
+    def action_cancel_response(self) -> None:
+        """Stop the answer currently being streamed"""
+        if self._response_worker is not None:
+            self._response_worker.cancel()
 
-        output_widget.text += f"{response}\n"
+    def write_output(self, text: str) -> None:
+        """Queue text for the next batched update of the output"""
+        self._pending.append(text)
+
+    def flush_output(self) -> None:
+        if not self._pending:
+            return
+        output_widget = self.query_one("#ai-output", TextArea)
+        # Inserting at the end edits the document in place instead of
+        # rebuilding it like assigning `text` would.
+        output_widget.insert("".join(self._pending), output_widget.document.end)
+        self._pending.clear()
         output_widget.scroll_end(animate=False)
 
 
+class SearchTab(Container):
+    """Search panel over command output, command history and notes"""
+
+    def __init__(self):
+        super().__init__()
+        self._hits: list[SearchHit] = []
+        self._search_timer: Optional[Timer] = None
+
+    def compose(self) -> ComposeResult:
+        yield Static("🔎 Search", classes="tab-header")
+        with Horizontal(id="search-input-container"):
+            yield Input(placeholder="Search output, history and notes (e.g. flag\\{\\w+\\} with Regex)...",
+                        id="search-input")
+            yield Checkbox("Regex", id="search-regex")
+            yield Button("Search", id="search-button", variant="primary")
+        yield Label("", id="search-status")
+        yield DataTable(id="search-results", cursor_type="row", zebra_stripes=True)
+        yield Static("", id="search-context")
+
+    def on_mount(self) -> None:
+        table = self.query_one("#search-results", DataTable)
+        for label, key in (("Time", "time"), ("Kind", "kind"), ("Source", "source"),
+                           ("Line", "line"), ("Text", "text")):
+            table.add_column(label, key=key)
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        if event.button.id == "search-button":
+            self.start_search()
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        if event.input.id == "search-input":
+            self.start_search()
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        # Search as you type, once typing pauses
+        if event.input.id == "search-input":
+            if self._search_timer is not None:
+                self._search_timer.stop()
+            self._search_timer = self.set_timer(0.3, self.start_search)
+
+    def on_checkbox_changed(self, event: Checkbox.Changed) -> None:
+        if event.checkbox.id == "search-regex":
+            self.start_search()
+
+    def start_search(self) -> None:
+        query = self.query_one("#search-input", Input).value
+        if not query:
+            return
+        regex = self.query_one("#search-regex", Checkbox).value
+        self.run_worker(self.search(query, regex), group="search", exclusive=True)
+
+    async def search(self, query: str, regex: bool) -> None:
+        """Run a query and list its hits, newest first"""
+        status = self.query_one("#search-status", Label)
+        started = time.perf_counter()
+        try:
+            hits = await self.app.search_index.search(query, regex=regex)
+        except re.error as e:
+            status.update(f"Invalid regex: {e}")
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        self._hits = hits
+        table = self.query_one("#search-results", DataTable)
+        table.clear()
+        for i, hit in enumerate(hits):
+            table.add_row(
+                datetime.fromtimestamp(hit.created).strftime("%m-%d %H:%M"),
+                hit.kind, hit.title, str(hit.line), Text(hit.text[:200]), key=str(i),
+            )
+        more = "+" if len(hits) >= SEARCH_MAX_RESULTS else ""
+        # Without FTS5 trigram support every search scans the whole table
+        scanned = "" if self.app.search_index.available else " (no FTS5 trigram index: full scan)"
+        status.update(f"{len(hits)}{more} matches in {elapsed:.1f} ms{scanned}")
+        self.query_one("#search-context", Static).update("")
+
+    def on_data_table_row_selected(self, event: DataTable.RowSelected) -> None:
+        """Show the lines around the selected hit"""
+        if event.data_table.id != "search-results" or event.row_key.value is None:
+            return
+        hit = self._hits[int(event.row_key.value)]
+        self.query_one("#search-context", Static).update(
+            Text(f"{hit.title} (line {hit.line})\n{hit.context}")
+        )
+
+
+class ToolboxTab(Container):
+    """CPU-heavy transforms run in worker processes, with live progress and cancellation"""
+
+    BINDINGS = [
+        Binding("escape", "cancel_transform", "Cancel transform"),
+    ]
+
+    # Placeholders of the source and argument inputs per transform
+    PLACEHOLDERS = {
+        "xor": ("File to XOR with every byte key", "Known plaintext (default: flag formats)"),
+        "hash": ("MD5/SHA-1/SHA-2 hex digests, space separated", f"Wordlist (default: {TOOLBOX_WORDLIST})"),
+        "entropy": ("File to profile", "Window in bytes (default: 4096)"),
+        "decode": ("Encoded text, or a file holding it", f"Max chain length (default: {TOOLBOX_DECODE_DEPTH})"),
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.transform_manager = TransformManager(metrics=self.app.metrics)
+        self._transform_worker: Optional[Worker] = None
+
+    def compose(self) -> ComposeResult:
+        yield Static("🧰 Toolbox", classes="tab-header")
+        with Horizontal(id="toolbox-bar"):
+            yield Select(
+                [(label, name) for name, label in TransformManager.TRANSFORMS.items()],
+                value="xor",
+                allow_blank=False,
+                id="toolbox-transform",
+            )
+            yield Input(id="toolbox-source")
+            yield Input(id="toolbox-argument")
+        with Horizontal(id="toolbox-controls"):
+            yield Button("Run", id="toolbox-run", variant="primary")
+            yield Button("Cancel", id="toolbox-cancel", variant="error", disabled=True)
+            yield ProgressBar(id="toolbox-progress", show_eta=True)
+            yield Label("", id="toolbox-status")
+        yield ScrollbackLog(f"Transforms run in {self.transform_manager.workers} worker process(es); "
+                            "flags and cracked hashes show up as they are found.\n",
+                            id="toolbox-output")
+
+    def on_mount(self) -> None:
+        self.set_placeholders("xor")
+
+    def set_placeholders(self, transform: str) -> None:
+        source, argument = self.PLACEHOLDERS[transform]
+        self.query_one("#toolbox-source", Input).placeholder = source
+        self.query_one("#toolbox-argument", Input).placeholder = argument
+
+    def on_select_changed(self, event: Select.Changed) -> None:
+        if event.select.id == "toolbox-transform":
+            self.set_placeholders(event.value)
+
+    async def on_button_pressed(self, event: Button.Pressed) -> None:
+        if event.button.id == "toolbox-run":
+            self.start_transform()
+        elif event.button.id == "toolbox-cancel":
+            self.action_cancel_transform()
+
+    async def on_input_submitted(self, event: Input.Submitted) -> None:
+        if event.input.id in ("toolbox-source", "toolbox-argument"):
+            self.start_transform()
+
+    def start_transform(self) -> None:
+        source = self.query_one("#toolbox-source", Input).value
+        if not source.strip() or self._transform_worker is not None:
+            return
+        transform = self.query_one("#toolbox-transform", Select).value
+        argument = self.query_one("#toolbox-argument", Input).value
+        self.query_one("#toolbox-output", ScrollbackLog).write(
+            f"\n> {TransformManager.TRANSFORMS[transform]}: {source.strip()}"
+            + (f" ({argument.strip()})" if argument.strip() else "") + "\n"
+        )
+        self._transform_worker = self.run_worker(
+            self.run_transform(transform, source, argument), group="toolbox"
+        )
+
+    async def run_transform(self, transform: str, source: str, argument: str) -> None:
+        """Stream a transform's finds and results into the output, tracking its progress"""
+        output = self.query_one("#toolbox-output", ScrollbackLog)
+        progress = self.query_one("#toolbox-progress", ProgressBar)
+        status = self.query_one("#toolbox-status", Label)
+        cancel = self.query_one("#toolbox-cancel", Button)
+        self.query_one("#toolbox-run", Button).disabled = True
+        cancel.disabled = False
+        if self.app.focused is None or self.app.focused.id == "toolbox-run":
+            cancel.focus() # Keep Esc working once Run is disabled
+        progress.update(total=None, progress=0)
+        status.update("Starting workers...")
+        started = time.perf_counter()
+        try:
+            async with contextlib.aclosing(self.transform_manager.run(transform, source, argument)) as items:
+                async for kind, value in items:
+                    if kind == 'progress':
+                        done, total = value
+                        progress.update(total=total, progress=done)
+                        status.update(f"{done}/{total} tasks")
+                    elif kind == 'error':
+                        output.write(f"[ERROR] {value}\n")
+                    else:
+                        output.write(f"{value}\n")
+            status.update(f"Done in {time.perf_counter() - started:.1f}s")
+        except asyncio.CancelledError:
+            output.write("[Cancelled]\n")
+            status.update("Cancelled")
+            raise
+        finally:
+            self._transform_worker = None
+            if self.is_attached: # Not cancelled by the tab going away
+                self.query_one("#toolbox-run", Button).disabled = False
+                if cancel.has_focus:
+                    self.query_one("#toolbox-source", Input).focus()
+                cancel.disabled = True
+
+    def action_cancel_transform(self) -> None:
+        """Stop the running transform; tasks already in a worker finish in the background"""
+        if self._transform_worker is not None:
+            self._transform_worker.cancel()
+
+    def on_unmount(self) -> None:
+        self.transform_manager.close()
+
+
+class MetricsTab(VisibilityMixin, Container):
+    """Live view of the app's metrics, refreshed while the tab is shown"""
+
+    def __init__(self):
+        super().__init__()
+        self._previous: dict[str, float] = {} # Counter values at the last refresh, for rates
+        self._previous_time = time.monotonic()
+
+    def compose(self) -> ComposeResult:
+        yield Static("📊 Metrics", classes="tab-header")
+        yield DataTable(id="metrics-table", cursor_type="row", zebra_stripes=True)
+        with Horizontal(id="metrics-bar"):
+            yield Button("Export JSONL", id="metrics-export")
+            yield Label(self.describe_exports(), id="metrics-status")
+
+    def on_mount(self) -> None:
+        table = self.query_one("#metrics-table", DataTable)
+        for label, key in (("Metric", "name"), ("Value", "value"), ("Rate/s", "rate"), ("p50", "p50"),
+                           ("p90", "p90"), ("p99", "p99"), ("Max", "max"), ("Count", "count")):
+            table.add_column(label, key=key)
+        self.refresh_metrics()
+        self.set_interval(1.0, self.refresh_metrics)
+
+    async def on_button_pressed(self, event: Button.Pressed) -> None:
+        if event.button.id == "metrics-export":
+            try:
+                await asyncio.to_thread(self.app.metrics.export_jsonl)
+            except OSError as e:
+                self.app.notify(f"Metrics export failed: {e}", severity="error")
+            else:
+                self.app.notify(f"Metrics appended to {METRICS_EXPORT_PATH}")
+
+    @staticmethod
+    def describe_exports() -> str:
+        exports = [f"JSON lines: {METRICS_EXPORT_PATH}"]
+        if METRICS_EXPORT_INTERVAL > 0:
+            exports[0] += f" every {METRICS_EXPORT_INTERVAL:g}s"
+        if METRICS_PORT:
+            exports.append(f"Prometheus: http://127.0.0.1:{METRICS_PORT}/metrics")
+        return " | ".join(exports)
+
+    @staticmethod
+    def format_value(name: str, value: float) -> str:
+        if name.endswith("_seconds"):
+            return f"{value * 1000:.1f} ms"
+        if name.endswith("_bytes_total"):
+            for unit in ("B", "KB", "MB", "GB"):
+                if value < 1024 or unit == "GB":
+                    return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+                value /= 1024
+        return f"{value:,.0f}" if value >= 100 or value == int(value) else f"{value:.2f}"
+
+    def refresh_metrics(self) -> None:
+        """Update the table from a snapshot; counters also get their rate since the last refresh"""
+        if not self.display_visible:
+            return
+        now = time.monotonic()
+        elapsed = max(now - self._previous_time, 1e-6)
+        self._previous_time = now
+        table = self.query_one("#metrics-table", DataTable)
+        fmt = self.format_value
+        for name, value in sorted(self.app.metrics.snapshot().items()):
+            if isinstance(value, dict):
+                unit = name if name.endswith("_seconds") else ""
+                row = {"value": "", "rate": "",
+                       **{q: fmt(unit, value[q]) for q in ("p50", "p90", "p99", "max")},
+                       "count": f"{value['count']:,}"}
+            else:
+                rate = ""
+                if name.endswith("_total"):
+                    rate = fmt(name, (value - self._previous.get(name, value)) / elapsed)
+                    self._previous[name] = value
+                row = {"value": fmt(name, value), "rate": rate,
+                       "p50": "", "p90": "", "p99": "", "max": "", "count": ""}
+            if name not in table.rows:
+                table.add_row(name, *row.values(), key=name)
+                continue
+            for column, cell in row.items():
+                table.update_cell(name, column, cell)
+
+
 # =============================================================================
 # MAIN APPLICATION
 # =============================================================================
@@ -354,26 +4940,56 @@ class CTFToolkitApp(App):
     """Main CTF Toolkit TUI Application"""
     
     CSS_PATH = "ctf_toolkit.css"
+
+    def __init__(self):
+        super().__init__()
+        # Shared by the tabs: the terminal and notes feed it, the AI tab queries it
+        self.context_index = ContextIndex()
+        # Fed by the terminal and notes, queried by the Search tab
+        self.search_index = SearchIndex()
+        # Timings and throughput recorded by the managers, shown in the Metrics tab
+        self.metrics = Metrics()
     
     BINDINGS = [
         Binding("ctrl+q", "quit", "Quit"),
         Binding("ctrl+t", "focus_terminal", "Terminal"),
         Binding("ctrl+m", "focus_markdown", "Notes"),
         Binding("ctrl+a", "focus_ai", "AI"),
+        Binding("ctrl+f", "focus_search", "Search"),
     ]
     
+    # Tab panes and the widgets filling them; a tab's contents are built the
+    # first time it is shown, so startup only pays for the Terminal tab
+    TABS = {
+        "terminal-tab": ("Terminal", TerminalTab),
+        "markdown-tab": ("Notes", MarkdownTab),
+        "ai-tab": ("AI Assistant", AITab),
+        "search-tab": ("Search", SearchTab),
+        "toolbox-tab": ("Toolbox", ToolboxTab),
+        "metrics-tab": ("Metrics", MetricsTab),
+    }
+    
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True)
         
         with TabbedContent(id="main-tabs"):
-            with TabPane("Terminal", id="terminal-tab"):
-                yield TerminalTab()
-            with TabPane("Notes", id="markdown-tab"):
-                yield MarkdownTab()
-            with TabPane("AI Assistant", id="ai-tab"):
-                yield AITab()
+            for index, (pane_id, (title, tab_class)) in enumerate(self.TABS.items()):
+                with TabPane(title, id=pane_id):
+                    # The first tab is shown at startup, so it is built right away
+                    if index == 0 or not UI_LAZY_TABS:
+                        yield tab_class()
         
         yield Footer()
+
+    def on_tabbed_content_tab_activated(self, event: TabbedContent.TabActivated) -> None:
+        self.mount_tab(event.pane.id)
+
+    def mount_tab(self, pane_id: str) -> AwaitMount:
+        """Build the tab's contents unless they already exist"""
+        pane = self.query_one(f"#{pane_id}", TabPane)
+        if pane.children:
+            return AwaitMount(pane, [])
+        return pane.mount(self.TABS[pane_id][1]())
     
     def action_focus_terminal(self) -> None:
         """Focus the terminal tab"""
@@ -390,10 +5006,85 @@ class CTFToolkitApp(App):
         tabs = self.query_one("#main-tabs", TabbedContent)
         tabs.active = "ai-tab"
     
+    async def action_focus_search(self) -> None:
+        """Focus the search tab"""
+        tabs = self.query_one("#main-tabs", TabbedContent)
+        tabs.active = "search-tab"
+        await self.mount_tab("search-tab")
+        self.query_one("#search-input", Input).focus()
+
+    async def on_unmount(self) -> None:
+        # Write out search text still buffered from the last second
+        await self.search_index.close()
+    
     def on_mount(self) -> None:
         """Called when app starts"""
         self.title = "CTF Toolkit v0.1.0"
         self.sub_title = "Proof of Concept"
+        self.run_worker(self.metrics.sample_event_loop_lag(), group="metrics")
+        self.run_worker(self.index_notes(), group="notes-index")
+        if METRICS_EXPORT_INTERVAL > 0:
+            self.run_worker(self.metrics.export_periodically(), group="metrics")
+        if METRICS_PORT:
+            self.run_worker(self.serve_metrics(), group="metrics")
+
+    async def index_notes(self) -> None:
+        """
+        Bring the saved notes into Search and the current challenge's into AI context
+
+        Runs whether or not the Notes tab is opened. Only notes whose file
+        changed since it was last indexed are read for the search index
+        (their modification times are kept in it), and notes deleted since
+        are dropped from it. The AI gets the notes of the challenge opened
+        last, which the Notes tab starts on.
+        """
+        store = NoteStore()
+        last = store.last_opened()
+        challenge = last[0] if last is not None else MarkdownManager().challenge
+        indexed = await self.search_index.document_mtimes()
+
+        def read_notes() -> tuple[list[tuple[str, str, float]], list[tuple[str, str]], set[str]]:
+            changed, current, present = [], [], set()
+            for note_challenge in store.list_challenges():
+                for name in store.list_notes(note_challenge):
+                    key = f"{note_challenge}/{name}"
+                    try:
+                        # Before reading, so a note saved meanwhile is re-read next time
+                        mtime = store.path(note_challenge, name).stat().st_mtime
+                    except OSError:
+                        continue
+                    present.add(f"note:{key}")
+                    stale = indexed.get(f"note:{key}") != mtime
+                    if not stale and note_challenge != challenge:
+                        continue
+                    try:
+                        text = store.load(note_challenge, name)
+                    except (OSError, UnicodeDecodeError):
+                        continue
+                    if text is None:
+                        continue
+                    if stale:
+                        changed.append((key, text, mtime))
+                    if note_challenge == challenge:
+                        current.append((key, text))
+            return changed, current, present
+
+        changed, current, present = await asyncio.to_thread(read_notes)
+        for source in indexed.keys() - present:
+            self.search_index.remove_document(source)
+        for key, text, mtime in changed:
+            self.search_index.set_document("note", f"note:{key}", key, text, mtime)
+            await asyncio.sleep(0) # Let keystrokes through between notes
+        for key, text in current:
+            self.context_index.add_document(f"note:{key}", key, text)
+            await asyncio.sleep(0)
+
+    async def serve_metrics(self) -> None:
+        """Serve the metrics to Prometheus-style scrapers on localhost"""
+        try:
+            await self.metrics.serve(METRICS_PORT)
+        except OSError as e:
+            self.notify(f"Metrics endpoint on port {METRICS_PORT} failed: {e}", severity="error")
 
 
 # =============================================================================
@@ -1,8 +1,24 @@
 import os
 import random
+import select
 import sys
+import threading
 import time
 
+try:
+    import termios
+    import tty
+except ImportError: # Windows: the splash cannot be skipped with a key
+    termios = tty = None
+
+from dotenv import load_dotenv
+
+# .env settings apply to the splash too, which runs before the toolkit is imported
+load_dotenv()
+
+# Seconds the splash plays at most (0 or --no-splash skips it); any key ends it early
+SPLASH_DURATION = float(os.getenv("SPLASH_DURATION", "1.5"))
+
 # ASCII art title
 TITLE = r"""
    ██████╗████████╗███████╗ ████████╗ ██████╗  ██████╗ ██╗     ██╗  ██╗██╗████████╗
@@ -26,7 +42,23 @@ RESET_COLOR = '\033[0m'
 
 # Clear screen
 def clear():
-    os.system("cls" if os.name == "nt" else "clear")
+    if os.name == "nt":
+        os.system("cls")
+    else:
+        # Escape codes instead of spawning `clear` for every frame
+        sys.stdout.write("\033[2J\033[H")
+        sys.stdout.flush()
+
+# Wait up to `seconds`, returning True early if a key was pressed
+def key_pressed(seconds):
+    if termios is None or not sys.stdin.isatty():
+        time.sleep(seconds)
+        return False
+    ready, _, _ = select.select([sys.stdin], [], [], seconds)
+    if ready:
+        os.read(sys.stdin.fileno(), 1024)
+        return True
+    return False
 
 # Flashing text animation
 def flash_title(times=6, interval=0.3):
@@ -63,7 +95,7 @@ def main_screen():
     print(" - AI Assistant")
     print("\n\nTo start, run: python ctf_toolkit.py\n")
 
-# Glitch effect animation
+# Glitch effect animation, ended early by a key press
 def glitch_title(duration=5, interval=0.08):
     start_time = time.time()
     title_lines = TITLE.splitlines()
@@ -84,20 +116,50 @@ def glitch_title(duration=5, interval=0.08):
                     glitched_line += char
             glitched_lines.append(glitched_line)
         print('\n'.join(glitched_lines))
-        time.sleep(interval)
+        if key_pressed(interval):
+            break
     # Final clean title
     clear()
     print("\033[92m" + TITLE + RESET_COLOR)
-    time.sleep(0.5)
+
+# Play the splash while the toolkit is imported in the background
+def splash_and_load(duration):
+    loaded = {}
+
+    def load():
+        try:
+            import ctf_toolkit
+            loaded["module"] = ctf_toolkit
+        except BaseException as e: # Re-raised in the main thread
+            loaded["error"] = e
+
+    loader = threading.Thread(target=load, daemon=True)
+    loader.start()
+    if duration > 0:
+        # cbreak mode lets a single key press (without Enter) skip the splash
+        saved = None
+        if termios is not None and sys.stdin.isatty():
+            saved = termios.tcgetattr(sys.stdin)
+            tty.setcbreak(sys.stdin)
+        try:
+            glitch_title(duration=duration)
+        finally:
+            if saved is not None:
+                termios.tcsetattr(sys.stdin, termios.TCSADRAIN, saved)
+    loader.join()
+    if "error" in loaded:
+        raise loaded["error"]
+    return loaded["module"]
 
 # Main execution
 if __name__ == "__main__":
+    duration = 0 if "--no-splash" in sys.argv[1:] else SPLASH_DURATION
+    # Run from anywhere: the toolkit and its stylesheet live next to this file
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
     try:
-        glitch_title(duration=5)
-        # Execute ctf_toolkit.py after animation
-        if os.name == "nt":
-            os.system("python ctf_toolkit.py")
-        else:
-            os.system("python3 ctf_toolkit.py")
+        ctf_toolkit = splash_and_load(duration)
     except Exception as e:
-        print(f"Error during glitch animation or execution: {e}")
+        print(f"Error during glitch animation or startup: {e}")
+        sys.exit(1)
+    # Same process: no second interpreter start-up and import
+    ctf_toolkit.CTFToolkitApp().run()
@@ -0,0 +1,32 @@
+"""
+Shared setup for the test suite.
+
+Every on-disk location the toolkit reads at import time is pointed into a
+scratch directory before `ctf_toolkit` is imported, so running the tests
+never touches (or depends on) the user's history, notes, logs or caches.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+
+SCRATCH = Path(tempfile.mkdtemp(prefix="ctf-toolkit-tests-"))
+for name, relative in {
+    "HISTORY_PATH": "history.jsonl",
+    "TERMINAL_LOG_DIR": "logs",
+    "LLM_CACHE_PATH": "llm_cache.sqlite3",
+    "NOTES_DIR": "notes",
+    "SEARCH_INDEX_PATH": "search.sqlite3",
+}.items():
+    os.environ[name] = str(SCRATCH / relative)
+os.environ["TERMINAL_SESSION"] = "0"
+os.environ["LITELLM_LOCAL_MODEL_COST_MAP"] = "True"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
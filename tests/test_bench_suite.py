@@ -0,0 +1,45 @@
+"""The benchmark suite's comparison with its stored baseline."""
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "bench_suite", Path(__file__).resolve().parent.parent / "benchmarks" / "bench_suite.py"
+)
+bench_suite = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bench_suite)
+
+BASELINE = {"throughput": 1000.0, "p50_ms": 10.0, "p99_ms": 40.0, "peak_rss_mb": 100.0}
+
+
+def test_median_of_repeated_runs_per_metric():
+    runs = [
+        {"case": "terminal-10k", "throughput": 900.0, "p50_ms": 12.0},
+        {"case": "terminal-10k", "throughput": 1100.0, "p50_ms": 8.0},
+        {"case": "terminal-10k", "throughput": 1000.0, "p50_ms": 30.0},
+    ]
+
+    assert bench_suite.median_result(runs) == {"case": "terminal-10k", "throughput": 1000.0, "p50_ms": 12.0}
+
+
+@pytest.mark.parametrize("result, regressed", [
+    ({**BASELINE, "throughput": 800.0}, False), # 20% slower, within the tolerance
+    ({**BASELINE, "throughput": 700.0}, True),
+    ({**BASELINE, "peak_rss_mb": 130.0}, True),
+    ({**BASELINE, "p50_ms": 14.0}, False), # 40% worse, but under the latency floor
+    ({**BASELINE, "p99_ms": 60.0}, True),
+    ({**BASELINE, "throughput": 5000.0, "p99_ms": 1.0}, False), # Improvements
+])
+def test_regressions_are_changes_for_the_worse_beyond_the_tolerance(result, regressed):
+    assert bench_suite.compare(result, BASELINE, tolerance=0.25)[1] is regressed
+
+
+def test_comparison_lists_the_relative_change_per_metric():
+    result = {"throughput": 500.0, "p50_ms": 10.0, "p99_ms": 20.0}
+
+    summary, regressed = bench_suite.compare(result, BASELINE, tolerance=0.25)
+
+    assert summary == "throughput -50%!, p50 +0%, p99 -50%"
+    assert regressed
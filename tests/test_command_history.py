@@ -0,0 +1,152 @@
+"""CommandHistory: bounded, indexed recall and its append-only file."""
+
+import asyncio
+import json
+import threading
+import time
+
+import ctf_toolkit
+from ctf_toolkit import CommandHistory, write_atomic
+
+
+def record(history, *commands):
+    for command in commands:
+        history.finish(history.add(command, "/tmp"))
+
+
+def test_history_prefix_recall_is_most_recent_first():
+    history = CommandHistory(path=None)
+    record(history, "nmap -sV 10.0.0.1", "ls", "nmap -p- 10.0.0.2", "nc -lvnp 4444")
+
+    assert history.with_prefix("nmap") == ["nmap -p- 10.0.0.2", "nmap -sV 10.0.0.1"]
+    assert history.with_prefix("n") == ["nc -lvnp 4444", "nmap -p- 10.0.0.2", "nmap -sV 10.0.0.1"]
+    assert history.with_prefix("zz") == []
+
+
+def test_history_recalls_each_command_once_at_its_latest_use():
+    history = CommandHistory(path=None)
+    record(history, "ls", "id", "ls")
+
+    assert list(history.recent()) == ["ls", "id"]
+    assert len(history) == 3
+
+
+def test_history_fuzzy_search_prefers_contiguous_matches():
+    history = CommandHistory(path=None)
+    record(history, "python3 exploit.py", "gobuster dir -u http://target", "cat exploit_notes.txt")
+
+    assert history.fuzzy("exploit") == ["cat exploit_notes.txt", "python3 exploit.py"]
+    assert history.fuzzy("gbdir") == ["gobuster dir -u http://target"]
+    assert history.fuzzy("EXPLOIT.PY") == ["python3 exploit.py"]
+    assert history.fuzzy("qqq") == []
+
+
+def test_history_drops_the_oldest_entries_beyond_its_cap():
+    history = CommandHistory(path=None, max_entries=2)
+    record(history, "one", "two", "three")
+
+    assert [entry.command for entry in history] == ["two", "three"]
+    assert history.with_prefix("o") == []
+
+
+def test_history_is_reloaded_from_its_file(tmp_path):
+    path = tmp_path / "history.jsonl"
+
+    async def session():
+        history = CommandHistory(path)
+        record(history, "whoami", "id")
+        await history.flush()
+
+    asyncio.run(session())
+
+    reloaded = CommandHistory(path)
+    reloaded.load()
+    assert list(reloaded.recent()) == ["id", "whoami"]
+    assert all(entry.duration is not None for entry in reloaded)
+
+
+def test_history_survives_a_truncated_last_line(tmp_path):
+    path = tmp_path / "history.jsonl"
+    history = CommandHistory(path)
+    record(history, "whoami") # No event loop: written straight away
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('[1700000000.0, 0.1, 0, 12, "/tm')
+
+    reloaded = CommandHistory(path)
+    reloaded.load()
+    assert list(reloaded.recent()) == ["whoami"]
+
+
+def test_history_file_is_compacted_when_it_grows_too_large(tmp_path):
+    path = tmp_path / "history.jsonl"
+    history = CommandHistory(path, max_entries=3)
+    record(history, *[f"cmd {i}" for i in range(7)])
+
+    reloaded = CommandHistory(path, max_entries=3)
+    reloaded.load()
+
+    assert [entry.command for entry in reloaded] == ["cmd 4", "cmd 5", "cmd 6"]
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+
+
+def test_write_atomic_replaces_the_whole_file(tmp_path):
+    path = tmp_path / "nested" / "file.json"
+    write_atomic(path, json.dumps({"a": 1}))
+    write_atomic(path, json.dumps({"b": 2}))
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"b": 2}
+    assert [p.name for p in path.parent.iterdir()] == ["file.json"]
+
+
+def commands_in(path):
+    return [json.loads(line)[-1] for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_loading_leaves_out_the_commands_this_session_already_wrote(tmp_path):
+    path = tmp_path / "history.jsonl"
+    record(CommandHistory(path), "from last session")
+    history = CommandHistory(path)
+
+    async def session():
+        record(history, "whoami", "id")
+        await history.flush()
+        history.merge_older(await asyncio.to_thread(history.read))
+
+    asyncio.run(session())
+
+    assert [entry.command for entry in history] == ["from last session", "whoami", "id"]
+
+
+def test_an_append_during_compaction_is_not_lost(tmp_path, monkeypatch):
+    path = tmp_path / "history.jsonl"
+    record(CommandHistory(path, max_entries=3), *[f"cmd {i}" for i in range(7)])
+    history = CommandHistory(path, max_entries=3)
+    compacting = threading.Event()
+
+    def slow_write_atomic(path, content):
+        compacting.set()
+        time.sleep(0.2) # An append arriving now must wait for the new file
+        write_atomic(path, content)
+
+    monkeypatch.setattr(ctf_toolkit, "write_atomic", slow_write_atomic)
+    loaded = []
+    reader = threading.Thread(target=lambda: loaded.append(history.read()))
+    reader.start()
+    assert compacting.wait(5)
+    record(history, "during compaction") # No event loop in this thread: written straight away
+    reader.join()
+
+    assert [entry.command for entry in loaded[0]] == ["cmd 4", "cmd 5", "cmd 6"]
+    assert commands_in(path) == ["cmd 4", "cmd 5", "cmd 6", "during compaction"]
+
+
+def test_the_file_is_not_compacted_while_appends_are_queued(tmp_path):
+    path = tmp_path / "history.jsonl"
+    record(CommandHistory(path, max_entries=3), *[f"cmd {i}" for i in range(7)])
+    history = CommandHistory(path, max_entries=3)
+    history._unwritten.append("queued\n")
+
+    loaded = history.read()
+
+    assert [entry.command for entry in loaded] == ["cmd 4", "cmd 5", "cmd 6"]
+    assert len(commands_in(path)) == 7
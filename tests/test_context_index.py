@@ -0,0 +1,77 @@
+"""ContextIndex: BM25 retrieval of terminal output and notes for AI prompts."""
+
+from ctf_toolkit import ContextIndex
+
+
+def words(text):
+    return len(text.split())
+
+
+def test_bm25_ranks_the_chunk_about_the_query_first():
+    index = ContextIndex()
+    index.add_document("nmap", "nmap", "PORT STATE SERVICE\n22/tcp open ssh\n80/tcp open http")
+    index.add_document("gobuster", "gobuster", "/admin (Status: 301)\n/login (Status: 200)")
+    index.add_document("notes", "notes", "the admin panel uses default credentials")
+
+    results = index.search("which ssh port is open", k=3)
+
+    assert results[0][1] == "nmap"
+    assert "notes" not in [title for _, title, _ in results]
+
+
+def test_bm25_prefers_rare_terms():
+    index = ContextIndex()
+    index.add_document("one", "one", "common common common rare")
+    index.add_document("two", "two", "common common common common")
+    index.add_document("three", "three", "common filler words")
+
+    assert [title for _, title, _ in index.search("common rare")][0] == "one"
+
+
+def test_context_index_replaces_and_evicts_documents():
+    index = ContextIndex(max_documents=2)
+    index.add_document("a", "a", "alpha")
+    index.add_document("a", "a", "bravo")
+    assert index.search("alpha") == []
+
+    index.add_document("b", "b", "charlie")
+    index.add_document("c", "c", "delta")
+    assert index.search("bravo") == []
+    assert sorted(title for _, title, _ in index.search("charlie delta")) == ["b", "c"]
+
+
+def test_registered_sources_are_refreshed_when_searched():
+    text = {"value": "first draft"}
+    index = ContextIndex()
+    index.register_source("note", "note", lambda: text["value"])
+    assert index.search("draft")[0][2] == "first draft"
+
+    text["value"] = "final version"
+    assert index.search("draft") == []
+    index.unregister_source("note")
+    text["value"] = "changed after unregistering"
+    assert index.search("final")[0][2] == "final version"
+
+
+def test_build_context_stays_within_the_token_budget():
+    index = ContextIndex(count_tokens=words)
+    index.add_document("big", "big", "flag " * 50)
+    index.add_document("small", "small", "flag here")
+
+    context = index.build_context("flag", budget=10)
+
+    assert "--- small ---" in context and "--- big ---" not in context
+    assert index.build_context("nothing matches") == ""
+
+
+def test_long_outputs_are_split_so_only_the_matching_chunk_is_returned():
+    index = ContextIndex()
+    lines = [f"filler line {i}" for i in range(100)]
+    lines[57] = "secret.txt found in /var/backups"
+    index.add_document("find", "find", "\n".join(lines))
+
+    results = index.search("backups")
+
+    assert len(index) == 100 // ContextIndex.CHUNK_LINES
+    assert len(results) == 1
+    assert results[0][2].splitlines() == lines[40:60]
@@ -0,0 +1,53 @@
+"""ConversationMemory: the token-budgeted history sent with AI prompts and its rolling summary."""
+
+import asyncio
+
+from ctf_toolkit import ConversationMemory
+
+
+def words(text):
+    return len(text.split())
+
+
+def test_memory_sends_the_newest_turns_that_fit_the_budget():
+    memory = ConversationMemory(budget=6, count_tokens=words)
+    for content in ["one two", "three four", "five six", "seven eight"]:
+        memory.add("user", content)
+
+    assert [m["content"] for m in memory.messages()] == ["three four", "five six", "seven eight"]
+    assert [m["content"] for m in memory.messages(reserve=2)] == ["five six", "seven eight"]
+
+
+def test_memory_compacts_old_turns_into_the_summary():
+    memory = ConversationMemory(budget=8, summary_budget=10, count_tokens=words)
+    for content in ["a b c", "d e f", "g h i", "j k l"]:
+        memory.add("user", content)
+    assert memory.needs_compaction()
+    folded = []
+
+    async def summarize(summary, turns):
+        folded.extend(turn["content"] for turn in turns)
+        return "short summary"
+
+    asyncio.run(memory.compact(summarize))
+
+    assert folded == ["a b c", "d e f", "g h i"]
+    assert [turn["content"] for turn in memory.turns] == ["j k l"]
+    assert memory.summary == "short summary"
+    assert memory.messages()[0] == {"role": "system", "content": memory.SUMMARY_PREFIX + "short summary"}
+    assert not memory.needs_compaction()
+
+
+def test_memory_keeps_the_newest_text_when_summarizing_fails():
+    memory = ConversationMemory(budget=8, summary_budget=4, count_tokens=words)
+    for content in ["oldest words here", "middle words here", "newest kept", "x y z"]:
+        memory.add("user", content)
+
+    async def summarize(summary, turns):
+        raise TimeoutError
+
+    asyncio.run(memory.compact(summarize))
+
+    assert memory.summary_tokens <= 4
+    assert memory.summary.endswith("newest kept")
+    assert "oldest" not in memory.summary
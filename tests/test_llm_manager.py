@@ -0,0 +1,343 @@
+"""LLMManager against a stub completion standing in for LiteLLM."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from ctf_toolkit import LLMManager, ResponseCache
+
+
+class StubCompletion:
+    """Stand-in for LiteLLM's `acompletion` that records its calls."""
+
+    def __init__(self, tokens=("The ", "flag ", "is ", "here"), fail=(), delay=0.0):
+        self.tokens = list(tokens)
+        self.fail = set(fail)
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, model, messages, stream=False, **kwargs):
+        self.calls.append({"model": model, "messages": messages, "stream": stream})
+        if model in self.fail:
+            raise RuntimeError("backend down")
+        if not stream:
+            message = SimpleNamespace(content="".join(self.tokens))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        return self._chunks()
+
+    async def _chunks(self, tokens=None):
+        for token in tokens or self.tokens:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+
+@pytest.fixture
+def scratch_cache(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite3")
+    yield cache
+    cache.close()
+
+
+def make_manager(completion, cache=None, **kwargs):
+    kwargs.setdefault("models", {"stub/primary": 5.0})
+    return LLMManager(completion=completion, cache=cache, cache_answers=cache is not None, **kwargs)
+
+
+async def collect(stream):
+    return [token async for token in stream]
+
+
+def test_stream_yields_tokens_in_order_and_remembers_the_exchange():
+    stub = StubCompletion()
+    llm = make_manager(stub)
+
+    tokens = asyncio.run(collect(llm.stream_llm("what is the flag?")))
+
+    assert tokens == stub.tokens
+    assert stub.calls[0]["stream"] is True
+    assert llm.last_model == "stub/primary"
+    assert llm.last_ttft is not None
+    assert [turn["role"] for turn in llm.conversation_history.turns] == ["user", "assistant"]
+    assert llm.conversation_history.turns[1]["content"] == "The flag is here"
+
+
+def test_stream_sends_the_conversation_so_far():
+    stub = StubCompletion()
+    llm = make_manager(stub)
+
+    async def two_questions():
+        await collect(llm.stream_llm("first"))
+        await collect(llm.stream_llm("second"))
+
+    asyncio.run(two_questions())
+
+    contents = [message["content"] for message in stub.calls[1]["messages"]]
+    assert contents == ["first", "The flag is here", "second"]
+
+
+def test_closing_the_stream_abandons_the_answer():
+    stub = StubCompletion()
+    llm = make_manager(stub, max_concurrency=1)
+
+    async def read_one_token():
+        stream = llm.stream_llm("question")
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(read_one_token()) == "The "
+    assert llm.conversation_history.turns == []
+    # The request slot was given back
+    assert not llm._slots().locked()
+
+
+def test_cancelling_the_consumer_abandons_the_answer():
+    stub = StubCompletion(tokens=["tok "] * 50, delay=0.01)
+    llm = make_manager(stub, max_concurrency=1)
+
+    async def cancel_midway():
+        received = []
+
+        async def consume():
+            async for token in llm.stream_llm("question"):
+                received.append(token)
+
+        task = asyncio.create_task(consume())
+        while len(received) < 3:
+            await asyncio.sleep(0.005)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return received
+
+    received = asyncio.run(cancel_midway())
+
+    assert 3 <= len(received) < 50
+    assert llm.conversation_history.turns == []
+    assert not llm._slots().locked()
+
+
+def test_query_uses_the_non_streaming_completion():
+    stub = StubCompletion()
+    llm = make_manager(stub)
+
+    answer = asyncio.run(llm.query_llm("question"))
+
+    assert answer == "The flag is here"
+    assert stub.calls[0]["stream"] is False
+
+
+def test_errors_are_yielded_as_a_warning_and_not_remembered():
+    llm = make_manager(StubCompletion(fail={"stub/primary"}))
+
+    tokens = asyncio.run(collect(llm.stream_llm("question")))
+
+    assert len(tokens) == 1 and tokens[0].startswith("⚠️ LLM error:")
+    assert "backend down" in tokens[0]
+    assert llm.conversation_history.turns == []
+
+
+# --- Answer cache -------------------------------------------------------------
+
+def test_repeated_question_is_answered_from_the_cache(scratch_cache):
+    stub = StubCompletion()
+    llm = make_manager(stub, cache=scratch_cache)
+
+    async def ask_twice():
+        first = await collect(llm.stream_llm("what port is open?"))
+        llm.conversation_history.clear()
+        second = await collect(llm.stream_llm("what port is open?"))
+        return first, second
+
+    first, second = asyncio.run(ask_twice())
+
+    assert "".join(first) == "".join(second) == "The flag is here"
+    assert len(stub.calls) == 1
+    assert llm.last_cached
+    assert scratch_cache.hits == 1
+
+
+def test_cache_can_be_bypassed_per_query(scratch_cache):
+    stub = StubCompletion()
+    llm = make_manager(stub, cache=scratch_cache)
+
+    async def ask_twice():
+        await collect(llm.stream_llm("question"))
+        llm.conversation_history.clear()
+        await collect(llm.stream_llm("question", use_cache=False))
+
+    asyncio.run(ask_twice())
+
+    assert len(stub.calls) == 2
+    assert not llm.last_cached
+
+
+def test_errors_are_not_cached(scratch_cache):
+    stub = StubCompletion(fail={"stub/primary"})
+    llm = make_manager(stub, cache=scratch_cache)
+
+    async def ask_twice():
+        await collect(llm.stream_llm("question"))
+        stub.fail.clear()
+        return await collect(llm.stream_llm("question"))
+
+    assert "".join(asyncio.run(ask_twice())) == "The flag is here"
+    assert len(stub.calls) == 2
+
+
+def test_abandoned_answers_are_not_cached(scratch_cache):
+    stub = StubCompletion()
+    llm = make_manager(stub, cache=scratch_cache)
+
+    async def abandon_then_ask():
+        stream = llm.stream_llm("question")
+        await stream.__anext__()
+        await stream.aclose()
+        return await collect(llm.stream_llm("question"))
+
+    assert "".join(asyncio.run(abandon_then_ask())) == "The flag is here"
+    assert len(stub.calls) == 2
+    assert not llm.last_cached
+
+
+def test_a_follow_up_under_a_different_history_misses_the_cache(scratch_cache):
+    stub = StubCompletion()
+    llm = make_manager(stub, cache=scratch_cache)
+
+    async def follow_up_after(question):
+        llm.conversation_history.clear()
+        await collect(llm.stream_llm(question))
+        await collect(llm.stream_llm("explain more"))
+        return llm.last_cached
+
+    async def two_topics():
+        return await follow_up_after("how does RSA work?"), await follow_up_after("how does AES work?")
+
+    assert asyncio.run(two_topics()) == (False, False)
+    assert len(stub.calls) == 4
+    assert stub.calls[3]["messages"][0]["content"] == "how does AES work?"
+
+
+# --- Several models -----------------------------------------------------------
+
+class ModelStub(StubCompletion):
+    """Each model answers "<model> answer" after its own latency; cancelled requests are recorded."""
+
+    def __init__(self, latency, fail=()):
+        super().__init__(fail=fail)
+        self.latency = latency
+        self.cancelled = []
+
+    async def __call__(self, model, messages, stream=False, **kwargs):
+        self.calls.append({"model": model, "messages": messages, "stream": stream})
+        try:
+            await asyncio.sleep(self.latency.get(model, 0))
+        except asyncio.CancelledError:
+            self.cancelled.append(model)
+            raise
+        if model in self.fail:
+            raise RuntimeError("backend down")
+        tokens = [f"{model} ", "answer"]
+        if not stream:
+            message = SimpleNamespace(content="".join(tokens))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        return self._chunks(tokens)
+
+
+def test_single_mode_falls_back_to_the_next_model():
+    stub = StubCompletion(fail={"stub/primary"})
+    llm = make_manager(stub, models={"stub/primary": 5.0, "stub/backup": 5.0})
+
+    tokens = asyncio.run(collect(llm.stream_llm("question")))
+
+    assert "".join(tokens) == "The flag is here"
+    assert llm.last_model == "stub/backup"
+    assert [call["model"] for call in stub.calls] == ["stub/primary", "stub/backup"]
+    assert llm.metrics.counter("llm_fallbacks_total").value == 1
+
+
+def test_a_model_that_times_out_falls_back():
+    stub = ModelStub({"stub/slow": 10})
+    llm = make_manager(stub, models={"stub/slow": 0.05, "stub/backup": 5.0})
+
+    tokens = asyncio.run(collect(llm.stream_llm("question")))
+
+    assert "".join(tokens) == "stub/backup answer"
+    assert stub.cancelled == ["stub/slow"]
+    assert llm.metrics.counter("llm_timeouts_total").value == 1
+
+
+def test_race_mode_takes_the_first_model_to_answer_and_cancels_the_others():
+    stub = ModelStub({"stub/slow": 1.0, "stub/fast": 0.01})
+    llm = make_manager(stub, models={"stub/slow": 5.0, "stub/fast": 5.0}, mode="race")
+
+    async def ask():
+        started = asyncio.get_running_loop().time()
+        tokens = await collect(llm.stream_llm("question"))
+        return tokens, asyncio.get_running_loop().time() - started
+
+    tokens, elapsed = asyncio.run(ask())
+
+    assert "".join(tokens) == "stub/fast answer"
+    assert elapsed < 0.5
+    assert stub.cancelled == ["stub/slow"]
+    assert llm.last_model == "stub/fast"
+    assert llm.conversation_history.turns[-1]["content"] == "stub/fast answer"
+    assert llm._slots()._value == llm.max_concurrency
+
+
+def test_race_mode_ignores_a_model_that_fails_first():
+    stub = ModelStub({"stub/slow": 0.05}, fail={"stub/fast"})
+    llm = make_manager(stub, models={"stub/fast": 5.0, "stub/slow": 5.0}, mode="race")
+
+    assert asyncio.run(llm.query_llm("question")) == "stub/slow answer"
+    assert llm.last_model == "stub/slow"
+
+
+def test_race_mode_reports_every_failure_when_all_models_fail():
+    stub = ModelStub({}, fail={"stub/a", "stub/b"})
+    llm = make_manager(stub, models={"stub/a": 5.0, "stub/b": 5.0}, mode="race")
+
+    tokens = asyncio.run(collect(llm.stream_llm("question")))
+
+    assert len(tokens) == 1
+    assert "stub/a: backend down" in tokens[0] and "stub/b: backend down" in tokens[0]
+
+
+def test_compare_mode_yields_every_answer_as_it_arrives_and_remembers_the_primary(scratch_cache):
+    stub = ModelStub({"stub/primary": 0.1, "stub/other": 0.01})
+    llm = make_manager(stub, cache=scratch_cache, models={"stub/primary": 5.0, "stub/other": 5.0}, mode="compare")
+
+    async def ask_twice():
+        first = await collect(llm.stream_llm("question"))
+        llm.conversation_history.clear()
+        await collect(llm.stream_llm("question"))
+        return first
+
+    sections = asyncio.run(ask_twice())
+
+    assert [section.split("\n")[1].split(" (")[0] for section in sections] == ["── stub/other", "── stub/primary"]
+    assert sections[0].endswith("\nstub/other answer\n")
+    assert llm.conversation_history.turns[-1]["content"] == "stub/primary answer"
+    assert len(stub.calls) == 4 # Comparisons are never answered from the cache
+
+
+def test_compare_mode_shows_a_failing_model_and_remembers_one_that_answered():
+    stub = ModelStub({}, fail={"stub/primary"})
+    llm = make_manager(stub, models={"stub/primary": 5.0, "stub/other": 5.0}, mode="compare")
+
+    answer = asyncio.run(llm.query_llm("question"))
+
+    assert "── stub/primary" in answer and "⚠️ stub/primary: backend down" in answer
+    assert "stub/other answer" in answer
+    assert llm.last_model == "stub/other"
+    assert llm.conversation_history.turns[-1]["content"] == "stub/other answer"
+
+
+def test_models_are_parsed_with_their_timeouts_in_order():
+    assert LLMManager.parse_models("gpt-4, ollama/mistral=30,gpt-4=5,,claude=", timeout=60) == {
+        "gpt-4": 60.0, "ollama/mistral": 30.0, "claude": 60.0,
+    }
+    assert LLMManager.parse_models("", timeout=60) == {"gpt-4": 60.0}
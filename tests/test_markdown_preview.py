@@ -0,0 +1,174 @@
+"""The notes tab's rendering: block splitting, the incremental `MarkdownPreview` and `NoteEditor`."""
+
+import asyncio
+
+import pytest
+from textual.app import App
+from textual.document._document import Document
+
+import ctf_toolkit
+from ctf_toolkit import MarkdownPreview, NoteEditor, WrappedDocument, _CountedWrappedDocument, split_markdown_blocks
+
+
+# --- split_markdown_blocks ----------------------------------------------------
+
+def test_blocks_are_split_at_blank_lines():
+    text = "# Title\n\nFirst paragraph\nstill first\n\nSecond paragraph"
+    assert split_markdown_blocks(text) == ["# Title", "First paragraph\nstill first", "Second paragraph"]
+
+
+def test_fenced_code_stays_in_one_block_despite_blank_lines():
+    text = "Intro\n\n```python\nx = 1\n\n\ny = 2\n```\n\nOutro"
+    assert split_markdown_blocks(text) == ["Intro", "```python\nx = 1\n\n\ny = 2\n```", "Outro"]
+
+
+def test_indented_continuations_stay_with_the_block_above():
+    text = "- item one\n\n    continued item\n- item two\n\nAfter"
+    assert split_markdown_blocks(text) == ["- item one\n\n    continued item\n- item two", "After"]
+
+
+def test_joining_the_blocks_keeps_the_content():
+    text = "a\n\n\n\nb\n\n~~~\n\n~~~\n"
+    assert "".join(split_markdown_blocks(text)).replace("\n", "") == text.replace("\n", "")
+    assert split_markdown_blocks("") == []
+
+
+# --- MarkdownPreview ----------------------------------------------------------
+
+class WidgetApp(App):
+    def __init__(self, widget):
+        super().__init__()
+        self.widget = widget
+
+    def compose(self):
+        yield self.widget
+
+
+def run_widget(widget, interact, size=(40, 12)):
+    async def run():
+        app = WidgetApp(widget)
+        async with app.run_test(size=size) as pilot:
+            await pilot.pause()
+            return await interact(pilot)
+    return asyncio.run(run())
+
+
+def visible_text(widget):
+    return [widget.render_line(y).text.rstrip() for y in range(widget.size.height)]
+
+
+NOTE = "# Recon\n\nport 22 open\n\nport 80 open\n\nport 443 open"
+
+
+def test_preview_renders_only_the_blocks_that_changed(monkeypatch):
+    preview = MarkdownPreview(NOTE)
+    rendered = []
+    render_block = MarkdownPreview._render_block
+
+    def counting(self, block):
+        rendered.append(block)
+        return render_block(self, block)
+
+    async def interact(pilot):
+        monkeypatch.setattr(MarkdownPreview, "_render_block", counting)
+        unchanged = preview._lines[0], preview._lines[-1]
+        preview.update(NOTE.replace("port 80 open", "port 8080 open"))
+        await pilot.pause()
+        return unchanged, visible_text(preview)
+
+    (first, last), lines = run_widget(preview, interact)
+
+    assert rendered == ["port 8080 open"]
+    assert preview._lines[0] is first and preview._lines[-1] is last
+    assert "port 8080 open" in lines and "port 443 open" in lines
+
+
+def test_preview_without_incremental_rendering_treats_the_note_as_one_block(monkeypatch):
+    preview = MarkdownPreview(NOTE, incremental=False)
+    rendered = []
+    render_block = MarkdownPreview._render_block
+
+    async def interact(pilot):
+        monkeypatch.setattr(MarkdownPreview, "_render_block", lambda self, block: rendered.append(block) or render_block(self, block))
+        preview.update(NOTE + "\n\nport 8000 open")
+        await pilot.pause()
+        return visible_text(preview)
+
+    lines = run_widget(preview, interact)
+
+    assert rendered == [NOTE + "\n\nport 8000 open"]
+    assert "port 8000 open" in lines
+
+
+def test_preview_paints_the_lines_scrolled_to():
+    preview = MarkdownPreview("\n\n".join(f"paragraph {i}" for i in range(30)))
+
+    async def interact(pilot):
+        preview.scroll_end(animate=False, immediate=True)
+        await pilot.pause()
+        return visible_text(preview)
+
+    lines = run_widget(preview, interact, size=(40, 6))
+
+    assert preview.virtual_size.height == 60 # Each block and the blank line after it
+    assert "paragraph 29" in lines and "paragraph 0" not in lines
+
+
+# --- NoteEditor ---------------------------------------------------------------
+
+TEXT = "short line\n" + "a long line that has to wrap several times at a narrow width " * 3 + "\n\n\tindented\n"
+
+
+@pytest.mark.parametrize("width", [0, 12, 30])
+def test_counted_height_matches_the_stock_wrapped_document(width):
+    stock = WrappedDocument(Document(TEXT), width=width)
+    counted = _CountedWrappedDocument(Document(TEXT), width=width)
+
+    assert counted.height == stock.height
+    assert (counted.height > TEXT.count("\n") + 1) == (width > 0)
+
+
+@pytest.mark.parametrize("soft_wrap", [True, False])
+def test_note_editor_reports_the_stock_height_as_the_text_changes(soft_wrap):
+    editor = NoteEditor(TEXT, soft_wrap=soft_wrap)
+
+    async def interact(pilot):
+        heights = []
+        for text in (TEXT, TEXT * 5, "one line"):
+            editor.load_text(text)
+            await pilot.pause()
+            document = editor.wrapped_document
+            heights.append((document.height, WrappedDocument.height.fget(document)))
+        editor.insert("more words " * 20)
+        await pilot.pause()
+        document = editor.wrapped_document
+        heights.append((document.height, WrappedDocument.height.fget(document)))
+        return type(document), heights
+
+    kind, heights = run_widget(editor, interact, size=(30, 10))
+
+    assert kind is _CountedWrappedDocument
+    assert all(counted == stock for counted, stock in heights)
+
+
+def without_the_counted_document(monkeypatch):
+    monkeypatch.setattr(ctf_toolkit, "_CountedWrappedDocument", None)
+
+
+def without_the_line_info(monkeypatch):
+    wrap = WrappedDocument.wrap
+
+    def renamed_internals(self, *args, **kwargs):
+        wrap(self, *args, **kwargs)
+        self._renamed_line_info = self.__dict__.pop("_offset_to_line_info")
+
+    monkeypatch.setattr(WrappedDocument, "wrap", renamed_internals)
+
+
+@pytest.mark.parametrize("textual_change", [without_the_counted_document, without_the_line_info])
+def test_note_editor_keeps_the_stock_document_when_textual_internals_differ(monkeypatch, textual_change):
+    textual_change(monkeypatch)
+
+    editor = NoteEditor(TEXT)
+
+    assert type(editor.wrapped_document) is WrappedDocument
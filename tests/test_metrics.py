@@ -0,0 +1,148 @@
+"""Metrics: the in-process registry, its Prometheus and JSON-lines exports, and hidden-tab detection."""
+
+import asyncio
+import json
+import socket
+
+import pytest
+from textual.app import App
+from textual.containers import Container
+from textual.widgets import TabbedContent, TabPane
+
+from ctf_toolkit import Metrics, VisibilityMixin
+
+
+def test_metrics_are_created_on_first_use_and_kept():
+    metrics = Metrics()
+    metrics.counter("requests_total", "Requests").value += 2
+    metrics.counter("requests_total").value += 1
+    metrics.gauge("queue_depth").value = 5
+
+    assert metrics.snapshot() == {"requests_total": 3, "queue_depth": 5}
+    with pytest.raises(ValueError):
+        metrics.gauge("requests_total")
+
+
+def test_summaries_report_nearest_rank_quantiles_of_recent_samples():
+    metrics = Metrics(samples=100)
+    latency = metrics.summary("latency_seconds")
+    for value in range(1, 201):
+        latency.observe(value / 1000)
+
+    snapshot = metrics.snapshot()["latency_seconds"]
+
+    assert (snapshot["count"], snapshot["max"]) == (200, 0.2)
+    assert snapshot["sum"] == pytest.approx(20.1)
+    # Only the last 100 observations (0.101 to 0.2) count for quantiles
+    assert (snapshot["p50"], snapshot["p90"], snapshot["p99"]) == (0.151, 0.191, 0.2)
+
+
+def test_timer_observes_the_block_even_when_it_raises():
+    metrics = Metrics()
+    with pytest.raises(RuntimeError):
+        with metrics.timer("work_seconds"):
+            raise RuntimeError
+
+    assert metrics.summary("work_seconds").count == 1
+
+
+def test_prometheus_exposition_format():
+    metrics = Metrics()
+    metrics.counter("jobs_total", "Jobs run").value = 3
+    latency = metrics.summary("job_seconds")
+    latency.observe(0.5)
+    latency.observe(1.5)
+
+    assert metrics.to_prometheus() == (
+        '# TYPE job_seconds summary\n'
+        'job_seconds{quantile="0.5"} 1.5\n'
+        'job_seconds{quantile="0.9"} 1.5\n'
+        'job_seconds{quantile="0.99"} 1.5\n'
+        'job_seconds_sum 2\n'
+        'job_seconds_count 2\n'
+        '# HELP jobs_total Jobs run\n'
+        '# TYPE jobs_total counter\n'
+        'jobs_total 3\n'
+    )
+
+
+def test_jsonl_export_appends_a_timestamped_snapshot(tmp_path):
+    metrics = Metrics()
+    path = tmp_path / "metrics" / "metrics.jsonl"
+    metrics.counter("jobs_total").value = 1
+    metrics.export_jsonl(path)
+    metrics.counter("jobs_total").value = 2
+    metrics.export_jsonl(path)
+
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+    assert [record["metrics"] for record in records] == [{"jobs_total": 1}, {"jobs_total": 2}]
+    assert records[0]["time"] <= records[1]["time"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_metrics_are_served_over_http_and_silent_clients_dropped(monkeypatch):
+    monkeypatch.setattr(Metrics, "REQUEST_TIMEOUT", 0.1)
+    metrics = Metrics()
+    metrics.counter("jobs_total").value = 7
+    port = free_port()
+
+    async def scrape():
+        server = asyncio.create_task(metrics.serve(port))
+        try:
+            for _ in range(50):
+                try:
+                    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                    break
+                except ConnectionError:
+                    await asyncio.sleep(0.02)
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            # Connects but never sends a request
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            dropped = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return response, dropped
+        finally:
+            server.cancel()
+            await asyncio.gather(server, return_exceptions=True)
+
+    response, dropped = asyncio.run(scrape())
+
+    head, body = response.split(b"\r\n\r\n", 1)
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    assert b"jobs_total 7\n" in body
+    assert dropped == b""
+
+
+class Pane(VisibilityMixin, Container):
+    pass
+
+
+class TabsApp(App):
+    def compose(self):
+        with TabbedContent(id="tabs"):
+            with TabPane("One", id="one"):
+                yield Pane(id="first")
+            with TabPane("Two", id="two"):
+                yield Pane(id="second")
+
+
+def test_tab_contents_know_whether_their_tab_is_shown():
+    async def run():
+        app = TabsApp()
+        async with app.run_test() as pilot:
+            first, second = app.query_one("#first"), app.query_one("#second")
+            before = first.display_visible, second.display_visible
+            app.query_one("#tabs", TabbedContent).active = "two"
+            await pilot.pause()
+            return before, (first.display_visible, second.display_visible)
+
+    assert asyncio.run(run()) == ((True, False), (False, True))
+    assert not Pane().display_visible # Not mounted
@@ -0,0 +1,78 @@
+"""NoteStore: notes as Markdown files, saved write-behind from a worker thread."""
+
+import asyncio
+import os
+
+import ctf_toolkit
+from ctf_toolkit import NoteStore
+
+
+def test_saves_are_written_once_edits_pause(tmp_path):
+    flushed = []
+    store = NoteStore(tmp_path, delay=0.05, on_flush=flushed.append)
+
+    async def type_and_wait():
+        for text in ("d", "dr", "draft"):
+            store.schedule_save("web", "recon", text)
+            await asyncio.sleep(0.01)
+        assert store.dirty and store.load("web", "recon") == "draft"
+        await asyncio.sleep(0.2)
+
+    asyncio.run(type_and_wait())
+
+    assert store.path("web", "recon").read_text(encoding="utf-8") == "draft"
+    assert store.saves == 1
+    assert flushed == [None]
+    assert not store.dirty
+
+
+def test_notes_are_listed_without_reading_them(tmp_path):
+    store = NoteStore(tmp_path)
+
+    async def save():
+        for challenge, name in [("pwn", "exploit"), ("web", "recon"), ("web", "sqli")]:
+            store.schedule_save(challenge, name, "text")
+        await store.flush()
+
+    asyncio.run(save())
+
+    assert store.list_challenges() == ["pwn", "web"]
+    assert store.list_notes("web") == ["recon", "sqli"]
+    assert store.list_notes("missing") == []
+    assert store.load("web", "missing") is None
+
+
+def test_last_opened_note_is_remembered(tmp_path):
+    NoteStore(tmp_path).set_last_opened("crypto", "rsa")
+    assert NoteStore(tmp_path).last_opened() == ("crypto", "rsa")
+    assert NoteStore(tmp_path / "empty").last_opened() is None
+
+
+def test_clean_name():
+    assert NoteStore.clean_name(" ../etc/passwd ") == "etc_passwd"
+    assert NoteStore.clean_name("...") == "notes"
+
+
+def test_a_failed_save_keeps_the_old_file_and_the_unsaved_text(tmp_path, monkeypatch):
+    errors = []
+    store = NoteStore(tmp_path, on_flush=errors.append)
+    store.path("web", "recon").parent.mkdir(parents=True)
+    store.path("web", "recon").write_text("saved", encoding="utf-8")
+    replace = os.replace
+
+    def disk_full(src, dst):
+        raise OSError("No space left on device")
+
+    async def save_twice():
+        monkeypatch.setattr(ctf_toolkit.os, "replace", disk_full)
+        store.schedule_save("web", "recon", "edited")
+        await store.flush()
+        failed = store.path("web", "recon").read_text(encoding="utf-8"), store.dirty
+        monkeypatch.setattr(ctf_toolkit.os, "replace", replace)
+        await store.flush()
+        return failed
+
+    assert asyncio.run(save_twice()) == ("saved", True)
+    assert isinstance(errors[0], OSError) and errors[1] is None
+    assert store.path("web", "recon").read_text(encoding="utf-8") == "edited"
+    assert [path.name for path in store.path("web", "recon").parent.iterdir()] == ["recon.md"]
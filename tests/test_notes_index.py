@@ -0,0 +1,74 @@
+"""Indexing saved notes at startup: only changed notes are read, only the current challenge's reach the AI."""
+
+import asyncio
+import os
+
+import pytest
+
+import ctf_toolkit
+from ctf_toolkit import CTFToolkitApp, ContextIndex, NoteStore, SearchIndex
+
+
+@pytest.fixture
+def notes(tmp_path, monkeypatch):
+    store = NoteStore(tmp_path / "notes")
+    monkeypatch.setattr(ctf_toolkit, "NoteStore", lambda: store)
+    for challenge, name, text in [("web", "recon", "gobuster found /admin"),
+                                  ("web", "sqli", "union select works"),
+                                  ("pwn", "exploit", "ret2libc offset 72")]:
+        path = store.path(challenge, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    store.set_last_opened("web", "recon")
+    return store
+
+
+def start_app(tmp_path, notes, monkeypatch):
+    """Run `index_notes` as a fresh app would, returning what it indexed and read."""
+    app = CTFToolkitApp()
+    app.search_index = SearchIndex(str(tmp_path / "search.sqlite3"), interval=60)
+    app.context_index = ContextIndex()
+    read = []
+    load = NoteStore.load
+
+    def recording_load(self, challenge, name):
+        read.append(f"{challenge}/{name}")
+        return load(self, challenge, name)
+
+    monkeypatch.setattr(NoteStore, "load", recording_load)
+
+    async def run():
+        try:
+            await app.index_notes()
+            return {query: [hit.title for hit in await app.search_index.search(query)]
+                    for query in ("gobuster", "union", "ret2libc")}
+        finally:
+            await app.search_index.close()
+
+    found = asyncio.run(run())
+    context = {query: [title for _, title, _ in app.context_index.search(query)]
+               for query in ("gobuster", "union", "ret2libc")}
+    return found, context, sorted(read)
+
+
+def test_every_note_is_searchable_but_only_the_current_challenge_is_ai_context(tmp_path, notes, monkeypatch):
+    found, context, read = start_app(tmp_path, notes, monkeypatch)
+
+    assert found == {"gobuster": ["web/recon"], "union": ["web/sqli"], "ret2libc": ["pwn/exploit"]}
+    assert context == {"gobuster": ["web/recon"], "union": ["web/sqli"], "ret2libc": []}
+    assert read == ["pwn/exploit", "web/recon", "web/sqli"]
+
+
+def test_a_restart_reads_only_changed_notes_and_drops_deleted_ones(tmp_path, notes, monkeypatch):
+    start_app(tmp_path, notes, monkeypatch)
+    exploit = notes.path("pwn", "exploit")
+    exploit.write_text("ret2libc offset 80", encoding="utf-8")
+    os.utime(exploit, (exploit.stat().st_atime, exploit.stat().st_mtime + 10))
+    notes.path("web", "sqli").unlink()
+
+    found, context, read = start_app(tmp_path, notes, monkeypatch)
+
+    # The current challenge's notes are read for the AI, other unchanged ones not at all
+    assert read == ["pwn/exploit", "web/recon"]
+    assert found == {"gobuster": ["web/recon"], "union": [], "ret2libc": ["pwn/exploit"]}
+    assert context["gobuster"] == ["web/recon"]
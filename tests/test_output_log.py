@@ -0,0 +1,125 @@
+"""Session logs: `OutputLog` writing output and its line index, `MappedLog` paging it back, `OutputLogStore`."""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from ctf_toolkit import CommandHistory, MappedLog, OutputLog, OutputLogStore, TerminalManager
+
+
+def test_lines_are_indexed_across_writes_and_flushes(tmp_path):
+    log = OutputLog(tmp_path, "job", "cat", "/tmp")
+    log.write("first\nsec")
+    log.flush()
+    log.write("ond\r\nthird\n\nfif")
+    log.close(exit_code=0)
+
+    mapped = MappedLog(log.path)
+
+    assert [mapped[i] for i in range(len(mapped))] == ["first", "second", "third", "", "fif"]
+    with pytest.raises(IndexError):
+        mapped[5]
+    meta = json.loads(log.path.with_suffix(".json").read_text(encoding="utf-8"))
+    assert (meta["command"], meta["exit_code"], meta["bytes"], meta["lines"]) == ("cat", 0, 24, 5)
+    mapped.close()
+
+
+def test_a_live_log_is_followed_as_it_grows(tmp_path):
+    log = OutputLog(tmp_path, "job", "tail -f", "/tmp")
+    mapped = MappedLog(log.path, writer=log)
+    assert len(mapped) == 0
+
+    log.write("one\ntw")
+    assert mapped.refresh() # Flushes the writer's buffer first
+    assert [mapped[0], mapped[1]] == ["one", "tw"]
+
+    log.write("o\nthree\n")
+    log.close()
+    assert mapped.refresh()
+    assert [mapped[i] for i in range(len(mapped))] == ["one", "two", "three"]
+    assert not mapped.refresh()
+    assert mapped.writer is None
+    mapped.close()
+
+
+def test_undecodable_and_overlong_lines_are_shown_leniently(tmp_path):
+    log = OutputLog(tmp_path, "job", "cat /bin/ls", "/tmp")
+    log.write(b"\xff\xfeELF\n")
+    log.write("x" * (MappedLog.MAX_LINE_BYTES + 100) + "\n")
+    log.close()
+
+    mapped = MappedLog(log.path)
+
+    assert mapped[0] == "��ELF"
+    assert mapped[1] == "x" * MappedLog.MAX_LINE_BYTES
+    mapped.close()
+
+
+def test_large_logs_are_indexed_a_buffer_at_a_time(tmp_path):
+    log = OutputLog(tmp_path, "job", "seq", "/tmp")
+    for i in range(100_000):
+        log.write(f"line {i}\n")
+    log.close()
+
+    mapped = MappedLog(log.path)
+
+    assert len(mapped) == 100_000
+    assert [mapped[0], mapped[54_321], mapped[99_999]] == ["line 0", "line 54321", "line 99999"]
+    assert log.path.with_suffix(".idx").stat().st_size == 8 * 100_000
+    mapped.close()
+
+
+def test_store_lists_the_newest_logs_first(tmp_path):
+    store = OutputLogStore(tmp_path)
+    first = store.create("id", "/tmp")
+    second = store.create("whoami", "/tmp")
+    store.release(first, 0)
+    store.release(second, 1)
+
+    logs = store.list()
+
+    assert [meta["command"] for _, meta in logs] == ["whoami", "id"]
+    assert [meta["exit_code"] for _, meta in logs] == [1, 0]
+    assert first.name != second.name
+    assert not store.live
+
+
+def test_pruning_deletes_the_oldest_finished_logs_but_never_live_ones(tmp_path):
+    store = OutputLogStore(tmp_path, max_mb=13000 / 2**20) # Room for three of the logs
+    oldest = store.create("running", "/tmp")
+    oldest.write("r" * 4000)
+    oldest.flush()
+    finished = []
+    for i in range(4):
+        log = store.create(f"done {i}", "/tmp")
+        log.write(str(i) * 4000)
+        store.release(log, 0)
+        finished.append(log.name)
+
+    removed = store.prune()
+
+    remaining = sorted({name.rpartition(".")[0] for name in os.listdir(tmp_path)})
+    assert removed == 2
+    assert remaining == [oldest.name, *finished[2:]]
+    store.release(oldest)
+
+
+def test_jobs_are_logged_by_the_terminal(tmp_path):
+    store = OutputLogStore(tmp_path / "logs")
+    manager = TerminalManager(history=CommandHistory(path=None), logs=store, use_session=False)
+
+    async def run():
+        try:
+            await manager.submit_job("echo out; echo err >&2; exit 2").task
+        finally:
+            await manager.close()
+
+    asyncio.run(run())
+    (name, meta), = store.list()
+    mapped = store.open(name)
+
+    assert (meta["command"], meta["exit_code"]) == ("echo out; echo err >&2; exit 2", 2)
+    assert sorted(mapped[i] for i in range(len(mapped))) == ["err", "out"]
+    mapped.close()
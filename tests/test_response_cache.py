@@ -0,0 +1,79 @@
+"""ResponseCache: the SQLite store behind the AI assistant's answer cache."""
+
+import asyncio
+
+import pytest
+
+import ctf_toolkit
+from ctf_toolkit import ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ctf_toolkit.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    caches = []
+
+    def make(**kwargs):
+        caches.append(ResponseCache(tmp_path / f"cache{len(caches)}.sqlite3", **kwargs))
+        return caches[-1]
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def test_cache_key_ignores_whitespace_and_line_ending_differences():
+    key = ResponseCache.make_key("gpt", [{"role": "user", "content": "hello\r\nworld "}])
+    assert key == ResponseCache.make_key("gpt", [{"role": "user", "content": "  hello\nworld"}])
+    assert key != ResponseCache.make_key("other", [{"role": "user", "content": "hello\nworld"}])
+
+
+def test_cache_entries_expire_after_the_ttl(make_cache, clock):
+    cache = make_cache(ttl=60)
+    cache.put("key", "model", "answer")
+
+    clock.now += 59
+    assert cache.get("key") == "answer"
+    clock.now += 2
+    assert cache.get("key") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.stats()["entries"] == 0
+
+
+def test_cache_evicts_least_recently_used_beyond_its_size(make_cache, clock):
+    cache = make_cache(max_bytes=10)
+    cache.put("a", "model", "1234")
+    clock.now += 1
+    cache.put("b", "model", "1234")
+    clock.now += 1
+    assert cache.get("a") == "1234" # Now more recently used than "b"
+    clock.now += 1
+    cache.put("c", "model", "1234")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == "1234"
+    assert cache.evictions == 1
+
+
+def test_cache_async_api_runs_off_the_event_loop(make_cache):
+    cache = make_cache()
+
+    async def round_trip():
+        await cache.store("key", "model", "answer")
+        return await cache.fetch("key"), await cache.fetch("missing")
+
+    assert asyncio.run(round_trip()) == ("answer", None)
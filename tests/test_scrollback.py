@@ -0,0 +1,109 @@
+"""The terminal's scrollback: the bounded `ScrollbackBuffer` and the `ScrollbackLog` pane drawing it."""
+
+import asyncio
+
+from textual.app import App
+
+from ctf_toolkit import ScrollbackBuffer, ScrollbackLog
+
+
+def test_scrollback_only_shows_text_once_flushed():
+    buffer = ScrollbackBuffer(max_lines=10)
+    buffer.write("one\ntw")
+    assert len(buffer) == 0 and buffer.has_pending
+
+    assert buffer.flush() == ["one", "tw"]
+    assert list(buffer.lines) == ["one"]
+    assert buffer.partial == "tw"
+    assert buffer[1] == "tw"
+
+    buffer.write("o\n")
+    buffer.flush()
+    assert list(buffer.lines) == ["one", "two"]
+    assert buffer.partial == ""
+
+
+def test_scrollback_keeps_only_the_newest_lines():
+    buffer = ScrollbackBuffer(max_lines=3)
+    buffer.write("".join(f"line {i}\n" for i in range(10)))
+    buffer.flush()
+
+    assert list(buffer.lines) == ["line 7", "line 8", "line 9"]
+    assert buffer.dropped == 7
+
+
+def test_scrollback_flushes_itself_when_too_many_writes_queue_up():
+    buffer = ScrollbackBuffer(max_lines=10)
+    for _ in range(buffer.MAX_PENDING_WRITES):
+        buffer.write("x")
+
+    assert not buffer.has_pending
+    assert buffer.partial == "x" * buffer.MAX_PENDING_WRITES
+
+
+class LogApp(App):
+    def __init__(self, pane):
+        super().__init__()
+        self.pane = pane
+
+    def compose(self):
+        yield self.pane
+
+
+def run_pane(pane, interact):
+    async def run():
+        app = LogApp(pane)
+        async with app.run_test(size=(40, 6)) as pilot:
+            await pilot.pause()
+            return await interact(pilot)
+    return asyncio.run(run())
+
+
+def visible_text(pane):
+    return [pane.render_line(y).text.rstrip() for y in range(pane.size.height)]
+
+
+def test_scrollback_log_paints_writes_on_the_next_flush_and_follows_the_tail():
+    pane = ScrollbackLog(max_lines=100, flush_fps=1)
+
+    async def interact(pilot):
+        pane.write("".join(f"line {i}\n" for i in range(20)))
+        before = visible_text(pane)
+        pane.flush()
+        await pilot.pause()
+        return before, visible_text(pane)
+
+    before, after = run_pane(pane, interact)
+
+    assert not any(before)
+    assert pane.virtual_size.height == 20
+    assert "line 19" in after and "line 0" not in after
+
+
+def test_scrollback_log_stays_put_when_scrolled_back():
+    pane = ScrollbackLog("".join(f"line {i}\n" for i in range(20)), max_lines=100, flush_fps=1)
+
+    async def interact(pilot):
+        pane.scroll_home(animate=False, immediate=True)
+        await pilot.pause()
+        pane.write("more\n")
+        pane.flush()
+        await pilot.pause()
+        return visible_text(pane)
+
+    assert run_pane(pane, interact)[0] == "line 0"
+
+
+def test_scrollback_log_drops_old_lines_and_control_characters():
+    pane = ScrollbackLog(max_lines=3, flush_fps=1)
+
+    async def interact(pilot):
+        pane.write("".join(f"line {i}\n" for i in range(10)) + "bell\x07here")
+        pane.flush()
+        await pilot.pause()
+        return visible_text(pane)
+
+    lines = run_pane(pane, interact)
+
+    assert pane.virtual_size.height == 4 # 3 lines and the partial one
+    assert lines[:4] == ["line 7", "line 8", "line 9", "bell�here"]
@@ -0,0 +1,159 @@
+"""SearchIndex over an in-memory database: streamed output, notes, plain and regex queries."""
+
+import asyncio
+import re
+import sqlite3
+
+import pytest
+
+import ctf_toolkit
+from ctf_toolkit import SearchIndex
+
+
+def search(index, query, **kwargs):
+    return asyncio.run(index.search(query, **kwargs))
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex(":memory:", interval=60)
+    yield index
+    asyncio.run(index.close())
+
+
+def indexed(index, fill):
+    """Run `fill(index)` inside an event loop, then write everything out."""
+    async def run():
+        fill(index)
+        await index.flush()
+    asyncio.run(run())
+    if not index.available:
+        pytest.skip("SQLite lacks the FTS5 trigram tokenizer")
+    return index
+
+
+def test_streamed_output_is_found_across_chunk_boundaries(index):
+    def fill(index):
+        index.append("output", "job:1", "cat log", "first line\nsecond ")
+        index.append("output", "job:1", "cat log", "line with FLAG{abc}\nthird line\n")
+        index.end("job:1")
+
+    hits = search(indexed(index, fill), "flag{abc")
+
+    assert [(hit.source, hit.line, hit.text) for hit in hits] == [("job:1", 2, "second line with FLAG{abc}")]
+    assert "first line" in hits[0].context and "third line" in hits[0].context
+
+
+def test_plain_queries_are_case_insensitive_substrings(index):
+    def fill(index):
+        index.append("history", "history", "history", "nmap -sV Target\nls\n")
+        index.end("history")
+
+    assert [hit.text for hit in search(indexed(index, fill), "TARGET")] == ["nmap -sV Target"]
+
+
+def test_plain_queries_fold_non_ascii_case(index):
+    def fill(index):
+        index.append("output", "job:1", "cat notes", "Straße 12\nÉCHEC: accès refusé\n")
+        index.end("job:1")
+
+    indexed(index, fill)
+
+    assert [hit.text for hit in search(index, "STRASSE")] == ["Straße 12"]
+    assert [hit.text for hit in search(index, "échec")] == ["ÉCHEC: accès refusé"]
+
+
+def test_wildcard_characters_in_queries_are_literal(index):
+    def fill(index):
+        index.append("output", "job:1", "cat", "100%_done\nls *.txt [abc]?\n1000done\nls a.txt\n")
+        index.end("job:1")
+
+    indexed(index, fill)
+
+    assert [hit.text for hit in search(index, "100%_done")] == ["100%_done"]
+    assert [hit.text for hit in search(index, "*.txt [abc]?")] == ["ls *.txt [abc]?"]
+
+
+def test_regex_queries(index):
+    def fill(index):
+        index.append("output", "job:1", "strings", "flag{12345}\nflag{not digits}\nnothing\n")
+        index.end("job:1")
+
+    hits = search(indexed(index, fill), r"flag\{\d+\}", regex=True)
+
+    assert [hit.text for hit in hits] == ["flag{12345}"]
+    with pytest.raises(re.error):
+        search(index, "flag{(", regex=True)
+
+
+def test_notes_are_replaced_as_a_whole(index):
+    def fill(index):
+        index.set_document("note", "note:ctf/web", "ctf/web", "old password: hunter2")
+        index.set_document("note", "note:ctf/web", "ctf/web", "new password: correcthorse")
+
+    indexed(index, fill)
+
+    assert search(index, "hunter2") == []
+    assert [hit.title for hit in search(index, "correcthorse")] == ["ctf/web"]
+
+
+def test_newest_hits_come_first_and_are_limited(index):
+    def fill(index):
+        for job in range(5):
+            index.append("output", f"job:{job}", f"echo {job}", f"match {job}\n")
+            index.end(f"job:{job}")
+
+    hits = search(indexed(index, fill), "match", limit=3)
+
+    assert [hit.text for hit in hits] == ["match 4", "match 3", "match 2"]
+
+
+@pytest.mark.parametrize("pattern, literals", [
+    (r"flag\{\w+\}", ["flag{"]),
+    (r"password=(\S+)", ["password="]),
+    (r"ab.cd", []),
+    (r"(?x) flag", []),
+])
+def test_required_literals(pattern, literals):
+    assert SearchIndex.required_literals(pattern) == literals
+
+
+class NoTrigramConnection:
+    """sqlite3 connection of a build without the FTS5 trigram tokenizer."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, sql, *args):
+        if "VIRTUAL TABLE" in sql:
+            raise sqlite3.OperationalError("no such tokenizer: trigram")
+        return self.db.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    def __enter__(self):
+        return self.db.__enter__()
+
+    def __exit__(self, *exc):
+        return self.db.__exit__(*exc)
+
+
+def test_without_fts5_trigram_searches_scan_a_plain_table(monkeypatch):
+    connect = sqlite3.connect
+    monkeypatch.setattr(ctf_toolkit.sqlite3, "connect", lambda path: NoTrigramConnection(connect(path)))
+    index = SearchIndex(":memory:", interval=60)
+
+    async def fill_and_search():
+        index.append("output", "job:1", "cat", "Straße\nflag{42}\n")
+        index.end("job:1")
+        try:
+            return await index.search("STRASSE"), await index.search(r"flag\{\d+\}", regex=True)
+        finally:
+            await index.close()
+
+    plain, regex = asyncio.run(fill_and_search())
+
+    assert not index.available
+    assert [hit.text for hit in plain] == ["Straße"]
+    assert [hit.text for hit in regex] == ["flag{42}"]
@@ -0,0 +1,121 @@
+"""ShellSession: a persistent shell on a PTY, told apart command by command by its end marker."""
+
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+
+from ctf_toolkit import CommandHistory, ShellSession, TerminalManager
+
+pytestmark = pytest.mark.skipif(not ShellSession.is_supported(), reason="needs PTY support")
+
+
+def in_session(scenario, tmp_path):
+    """Run `scenario(session)` against a fresh session started in `tmp_path`."""
+    async def run():
+        session = ShellSession()
+        await session.start(tmp_path)
+        try:
+            return await asyncio.wait_for(scenario(session), 10)
+        finally:
+            await session.close()
+    return asyncio.run(run())
+
+
+async def output_of(session, command, **kwargs):
+    items = [item async for item in session.run(command, **kwargs)]
+    text = items[:-1] if kwargs.get("raw") else "".join(value for kind, value in items if kind == "stdout")
+    return text, items[-1]
+
+
+def test_shell_state_persists_between_commands(tmp_path):
+    (tmp_path / "sub").mkdir()
+
+    async def scenario(session):
+        await output_of(session, "cd sub; SECRET=s3cr3t")
+        return await output_of(session, "echo $SECRET; pwd"), session.cwd
+
+    (text, result), cwd = in_session(scenario, tmp_path)
+
+    assert text == f"s3cr3t\n{tmp_path / 'sub'}\n"
+    assert result == ("returncode", 0)
+    assert cwd == tmp_path / "sub"
+
+
+def test_commands_see_a_terminal_and_report_their_exit_code(tmp_path):
+    async def scenario(session):
+        return await output_of(session, "test -t 0 && test -t 1 && echo tty; echo err >&2; (exit 7)")
+
+    text, result = in_session(scenario, tmp_path)
+
+    assert text == "tty\nerr\n"
+    assert result == ("returncode", 7)
+
+
+def test_output_resembling_the_marker_is_passed_through(tmp_path):
+    async def scenario(session):
+        return await output_of(session, r"printf '\037__ctf'; printf ' not a marker\n'")
+
+    text, result = in_session(scenario, tmp_path)
+
+    assert text == "\x1f__ctf not a marker\n"
+    assert result == ("returncode", 0)
+
+
+def test_marker_prefix_is_held_back_until_complete():
+    session = ShellSession()
+    marker = ShellSession.MARKER
+
+    assert session._marker_prefix_length(b"output" + marker[:5]) == 5
+    assert session._marker_prefix_length(b"output\x1f") == 1
+    assert session._marker_prefix_length(b"output\x1fxyz") == 0
+    assert session._marker_prefix_length(b"plain output") == 0
+
+
+def test_raw_runs_yield_bytes(tmp_path):
+    async def scenario(session):
+        return await output_of(session, r"printf '\377\376'", raw=True)
+
+    chunks, result = in_session(scenario, tmp_path)
+
+    assert b"".join(value for _, value in chunks) == b"\xff\xfe"
+    assert result == ("returncode", 0)
+
+
+def test_an_abandoned_command_is_interrupted_and_the_session_reused(tmp_path):
+    async def scenario(session):
+        output = session.run("echo started; sleep 30")
+        first = await output.__anext__()
+        started = time.monotonic()
+        await output.aclose()
+        interrupted_in = time.monotonic() - started
+        return first, interrupted_in, session.alive, session.busy, await output_of(session, "echo still here")
+
+    first, interrupted_in, alive, busy, (text, result) = in_session(scenario, tmp_path)
+
+    assert first == ("stdout", "started\n")
+    assert interrupted_in < 2
+    assert alive and not busy
+    assert text == "still here\n" and result == ("returncode", 0)
+
+
+def test_exiting_the_shell_ends_the_session_and_the_manager_starts_a_new_one(tmp_path):
+    manager = TerminalManager(use_session=True, history=CommandHistory(path=None), logs=None)
+    manager.current_dir = tmp_path
+
+    async def run():
+        try:
+            ended = [item async for item in manager.execute_command("exit 3")]
+            first_session = manager.session
+            again = [item async for item in manager.execute_command("cd /; echo $PWD")]
+            return ended, first_session is not manager.session, again
+        finally:
+            await manager.close()
+
+    ended, restarted, again = asyncio.run(run())
+
+    assert ended == [("error", "Shell session ended."), ("returncode", 3)]
+    assert restarted
+    assert again == [("stdout", "/\n"), ("returncode", 0)]
+    assert manager.current_dir == Path("/")
@@ -0,0 +1,224 @@
+"""TerminalManager: streaming command output, read modes and concurrent jobs."""
+
+import asyncio
+import shlex
+import sys
+
+import pytest
+
+from ctf_toolkit import CommandHistory, HexDumpFormatter, TerminalManager
+
+
+@pytest.fixture
+def terminal(tmp_path):
+    def make(**kwargs):
+        kwargs.setdefault("use_session", False)
+        return TerminalManager(history=CommandHistory(tmp_path / "history.jsonl"), logs=None, **kwargs)
+    return make
+
+
+def python_command(code):
+    """Shell command running `code` with this interpreter, unbuffered."""
+    return f"{shlex.quote(sys.executable)} -u -c {shlex.quote(code)}"
+
+
+def is_running(pid):
+    """Whether `pid` exists and is not a zombie waiting to be reaped by init."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def run_command(manager, command, **kwargs):
+    async def run():
+        try:
+            return [item async for item in manager.execute_command(command, **kwargs)]
+        finally:
+            await manager.close()
+    return asyncio.run(run())
+
+
+def joined(items, stream_type):
+    return "".join(value for kind, value in items if kind == stream_type)
+
+
+# --- Output multiplexing ------------------------------------------------------
+
+def test_stdout_and_stderr_arrive_on_one_stream_with_the_return_code(terminal):
+    items = run_command(terminal(), python_command(
+        "import sys\nprint('out 1')\nprint('err 1', file=sys.stderr)\nprint('out 2')\nsys.exit(3)"
+    ))
+
+    assert joined(items, "stdout") == "out 1\nout 2\n"
+    assert joined(items, "stderr") == "err 1\n"
+    assert items[-1] == ("returncode", 3)
+
+
+def test_lines_longer_than_the_stream_limit_arrive_in_pieces(terminal):
+    items = run_command(terminal(), python_command("print('x' * 300000)"))
+
+    pieces = [value for kind, value in items if kind == "stdout"]
+    assert len(pieces) > 1
+    assert "".join(pieces) == "x" * 300000 + "\n"
+
+
+def test_a_small_queue_applies_backpressure_without_losing_output(terminal):
+    items = run_command(terminal(queue_size=1), python_command("for i in range(2000): print(i)"))
+
+    assert joined(items, "stdout") == "".join(f"{i}\n" for i in range(2000))
+
+
+def test_a_command_that_cannot_start_reports_an_error(terminal):
+    manager = terminal()
+    manager.current_dir = manager.current_dir / "does-not-exist"
+
+    items = run_command(manager, "echo hi")
+
+    assert items[0][0] == "error"
+    assert items[-1] == ("returncode", 1)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc")
+def test_abandoning_the_output_kills_the_command(terminal):
+    manager = terminal()
+
+    async def run():
+        output = manager.execute_command(python_command("import os, time\nprint(os.getpid())\ntime.sleep(30)"))
+        kind, pid = await output.__anext__()
+        await output.aclose()
+        await manager.close()
+        return int(pid)
+
+    pid = asyncio.run(run())
+
+    assert not is_running(pid)
+
+
+# --- Read modes ---------------------------------------------------------------
+
+def test_chunk_mode_decodes_multibyte_characters_split_across_reads(terminal):
+    text = "héllo wörld ✓ " * 50
+    items = run_command(terminal(chunk_size=7), python_command(f"import sys\nsys.stdout.write({text!r})"), mode="chunk")
+
+    pieces = [value for kind, value in items if kind == "stdout"]
+    assert len(pieces) > 1
+    assert "".join(pieces) == text
+    assert "�" not in "".join(pieces)
+
+
+def test_raw_mode_yields_undecoded_bytes(terminal):
+    items = run_command(terminal(), python_command("import sys\nsys.stdout.buffer.write(bytes(range(256)))"), mode="raw")
+
+    chunks = [value for kind, value in items if kind == "stdout"]
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    assert b"".join(chunks) == bytes(range(256))
+
+
+def test_unknown_mode_is_an_error(terminal):
+    items = run_command(terminal(), "echo hi", mode="bogus")
+
+    assert items == [("error", "Unknown stream mode: 'bogus'"), ("returncode", 1)]
+
+
+def test_hexdump_matches_whole_input_however_it_is_fed():
+    data = b"flag{hexdump}\x00\x01\x02" + bytes(range(0x20, 0x7f))
+    whole = HexDumpFormatter()
+    expected = whole.feed(data) + whole.finish()
+
+    pieces = HexDumpFormatter()
+    fed = "".join(pieces.feed(data[i:i + 5]) for i in range(0, len(data), 5)) + pieces.finish()
+
+    assert fed == expected
+    lines = expected.splitlines()
+    assert lines[0] == "00000000  66 6c 61 67 7b 68 65 78  64 75 6d 70 7d 00 01 02  |flag{hexdump}...|"
+    assert lines[1].startswith("00000010  20 21 22 23")
+    assert lines[-1] == f"{len(data):08x}"
+
+
+def test_raw_jobs_are_shown_as_a_hexdump(terminal):
+    manager = terminal()
+
+    async def run():
+        job = manager.submit_job(python_command("import sys\nsys.stdout.buffer.write(b'AB')"), mode="raw")
+        await job.task
+        await manager.close()
+        return job
+
+    job = asyncio.run(run())
+    job.output.flush()
+
+    assert list(job.output.lines)[:2] == ["00000000  41 42" + " " * 45 + "|AB|", "00000002"]
+
+
+# --- Jobs ---------------------------------------------------------------------
+
+def run_jobs(manager, scenario):
+    async def run():
+        try:
+            return await scenario(manager)
+        finally:
+            await manager.close()
+    return asyncio.run(run())
+
+
+def test_jobs_beyond_the_limit_wait_for_a_free_slot(terminal):
+    statuses = []
+
+    async def scenario(manager):
+        first = manager.submit_job("sleep 0.3", on_update=lambda job: statuses.append((job.id, job.status)))
+        second = manager.submit_job("echo second", on_update=lambda job: statuses.append((job.id, job.status)))
+        await asyncio.sleep(0.1)
+        waiting = second.status
+        await asyncio.gather(first.task, second.task)
+        return waiting
+
+    assert run_jobs(terminal(max_jobs=1), scenario) == "queued"
+    assert statuses == [(1, "running"), (1, "done"), (2, "running"), (2, "done")]
+
+
+def test_jobs_record_output_status_and_exit_code(terminal):
+    async def scenario(manager):
+        ok = manager.submit_job("echo hello")
+        failed = manager.submit_job("echo oops >&2; exit 4", background=True)
+        await asyncio.gather(ok.task, failed.task)
+        return ok, failed
+
+    ok, failed = run_jobs(terminal(), scenario)
+    ok.output.flush()
+    failed.output.flush()
+
+    assert (ok.status, ok.return_code, ok.lines) == ("done", 0, 1)
+    assert list(ok.output.lines) == ["hello", "[Exit Code: 0]"]
+    assert (failed.status, failed.return_code, failed.background) == ("failed", 4, True)
+    assert list(failed.output.lines) == ["[STDERR] oops", "[Exit Code: 4]"]
+
+
+def test_cancelling_a_job_kills_it(terminal):
+    async def scenario(manager):
+        job = manager.submit_job("sleep 30")
+        await asyncio.sleep(0.2)
+        assert manager.cancel_job(job.id)
+        await asyncio.wait_for(asyncio.gather(job.task, return_exceptions=True), 5)
+        return job, manager.cancel_job(job.id), manager.cancel_job(999)
+
+    job, again, unknown = run_jobs(terminal(), scenario)
+
+    assert job.status == "killed"
+    assert not again and not unknown
+
+
+def test_only_the_newest_finished_jobs_are_kept(terminal):
+    async def scenario(manager):
+        jobs = []
+        for i in range(4):
+            jobs.append(manager.submit_job(f"echo {i}"))
+            await jobs[-1].task
+        return jobs
+
+    manager = terminal(max_finished_jobs=2)
+    jobs = run_jobs(manager, scenario)
+
+    assert sorted(manager.jobs) == [3, 4]
+    assert len(jobs[0].output) == 0 # Forgotten jobs free their buffers
@@ -0,0 +1,186 @@
+"""Toolbox transforms: the per-chunk worker functions and a full run through the process pool."""
+
+import asyncio
+import base64
+import codecs
+import hashlib
+
+import pytest
+
+from ctf_toolkit import (
+    TransformManager,
+    _crack_chunk,
+    _decode_chains,
+    _decode_step,
+    _entropy_chunk,
+    _read_chunk,
+    _xor_chunk,
+)
+
+PLAINTEXT = b"Nothing to see here. flag{x0r_is_not_encrypt10n} The end.\n"
+
+
+def xored(data, key):
+    return bytes(byte ^ key for byte in data)
+
+
+@pytest.fixture
+def write(tmp_path):
+    def write(name, data):
+        path = tmp_path / name
+        path.write_bytes(data)
+        return str(path)
+    return write
+
+
+def test_read_chunk_with_whole_lines_gives_each_line_to_one_chunk(write):
+    path = write("words.txt", b"alpha\nbravo\ncharlie\ndelta\n")
+
+    first = _read_chunk(path, 0, 8, whole_lines=True)
+    second = _read_chunk(path, 8, 26, whole_lines=True)
+
+    assert first == b"alpha\nbravo\n"
+    assert second == b"charlie\ndelta\n"
+
+
+def test_xor_chunk_finds_the_key_from_a_crib(write):
+    path = write("secret.bin", xored(PLAINTEXT, 0x5a))
+
+    histogram, hits = _xor_chunk(path, 0, len(PLAINTEXT), [b"flag{"])
+
+    assert sum(histogram) == len(PLAINTEXT)
+    assert [(offset, key) for offset, key, _ in hits] == [(PLAINTEXT.index(b"flag{"), 0x5a)]
+    assert hits[0][2].startswith(b"flag{x0r_is_not_encrypt10n}")
+
+
+def test_xor_chunk_finds_a_crib_straddling_the_chunk_end(write):
+    path = write("secret.bin", xored(PLAINTEXT, 0x13))
+    end = PLAINTEXT.index(b"flag{") + 2
+
+    _, first = _xor_chunk(path, 0, end, [b"flag{"])
+    _, second = _xor_chunk(path, end, len(PLAINTEXT), [b"flag{"])
+
+    assert [key for _, key, _ in first] == [0x13]
+    assert second == []
+
+
+def test_crack_chunk_finds_words_for_every_algorithm(write):
+    path = write("words.txt", b"123456\npassword\nletmein\ndragon\n")
+    targets = {
+        "md5": frozenset({hashlib.md5(b"letmein").digest()}),
+        "sha256": frozenset({hashlib.sha256(b"dragon").digest(), hashlib.sha256(b"absent").digest()}),
+    }
+
+    tried, found = _crack_chunk(path, 0, 100, targets)
+
+    assert tried == 4
+    assert sorted(word for _, word in found) == [b"dragon", b"letmein"]
+
+
+def test_entropy_chunk_tells_text_from_random_bytes(write):
+    path = write("mixed.bin", b"A" * 256 + bytes(range(256)))
+
+    low, high = _entropy_chunk(path, 0, 512, 256)
+
+    assert low == pytest.approx(0.0)
+    assert high == pytest.approx(8.0)
+
+
+@pytest.mark.parametrize("name, encoded", [
+    ("base64", base64.b64encode(b"hello world")),
+    ("base32", base64.b32encode(b"hello world")),
+    ("hex", b"68656c6c6f20776f726c64"),
+    ("binary", b"".join(format(byte, "08b").encode() for byte in b"hello world")),
+    ("url", b"hello%20world"),
+    ("rot13", codecs.encode("hello world", "rot13").encode()),
+])
+def test_decode_step(name, encoded):
+    assert _decode_step(name, encoded) == b"hello world"
+
+
+def test_decode_step_rejects_invalid_and_unchanged_input():
+    assert _decode_step("hex", b"not hex at all") is None
+    assert _decode_step("base64", base64.b64encode(bytes(range(200)))) is None # Not printable
+    assert _decode_step("rot13", b"1234 5678") is None # Nothing to rotate
+
+
+def test_decode_chains_unwraps_nested_encodings():
+    secret = b"flag{layered}"
+    encoded = base64.b64encode(secret.hex().encode())
+
+    found = _decode_chains(encoded, "base64", depth=3, cribs=[b"flag{"])
+
+    score, chain, output = found[0]
+    assert (chain, output) == (["base64", "hex"], secret)
+    assert score > 1
+
+
+def test_decode_chains_never_revisit_an_earlier_value():
+    for name in ("rot13", "rot47", "url"):
+        for _, chain, output in _decode_chains(b"Hello, World! 0123", name, depth=4, cribs=[]):
+            assert output != b"Hello, World! 0123", chain
+
+
+def run_transform(manager, *args):
+    async def run():
+        try:
+            return [item async for item in manager.run(*args)]
+        finally:
+            manager.close()
+    return asyncio.run(run())
+
+
+def test_transform_manager_runs_a_transform_in_worker_processes(write):
+    path = write("secret.bin", xored(PLAINTEXT * 100, 0x42))
+    manager = TransformManager(workers=1, chunk_mb=0.001, cribs=[b"flag{"])
+
+    items = run_transform(manager, "xor", path)
+
+    progress = [value for kind, value in items if kind == "progress"]
+    matches = [value for kind, value in items if kind == "match"]
+    assert progress[-1][0] == progress[-1][1] > 1
+    assert len(matches) == 100 and all("key 0x42" in match for match in matches)
+    assert any("key 0x42" in value for kind, value in items if kind == "result")
+
+
+def test_transform_manager_reports_bad_input_as_an_error():
+    manager = TransformManager(workers=1)
+
+    assert run_transform(manager, "hash", "not-a-digest") == [
+        ("error", "Not an MD5/SHA-1/SHA-2 hex digest: not-a-digest"),
+    ]
+    assert run_transform(manager, "nope", "") == [("error", "Unknown transform: 'nope'")]
+
+
+def test_cracking_stops_once_every_hash_is_found(write):
+    words = b"".join(f"word{i:05d}\n".encode() for i in range(20_000))
+    path = write("words.txt", words)
+    digest = hashlib.md5(b"word00003").hexdigest()
+    manager = TransformManager(workers=1, chunk_mb=0.001)
+
+    items = run_transform(manager, "hash", digest, path)
+
+    progress = [value for kind, value in items if kind == "progress"]
+    assert [value for kind, value in items if kind == "match"] == [f"{digest}:word00003"]
+    assert progress[-1][0] < progress[-1][1] # The rest of the wordlist was dropped
+    assert items[-1][0] == "result" and items[-1][1].startswith("1/1 cracked")
+
+
+def test_closing_a_run_early_drops_its_queued_tasks(write):
+    path = write("secret.bin", xored(PLAINTEXT * 2000, 0x42))
+    manager = TransformManager(workers=1, chunk_mb=0.001, cribs=[b"flag{"])
+
+    async def run():
+        try:
+            items = manager.run("xor", path)
+            first = await items.__anext__()
+            await items.aclose()
+            return first
+        finally:
+            manager.close()
+
+    first = asyncio.run(run())
+
+    assert first[0] in ("match", "progress")
+    # About a hundred chunks, but only the first few were ever handed to the pool
+    assert manager.metrics.snapshot()["toolbox_tasks_total"] <= manager.max_in_flight